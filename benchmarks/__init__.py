@@ -0,0 +1,12 @@
+"""
+Load and latency benchmarks for the Kaffero website.
+
+Seed a throwaway database, start gunicorn against it and drive every URL
+route with concurrent clients::
+
+    python -m benchmarks.run --scale small --concurrency 8 --requests 200
+
+Results are written as JSON (``benchmarks/results/`` by default) and checked
+against ``benchmarks/budgets.json``; compare two runs with
+``python -m benchmarks.compare old.json new.json``.
+"""
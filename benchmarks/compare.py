@@ -0,0 +1,42 @@
+"""
+Diff two benchmark result files.
+
+Usage::
+
+    python -m benchmarks.compare old.json new.json
+"""
+
+import json
+import sys
+from pathlib import Path
+
+
+def _delta(old, new):
+    if old is None or new is None:
+        return ''
+    if not old:
+        return f'{new - old:+}'
+    return f'{(new - old) / old * 100:+.0f}%'
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 2:
+        print(__doc__.strip())
+        return 2
+
+    old, new = (json.loads(Path(path).read_text())['routes'] for path in argv)
+    print(f"{'route':<36} {'p95 old':>9} {'p95 new':>9} {'Δ':>6} {'rps old':>9} {'rps new':>9} {'q old':>6} {'q new':>6}")
+    for label in sorted(set(old) | set(new)):
+        a, b = old.get(label, {}), new.get(label, {})
+        print(
+            f"{label:<36} {a.get('p95_ms', '-'):>9} {b.get('p95_ms', '-'):>9} "
+            f"{_delta(a.get('p95_ms'), b.get('p95_ms')):>6} "
+            f"{a.get('throughput_rps', '-'):>9} {b.get('throughput_rps', '-'):>9} "
+            f"{str(a.get('queries_per_request', '-')):>6} {str(b.get('queries_per_request', '-')):>6}"
+        )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
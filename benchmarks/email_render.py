@@ -0,0 +1,89 @@
+"""
+Measure how many emails per second each email template renders.
+
+Usage::
+
+    python -m benchmarks.email_render [--seconds 2]
+
+Compares ``render_to_string`` plus ``strip_tags`` (what every send used to
+do) with the precompiled renderer in ``website.emails``, for each template
+under ``templates/emails/``. Both produce the HTML and text parts of one
+message; no mail is sent and no database is needed.
+"""
+
+import argparse
+import sys
+import time
+from datetime import timedelta
+
+from benchmarks.run import setup_django
+
+
+def sample_contexts():
+    from django.utils import timezone
+    from website.models import Campaign, ContactMessage, DemoRequest
+
+    now = timezone.now()
+    demo = DemoRequest(
+        pk=1, cafe_name='Brew & Bean', city='Kochi', num_tables=12, contact_name='Anu Joseph',
+        phone='+91 98765 43210', email='anu@example.com', source='google', created_at=now,
+        demo_expires_at=now + timedelta(days=7),
+    )
+    message = ContactMessage(
+        pk=1, name='Rahul', email='rahul@example.com', phone='+91 98765 43210',
+        subject='general', message='Do you support multiple outlets?\n' * 5, created_at=now,
+    )
+    campaign = Campaign(
+        pk=1, subject='What is new in Kaffero', preheader='Table QR ordering is here',
+        body='<h2>Table QR ordering</h2>' + '<p>Guests scan, order and pay from the table.</p>' * 20,
+    )
+    return {
+        'emails/demo_confirmation.html': {'demo_request': demo},
+        'emails/admin_demo_notification.html': {'demo_request': demo},
+        'emails/contact_confirmation.html': {'contact': message},
+        'emails/admin_contact_notification.html': {'contact': message},
+        'emails/newsletter_campaign.html': {'campaign': campaign, 'unsubscribe_url': 'https://example.com/u/'},
+    }
+
+
+def rate(func, seconds):
+    """Calls of ``func`` per second over roughly ``seconds``."""
+    func()
+    count = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while time.perf_counter() < deadline:
+        for _ in range(20):
+            func()
+        count += 20
+    return count / (time.perf_counter() - start)
+
+
+def main(argv=None):
+    setup_django()
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--seconds', type=float, default=2.0, help='time spent per template and renderer')
+    args = parser.parse_args(argv)
+
+    from django.template.loader import render_to_string
+    from django.utils.html import strip_tags
+    from website import emails
+
+    def legacy(name, context):
+        html = render_to_string(name, context)
+        return html, strip_tags(html)
+
+    started = time.perf_counter()
+    compiled = emails.precompile()
+    print(f'Compiled {len(compiled)} templates in {(time.perf_counter() - started) * 1000:.1f}ms\n')
+
+    print(f"{'template':<42} {'legacy/s':>10} {'compiled/s':>11} {'speedup':>8}")
+    for name, context in sample_contexts().items():
+        before = rate(lambda: legacy(name, context), args.seconds)
+        after = rate(lambda: emails.render_email(name, context), args.seconds)
+        print(f'{name:<42} {before:>10,.0f} {after:>11,.0f} {after / before:>7.1f}x')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""
+Measure how many chat messages per second the lead extractor scans.
+
+Usage::
+
+    python -m benchmarks.lead_extract [--seconds 2] [--messages 20000]
+
+Compares the two inline ``re.search`` calls ``chatbot_message`` used to make
+(first email and first phone number only, unnormalized) with
+``website.leads.extract`` (every email and phone number, normalized) over
+messages drawn from the same prompts ``generate_scale_data`` uses, with a
+contact in about one message in ten. No database is needed.
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+
+from benchmarks.run import setup_django
+
+CONTACTS = [
+    'my email is anu.joseph@example.com',
+    'call me on 98765 43210',
+    'reach me at +91-98470-12345 or rahul@brewlagoon.in',
+    'whatsapp 9847012345, office 0484 2345678',
+    'Priya.Nair@Example.COM / 919876543210',
+]
+
+
+def sample_messages(count, seed=42):
+    from website.management.commands.generate_scale_data import CHAT_PROMPTS
+
+    rng = random.Random(seed)
+    return [rng.choice(CONTACTS) if rng.random() < 0.1 else rng.choice(CHAT_PROMPTS) for _ in range(count)]
+
+
+def legacy(message):
+    email_match = re.search(r'[\w\.-]+@[\w\.-]+\.\w+', message)
+    phone_match = re.search(r'(\+91[\s-]?)?[6-9]\d{4}[\s-]?\d{5}', message)
+    return email_match and email_match.group(), phone_match and phone_match.group()
+
+
+def rate(func, messages, seconds):
+    """Messages per second ``func`` processes over roughly ``seconds``."""
+    count = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while time.perf_counter() < deadline:
+        for message in messages:
+            func(message)
+        count += len(messages)
+    return count / (time.perf_counter() - start)
+
+
+def main(argv=None):
+    setup_django()
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--seconds', type=float, default=2.0, help='time spent per extractor')
+    parser.add_argument('--messages', type=int, default=20000, help='distinct sample messages')
+    args = parser.parse_args(argv)
+
+    from website import leads
+
+    messages = sample_messages(args.messages)
+    for message in CONTACTS:
+        print(f'{message!r:<48} -> {legacy(message)} / {tuple(leads.extract(message))}')
+
+    before = rate(legacy, messages, args.seconds)
+    after = rate(leads.extract, messages, args.seconds)
+    print(f"\n{'extractor':<12} {'messages/s':>12}")
+    print(f"{'legacy':<12} {before:>12,.0f}")
+    print(f"{'leads':<12} {after:>12,.0f}   {after / before:.1f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,152 @@
+"""
+Compare gunicorn worker memory with and without ``config/gunicorn.py``.
+
+Usage::
+
+    python -m benchmarks.memory [--workers 4] [--rounds 3] [--no-seed]
+
+Starts gunicorn with its default settings and then with the checked-in
+config (preload, cache warming, ``gc.freeze()``), sends every benchmark
+route to the workers and reports each worker's RSS, PSS and USS from
+``/proc/<pid>/smaps_rollup`` (Linux only). USS is the memory a worker does
+not share with any other process, so it is what each additional worker
+costs.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+import requests
+
+from benchmarks.run import BASE_DIR, ClientPool, free_port, setup_django, timed_request
+
+CONFIGS = {
+    'default': [],
+    'tuned': ['-c', 'config/gunicorn.py'],
+}
+
+
+def process_memory(pid):
+    """Return ``{'rss': MB, 'pss': MB, 'uss': MB}`` for ``pid``."""
+    values = {'Rss': 0, 'Pss': 0, 'Private_Clean': 0, 'Private_Dirty': 0}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            key, _, rest = line.partition(':')
+            if key in values:
+                values[key] = int(rest.split()[0])
+    return {
+        'rss': values['Rss'] / 1024,
+        'pss': values['Pss'] / 1024,
+        'uss': (values['Private_Clean'] + values['Private_Dirty']) / 1024,
+    }
+
+
+def child_pids(parent):
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # The command name may contain spaces; fields after it are fixed
+                fields = f.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == parent:
+            children.append(int(entry))
+    return sorted(children)
+
+
+def start_server(config, port, workers):
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE='benchmarks.settings', GUNICORN_MAX_WORKER_MEMORY_MB='0')
+    process = subprocess.Popen(
+        [
+            sys.executable, '-m', 'gunicorn', *CONFIGS[config], 'config.wsgi',
+            '--bind', f'127.0.0.1:{port}',
+            '--workers', str(workers),
+            '--log-level', 'warning',
+        ],
+        cwd=BASE_DIR,
+        env=env,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('gunicorn exited during startup')
+        if len(child_pids(process.pid)) >= workers:
+            try:
+                requests.get(f'http://127.0.0.1:{port}/robots.txt', timeout=1)
+                return process
+            except requests.ConnectionError:
+                pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError('gunicorn did not start within 30 seconds')
+
+
+def measure(config, routes, args):
+    from benchmarks.seed import STAFF_PASSWORD, STAFF_USERNAME
+
+    port = free_port()
+    server = start_server(config, port, args.workers)
+    try:
+        idle = {pid: process_memory(pid) for pid in child_pids(server.pid)}
+        pool = ClientPool(f'http://127.0.0.1:{port}', args.workers, STAFF_USERNAME, STAFF_PASSWORD)
+        # Each round sends every route once per worker so all of them serve everything
+        for _ in range(args.rounds * args.workers):
+            for route in routes:
+                timed_request(pool, route)
+        loaded = {pid: process_memory(pid) for pid in child_pids(server.pid)}
+    finally:
+        server.terminate()
+        server.wait()
+    return idle, loaded
+
+
+def print_report(config, idle, loaded):
+    print(f'\n{config}')
+    print(f"  {'worker':>8} {'idle rss':>9} {'idle uss':>9} {'rss':>8} {'pss':>8} {'uss':>8}")
+    for pid, memory in loaded.items():
+        before = idle.get(pid, {'rss': 0, 'uss': 0})
+        print(
+            f"  {pid:>8} {before['rss']:>9.1f} {before['uss']:>9.1f} "
+            f"{memory['rss']:>8.1f} {memory['pss']:>8.1f} {memory['uss']:>8.1f}"
+        )
+    total_pss = sum(memory['pss'] for memory in loaded.values())
+    mean_uss = sum(memory['uss'] for memory in loaded.values()) / max(len(loaded), 1)
+    print(f'  total worker PSS {total_pss:.1f}MB, mean USS {mean_uss:.1f}MB per worker')
+    return mean_uss
+
+
+def main(argv=None):
+    setup_django()
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--rounds', type=int, default=3, help='passes over every route per worker')
+    parser.add_argument('--no-seed', action='store_true', help='reuse the existing benchmark database')
+    args = parser.parse_args(argv)
+
+    from django.core.management import call_command
+    from benchmarks.routes import build_routes
+    from benchmarks.seed import SCALES, seed, seeded_ids
+
+    call_command('migrate', verbosity=0)
+    ids = seeded_ids() if args.no_seed else seed(SCALES['small'])
+    # Writes would grow the data between the two runs; memory is about reads
+    routes = [route for route in build_routes(ids) if route.method == 'GET']
+
+    results = {}
+    for config in CONFIGS:
+        idle, loaded = measure(config, routes, args)
+        results[config] = print_report(config, idle, loaded)
+
+    saved = results['default'] - results['tuned']
+    print(f'\nUSS per worker: {results["default"]:.1f}MB -> {results["tuned"]:.1f}MB ({saved:+.1f}MB saved)')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,176 @@
+"""
+Request plan covering every named route in ``website/urls.py`` and
+``website/dashboard_urls.py``.
+"""
+
+import itertools
+import json
+from dataclasses import dataclass, field
+
+from django.urls import reverse
+
+from website import dashboard_urls, urls
+
+# Routes that are deliberately not driven, with the reason
+SKIPPED = {
+    'dashboard:logout': 'ends the benchmark session',
+    'dashboard:demo_delete': 'destructive',
+    'dashboard:message_delete': 'destructive',
+    'dashboard:blog_delete': 'destructive',
+    'dashboard:feature_delete': 'destructive',
+    'dashboard:screenshot_delete': 'destructive',
+    'dashboard:testimonial_delete': 'destructive',
+    'dashboard:faq_delete': 'destructive',
+    'dashboard:chat_delete': 'destructive',
+    'dashboard:subscriber_import': 'multipart upload; time with import_subscribers instead',
+    'dashboard:campaign_delete': 'destructive',
+    'dashboard:live_feed': 'event stream; polls for new rows at most once per interval per process',
+    'dashboard:demo_bulk': 'bulk write over a selection; budgeted in website/tests.py',
+    'dashboard:message_bulk': 'bulk write over a selection; budgeted in website/tests.py',
+    'dashboard:subscriber_bulk': 'bulk write over a selection; budgeted in website/tests.py',
+    'dashboard:chat_bulk': 'bulk write over a selection; budgeted in website/tests.py',
+}
+
+_counter = itertools.count()
+
+
+@dataclass
+class Route:
+    """One benchmarked request shape."""
+
+    name: str
+    kwargs: dict = field(default_factory=dict)
+    method: str = 'GET'
+    auth: bool = False
+    # Callable returning the request body; called once per request
+    body: object = None
+    json: bool = False
+    label: str = ''
+
+    def __post_init__(self):
+        if not self.label:
+            self.label = self.name if self.method == 'GET' else f'{self.name} [{self.method}]'
+
+    @property
+    def path(self):
+        return reverse(self.name, kwargs=self.kwargs)
+
+
+def _demo_form():
+    n = next(_counter)
+    return {
+        'cafe_name': f'Bench Cafe {n}', 'city': 'Kochi', 'num_tables': 10,
+        'contact_name': 'Bench', 'phone': '+91 98765 43210', 'email': f'bench{n}@example.com',
+        'source': 'google', 'privacy_agreed': 'on', 'cf-turnstile-response': 'bench',
+    }
+
+
+def _contact_form():
+    n = next(_counter)
+    return {
+        'name': 'Bench', 'email': f'bench{n}@example.com', 'subject': 'general',
+        'message': 'Benchmark message', 'cf-turnstile-response': 'bench',
+    }
+
+
+def _newsletter_form():
+    return {'email': f'bench-newsletter-{next(_counter)}@example.com'}
+
+
+_CHAT_PROMPTS = ['hi', 'how much does it cost?', 'tell me about features', 'my email is bench@example.com']
+
+
+def _chat_message():
+    n = next(_counter)
+    return {'message': _CHAT_PROMPTS[n % len(_CHAT_PROMPTS)], 'session_id': f'bench-chat-{n // 4}'}
+
+
+def build_routes(ids):
+    """Return the route plan for the identifiers returned by ``seed()``."""
+    return [
+        # Public pages
+        Route('home'),
+        Route('features'),
+        Route('feature_detail', {'slug': ids['feature_slug']}),
+        Route('pricing'),
+        Route('demo'),
+        Route('demo', method='POST', body=_demo_form),
+        Route('demo_thank_you', {'pk': ids['demo_pk']}),
+        Route('about'),
+        Route('contact'),
+        Route('contact', method='POST', body=_contact_form),
+        Route('faq'),
+        Route('blog_list'),
+        Route('blog_detail', {'slug': ids['post_slug']}),
+        Route('privacy'),
+        Route('terms'),
+        Route('newsletter_subscribe', method='POST', body=_newsletter_form),
+        Route('newsletter_unsubscribe', {'token': ids['unsubscribe_token']}),
+        Route('chatbot_message', method='POST', body=_chat_message, json=True),
+        Route('robots_txt'),
+        Route('sitemap_xml'),
+
+        # Dashboard
+        Route('dashboard:login'),
+        Route('dashboard:home', auth=True),
+        Route('dashboard:demo_list', auth=True),
+        Route('dashboard:demo_export', auth=True),
+        Route('dashboard:demo_funnel', auth=True),
+        Route('dashboard:demo_detail', {'pk': ids['demo_pk']}, auth=True),
+        Route('dashboard:message_list', auth=True),
+        Route('dashboard:message_export', auth=True),
+        Route('dashboard:message_detail', {'pk': ids['message_pk']}, auth=True),
+        Route('dashboard:blog_list', auth=True),
+        Route('dashboard:blog_create', auth=True),
+        Route('dashboard:blog_edit', {'pk': ids['post_pk']}, auth=True),
+        Route('dashboard:feature_list', auth=True),
+        Route('dashboard:feature_create', auth=True),
+        Route('dashboard:feature_edit', {'pk': ids['feature_pk']}, auth=True),
+        Route('dashboard:screenshot_list', auth=True),
+        Route('dashboard:screenshot_create', auth=True),
+        Route('dashboard:screenshot_edit', {'pk': ids['screenshot_pk']}, auth=True),
+        Route('dashboard:testimonial_list', auth=True),
+        Route('dashboard:testimonial_create', auth=True),
+        Route('dashboard:testimonial_edit', {'pk': ids['testimonial_pk']}, auth=True),
+        Route('dashboard:faq_list', auth=True),
+        Route('dashboard:faq_create', auth=True),
+        Route('dashboard:faq_edit', {'pk': ids['faq_pk']}, auth=True),
+        Route('dashboard:subscriber_list', auth=True),
+        Route('dashboard:subscriber_export', auth=True),
+        Route('dashboard:campaign_list', auth=True),
+        Route('dashboard:campaign_create', auth=True),
+        Route('dashboard:campaign_detail', {'pk': ids['campaign_pk']}, auth=True),
+        Route('dashboard:campaign_edit', {'pk': ids['campaign_pk']}, auth=True),
+        Route('dashboard:chat_list', auth=True),
+        Route('dashboard:chat_export', auth=True),
+        Route('dashboard:chat_analytics', auth=True),
+        Route('dashboard:chat_detail', {'pk': ids['chat_pk']}, auth=True),
+        Route('dashboard:chat_messages', {'pk': ids['chat_pk']}, auth=True),
+        Route('dashboard:site_settings', auth=True),
+        Route('dashboard:metrics', auth=True),
+    ]
+
+
+def url_names():
+    """Every named route the site exposes."""
+    names = {pattern.name for pattern in urls.urlpatterns if pattern.name}
+    names |= {
+        f'{dashboard_urls.app_name}:{pattern.name}'
+        for pattern in dashboard_urls.urlpatterns if pattern.name
+    }
+    return names
+
+
+def uncovered(routes):
+    """Route names that are neither benchmarked nor explicitly skipped."""
+    return sorted(url_names() - {route.name for route in routes} - set(SKIPPED))
+
+
+def encode_body(route):
+    """Return ``(data, headers)`` for one request of ``route``."""
+    if route.body is None:
+        return None, {}
+    body = route.body()
+    if route.json:
+        return json.dumps(body), {'Content-Type': 'application/json'}
+    return body, {}
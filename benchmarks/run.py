@@ -0,0 +1,335 @@
+"""
+Seed a benchmark database, start gunicorn and measure every route.
+
+Usage::
+
+    python -m benchmarks.run [--scale small|medium|large] [--demos N ...]
+                             [--concurrency 8] [--requests 200] [--workers 2]
+                             [--output results.json] [--baseline old.json]
+
+Exits non-zero when a route returns errors, exceeds its budget in
+``benchmarks/budgets.json`` or regresses against ``--baseline``.
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import queue
+import re
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+import requests
+
+BENCH_DIR = Path(__file__).resolve().parent
+BASE_DIR = BENCH_DIR.parent
+DEFAULT_BUDGETS = BENCH_DIR / 'budgets.json'
+RESULTS_DIR = BENCH_DIR / 'results'
+
+SERVER_TIMING_QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+# A p95 increase smaller than this is treated as noise when comparing runs
+NOISE_FLOOR_MS = 5.0
+
+
+def setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+    sys.path.insert(0, str(BASE_DIR))
+    import django
+    django.setup()
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port, workers, threads):
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE='benchmarks.settings')
+    process = subprocess.Popen(
+        [
+            sys.executable, '-m', 'gunicorn', 'config.wsgi',
+            '--bind', f'127.0.0.1:{port}',
+            '--workers', str(workers),
+            '--threads', str(threads),
+            '--log-level', 'warning',
+        ],
+        cwd=BASE_DIR,
+        env=env,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('gunicorn exited during startup')
+        try:
+            requests.get(f'http://127.0.0.1:{port}/robots.txt', timeout=1)
+            return process
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError('gunicorn did not start within 30 seconds')
+
+
+class ClientPool:
+    """Pre-created HTTP sessions, checked out one per in-flight request.
+
+    Sessions are created (and logged in to the dashboard) up front so login
+    cost never lands inside a measured request.
+    """
+
+    def __init__(self, base_url, size, username, password):
+        self.base_url = base_url
+        self.pools = {False: queue.Queue(), True: queue.Queue()}
+        for _ in range(size):
+            self.pools[False].put(self._new_session())
+            self.pools[True].put(self._new_session(username, password))
+
+    def _new_session(self, username=None, password=None):
+        session = requests.Session()
+        # Prime the CSRF cookie
+        session.get(f'{self.base_url}/dashboard/login/')
+        if username:
+            response = session.post(
+                f'{self.base_url}/dashboard/login/',
+                data={
+                    'username': username,
+                    'password': password,
+                    'csrfmiddlewaretoken': session.cookies.get('csrftoken'),
+                },
+                allow_redirects=False,
+            )
+            if response.status_code != 302:
+                raise RuntimeError('Could not log in to the dashboard')
+        return session
+
+    @contextmanager
+    def session(self, auth):
+        session = self.pools[auth].get()
+        try:
+            yield session
+        finally:
+            self.pools[auth].put(session)
+
+
+def timed_request(pool, route):
+    from benchmarks.routes import encode_body
+
+    data, headers = encode_body(route)
+    with pool.session(route.auth) as session:
+        headers['X-CSRFToken'] = session.cookies.get('csrftoken', '')
+        if data is not None and not route.json:
+            data = dict(data, csrfmiddlewaretoken=headers['X-CSRFToken'])
+
+        start = time.perf_counter()
+        response = session.request(
+            route.method, pool.base_url + route.path,
+            data=data, headers=headers, allow_redirects=False,
+        )
+        elapsed = (time.perf_counter() - start) * 1000
+
+    match = SERVER_TIMING_QUERIES.search(response.headers.get('Server-Timing', ''))
+    queries = int(match.group(1)) if match else None
+    return elapsed, response.status_code, queries
+
+
+def measure(pool, route, total, concurrency, warmup):
+    for _ in range(warmup):
+        timed_request(pool, route)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        samples = list(executor.map(lambda _: timed_request(pool, route), range(total)))
+    wall = time.perf_counter() - start
+
+    latencies = sorted(sample[0] for sample in samples)
+    queries = [sample[2] for sample in samples if sample[2] is not None]
+    return {
+        'path': route.path,
+        'method': route.method,
+        'requests': total,
+        'errors': sum(1 for sample in samples if sample[1] >= 400),
+        'throughput_rps': round(total / wall, 2),
+        'mean_ms': round(sum(latencies) / len(latencies), 2),
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+        'max_queries': max(queries) if queries else None,
+    }
+
+
+def check_budgets(results, budgets):
+    """Return a list of budget violations."""
+    failures = []
+    defaults = budgets.get('default', {})
+    for label, stats in results['routes'].items():
+        budget = dict(defaults, **budgets.get('routes', {}).get(label, {}))
+        if stats['errors']:
+            failures.append(f"{label}: {stats['errors']} error responses")
+        if 'p95_ms' in budget and stats['p95_ms'] > budget['p95_ms']:
+            failures.append(f"{label}: p95 {stats['p95_ms']}ms > budget {budget['p95_ms']}ms")
+        if 'queries_per_request' in budget and stats['max_queries'] is not None \
+                and stats['max_queries'] > budget['queries_per_request']:
+            failures.append(
+                f"{label}: {stats['max_queries']} queries > budget {budget['queries_per_request']}"
+            )
+    return failures
+
+
+def check_regressions(results, baseline, tolerance):
+    """Return regressions against a previous results file."""
+    failures = []
+    for label, stats in results['routes'].items():
+        old = baseline['routes'].get(label)
+        if not old:
+            continue
+        limit = old['p95_ms'] * (1 + tolerance)
+        if stats['p95_ms'] > limit and stats['p95_ms'] - old['p95_ms'] > NOISE_FLOOR_MS:
+            failures.append(f"{label}: p95 {old['p95_ms']}ms -> {stats['p95_ms']}ms")
+        if (stats['queries_per_request'] or 0) > (old['queries_per_request'] or 0):
+            failures.append(
+                f"{label}: queries {old['queries_per_request']} -> {stats['queries_per_request']}"
+            )
+    return failures
+
+
+def print_table(results):
+    print(f"\n{'route':<36} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'queries':>8} {'err':>4}")
+    for label, stats in results['routes'].items():
+        queries = '-' if stats['queries_per_request'] is None else stats['queries_per_request']
+        print(
+            f"{label:<36} {stats['throughput_rps']:>8} {stats['p50_ms']:>8} {stats['p95_ms']:>8} "
+            f"{stats['p99_ms']:>8} {queries:>8} {stats['errors']:>4}"
+        )
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR, text=True, stderr=subprocess.DEVNULL,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args(argv=None):
+    from benchmarks.seed import SCALES
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    for key in SCALES['small']:
+        parser.add_argument(f"--{key.replace('_', '-')}", type=int, dest=key,
+                            help=f'override the number of {key.replace("_", " ")}')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200, help='requests per route')
+    parser.add_argument('--warmup', type=int, default=5, help='unmeasured requests per route')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=1, help='threads per gunicorn worker')
+    parser.add_argument('--routes', help='comma-separated labels to run (default: all)')
+    parser.add_argument('--no-seed', action='store_true', help='reuse the existing benchmark database')
+    parser.add_argument('--output', help='results file (default: benchmarks/results/<timestamp>.json)')
+    parser.add_argument('--budgets', default=str(DEFAULT_BUDGETS))
+    parser.add_argument('--baseline', help='previous results file to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed relative p95 increase over --baseline')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    setup_django()
+    args = parse_args(argv)
+
+    from django.core.cache import cache
+    from django.core.management import call_command
+    from benchmarks.routes import SKIPPED, build_routes, uncovered
+    from benchmarks.seed import SCALES, STAFF_PASSWORD, STAFF_USERNAME, seed
+
+    scale = dict(SCALES[args.scale])
+    scale.update({key: getattr(args, key) for key in scale if getattr(args, key) is not None})
+
+    call_command('migrate', verbosity=0)
+    cache.clear()
+    if not args.no_seed:
+        print(f'Seeding: {scale}')
+        started = time.perf_counter()
+        ids = seed(scale)
+        print(f'Seeded in {time.perf_counter() - started:.1f}s')
+    else:
+        from benchmarks.seed import seeded_ids
+        ids = seeded_ids()
+
+    routes = build_routes(ids)
+    missing = uncovered(routes)
+    if missing:
+        print(f"Routes without a benchmark plan: {', '.join(missing)}")
+        return 1
+    if args.routes:
+        wanted = set(args.routes.split(','))
+        routes = [route for route in routes if route.label in wanted]
+
+    port = free_port()
+    server = start_server(port, args.workers, args.threads)
+    try:
+        pool = ClientPool(f'http://127.0.0.1:{port}', args.concurrency, STAFF_USERNAME, STAFF_PASSWORD)
+        route_results = {}
+        for route in routes:
+            route_results[route.label] = measure(pool, route, args.requests, args.concurrency, args.warmup)
+    finally:
+        server.terminate()
+        server.wait()
+
+    import django
+    results = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'git_commit': git_commit(),
+            'scale': scale,
+            'concurrency': args.concurrency,
+            'requests_per_route': args.requests,
+            'gunicorn_workers': args.workers,
+            'gunicorn_threads': args.threads,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'skipped': SKIPPED,
+        },
+        'routes': route_results,
+    }
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{results['meta']['timestamp'].replace(':', '')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print_table(results)
+    print(f'\nResults written to {output}')
+
+    failures = []
+    if args.budgets and Path(args.budgets).exists():
+        failures += check_budgets(results, json.loads(Path(args.budgets).read_text()))
+    if args.baseline:
+        failures += check_regressions(results, json.loads(Path(args.baseline).read_text()), args.tolerance)
+
+    if failures:
+        print('\nFAILED:')
+        for failure in failures:
+            print(f'  {failure}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
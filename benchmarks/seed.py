@@ -0,0 +1,125 @@
+"""
+Populate the benchmark database at a configurable scale.
+"""
+
+import random
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.utils import timezone
+
+from website.models import (
+    DemoRequest, ContactMessage, NewsletterSubscriber,
+    Testimonial, FAQ, Feature, Screenshot, BlogPost,
+    ChatConversation, ChatMessage, Campaign
+)
+from website.newsletter import unsubscribe_token
+
+# chat_messages is the mean number of messages per conversation
+SCALES = {
+    'small': {
+        'demos': 200, 'messages': 200, 'subscribers': 500,
+        'chats': 100, 'chat_messages': 10, 'posts': 20,
+    },
+    'medium': {
+        'demos': 5000, 'messages': 5000, 'subscribers': 20000,
+        'chats': 2000, 'chat_messages': 20, 'posts': 100,
+    },
+    'large': {
+        'demos': 50000, 'messages': 50000, 'subscribers': 200000,
+        'chats': 20000, 'chat_messages': 30, 'posts': 500,
+    },
+}
+
+BATCH_SIZE = 2000
+
+STAFF_USERNAME = 'bench'
+STAFF_PASSWORD = 'bench-password'
+
+CITIES = ['Kochi', 'Thrissur', 'Kozhikode', 'Trivandrum', 'Bengaluru', 'Chennai', 'Mumbai', 'Pune']
+
+
+def _bulk(model, objects):
+    model.objects.bulk_create(objects, batch_size=BATCH_SIZE)
+
+
+def seed(scale, rng=None):
+    """Wipe the benchmark data and create ``scale`` rows of each kind.
+
+    Returns the identifiers the route plan needs (pks and slugs).
+    """
+    rng = rng or random.Random(0)
+    now = timezone.now()
+
+    for model in (BlogPost, Feature, FAQ, Screenshot, Testimonial):
+        model.objects.all().delete()
+
+    _bulk(Feature, [
+        Feature(
+            name=f'Feature {i}', slug=f'feature-{i}',
+            short_description='Short description', full_description='Full description ' * 20,
+            icon='✨', order=i, is_highlighted=i < 6, bullet_points=['One', 'Two', 'Three'],
+        )
+        for i in range(10)
+    ])
+    _bulk(FAQ, [
+        FAQ(question=f'Question {i}?', answer='Answer ' * 30,
+            category=FAQ.Category.values[i % len(FAQ.Category.values)], order=i)
+        for i in range(30)
+    ])
+    _bulk(Screenshot, [
+        Screenshot(title=f'Screenshot {i}', image=f'screenshots/bench-{i}.png', order=i)
+        for i in range(8)
+    ])
+    _bulk(Testimonial, [
+        Testimonial(name=f'Owner {i}', role='Owner', cafe_name=f'Cafe {i}',
+                    city=rng.choice(CITIES), content='Great product. ' * 10, is_featured=i < 3)
+        for i in range(6)
+    ])
+    _bulk(BlogPost, [
+        BlogPost(title=f'Post {i}', slug=f'post-{i}', excerpt='Excerpt', content='Content ' * 200,
+                 status=BlogPost.Status.PUBLISHED, published_at=now)
+        for i in range(scale['posts'])
+    ])
+
+    call_command(
+        'generate_scale_data',
+        demos=scale['demos'],
+        messages=scale['messages'],
+        subscribers=scale['subscribers'],
+        chats=scale['chats'],
+        chat_turns=scale['chat_messages'] / 2,
+        seed=rng.randrange(2 ** 32),
+        clear=True,
+        verbosity=0,
+    )
+
+    Campaign.objects.all().delete()
+    Campaign.objects.create(subject='Bench campaign', preheader='Preview', body='<p>Hello from Kaffero</p>' * 20)
+
+    user, created = User.objects.get_or_create(username=STAFF_USERNAME, defaults={'is_staff': True})
+    user.is_staff = True
+    user.set_password(STAFF_PASSWORD)
+    user.save()
+
+    return seeded_ids()
+
+
+def seeded_ids():
+    """Identifiers of seeded rows used to build detail-page URLs."""
+    return {
+        'demo_pk': DemoRequest.objects.values_list('pk', flat=True).first(),
+        'message_pk': ContactMessage.objects.values_list('pk', flat=True).first(),
+        'chat_pk': ChatConversation.objects.values_list('pk', flat=True).first(),
+        'post_pk': BlogPost.objects.values_list('pk', flat=True).first(),
+        'post_slug': BlogPost.objects.values_list('slug', flat=True).first(),
+        'feature_pk': Feature.objects.values_list('pk', flat=True).first(),
+        'feature_slug': Feature.objects.values_list('slug', flat=True).first(),
+        'screenshot_pk': Screenshot.objects.values_list('pk', flat=True).first(),
+        'testimonial_pk': Testimonial.objects.values_list('pk', flat=True).first(),
+        'faq_pk': FAQ.objects.values_list('pk', flat=True).first(),
+        'campaign_pk': Campaign.objects.values_list('pk', flat=True).first(),
+        'unsubscribe_token': unsubscribe_token(
+            NewsletterSubscriber.objects.values_list('pk', flat=True).first()
+        ),
+    }
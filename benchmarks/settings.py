@@ -0,0 +1,47 @@
+"""
+Django settings for benchmark runs.
+
+Production-like (DEBUG off) but served over plain HTTP from a separate
+SQLite database so benchmarks never touch the development data.
+"""
+
+import os
+
+from config.settings import *  # noqa: F401,F403
+from config.settings import BASE_DIR, CACHES
+
+DEBUG = False
+ALLOWED_HOSTS = ['127.0.0.1', 'localhost']
+
+SECURE_SSL_REDIRECT = False
+SESSION_COOKIE_SECURE = False
+CSRF_COOKIE_SECURE = False
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('BENCH_DATABASE', BASE_DIR / 'benchmarks' / 'bench.sqlite3'),
+    }
+}
+
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+# Shared by the gunicorn workers, but apart from the development cache;
+# cleared at the start of every run
+CACHES = dict(CACHES, default={
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': BASE_DIR / 'benchmarks' / 'cache',
+})
+
+EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+
+# verify_turnstile() accepts any non-empty token without a secret key
+TURNSTILE_SECRET_KEY = ''
+
+# Every benchmark client comes from 127.0.0.1
+RATE_LIMIT_ENABLED = False
+
+METRICS_SERVER_TIMING = True
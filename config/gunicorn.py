@@ -0,0 +1,144 @@
+"""
+Gunicorn configuration for Kaffero website.
+
+    gunicorn -c config/gunicorn.py config.wsgi
+
+The application is imported once in the master (``preload_app``), which then
+warms the template, URL and site settings caches and calls ``gc.freeze()``
+before forking so that workers share those pages copy-on-write instead of
+each building its own copy. Workers whose unique memory grows past
+``GUNICORN_MAX_WORKER_MEMORY_MB`` finish their current request and are
+replaced.
+
+Measure the effect with ``python -m benchmarks.memory``.
+"""
+
+import gc
+import logging
+import os
+
+# =============================================================================
+# SERVER
+# =============================================================================
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', '2'))
+threads = int(os.getenv('GUNICORN_THREADS', '1'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))
+preload_app = True
+
+# Request-count recycling as a backstop to the memory limit below
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '5000'))
+max_requests_jitter = max_requests // 10
+
+accesslog = '-' if os.getenv('GUNICORN_ACCESS_LOG', 'False') == 'True' else None
+
+
+# =============================================================================
+# MEMORY
+# =============================================================================
+
+# Recycle a worker once its unique (unshared) memory exceeds this; 0 disables
+max_worker_memory_mb = int(os.getenv('GUNICORN_MAX_WORKER_MEMORY_MB', '256'))
+# Reading /proc/self/smaps_rollup costs ~0.1ms, so only check every N requests
+memory_check_interval = int(os.getenv('GUNICORN_MEMORY_CHECK_INTERVAL', '10'))
+
+# Collections while the app loads would touch (and so un-share) objects that
+# the workers are about to inherit; they are frozen in ``when_ready`` instead,
+# after which collecting is safe again (frozen objects are never scanned).
+gc.disable()
+
+
+def unique_memory_mb():
+    """Private (USS) memory of this process in MB, or RSS where unavailable."""
+    try:
+        total_kb = 0
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                if line.startswith(('Private_Clean:', 'Private_Dirty:')):
+                    total_kb += int(line.split()[1])
+        return total_kb / 1024
+    except OSError:
+        import resource
+        # Peak RSS (kB on Linux); the best portable approximation
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def warm_caches():
+    """Load everything a first request would otherwise load in each worker."""
+    from django.db import DatabaseError, connections
+    from django.template import engines
+    from django.template.exceptions import TemplateDoesNotExist, TemplateSyntaxError
+    from django.urls import get_resolver
+
+    # URLconf, views and both admin sites, plus every reverse() lookup table
+    resolver = get_resolver()
+    resolver.reverse_dict
+    for namespace, (prefix, sub_resolver) in resolver.namespace_dict.items():
+        sub_resolver.reverse_dict
+
+    # Parsed templates are kept by the cached loader (enabled when DEBUG is off)
+    for engine in engines.all():
+        for template_dir in engine.template_dirs:
+            for root, dirs, files in os.walk(template_dir):
+                for name in files:
+                    path = os.path.relpath(os.path.join(root, name), template_dir)
+                    try:
+                        engine.get_template(path.replace(os.sep, '/'))
+                    except (TemplateDoesNotExist, TemplateSyntaxError, UnicodeDecodeError):
+                        pass
+
+    # Email templates flattened, CSS-inlined and converted to text
+    from website import emails
+    emails.precompile()
+
+    try:
+        from website.site_config import get_site_config
+        get_site_config()
+        # The content catalog and the chatbot's FAQ index built from it
+        from website import faq_search
+        faq_search.get_index()
+    except DatabaseError:
+        # Each worker loads them on its first request instead
+        logging.getLogger(__name__).exception('Could not warm the catalog')
+    finally:
+        # Workers must not share the master's database connections
+        connections.close_all()
+
+
+# =============================================================================
+# HOOKS
+# =============================================================================
+
+def when_ready(server):
+    """Runs in the master after the app is loaded, before the first fork."""
+    warm_caches()
+    gc.collect()
+    gc.freeze()
+    # The master lives as long as the server; workers inherit this too
+    gc.enable()
+    server.log.info('Caches warmed; %d objects frozen', gc.get_freeze_count())
+
+
+def post_fork(server, worker):
+    worker.requests_handled = 0
+
+
+def post_request(worker, req, environ, resp):
+    if not max_worker_memory_mb:
+        return
+    worker.requests_handled += 1
+    if worker.requests_handled % memory_check_interval:
+        return
+    used = unique_memory_mb()
+    if used > max_worker_memory_mb:
+        worker.log.info(
+            'Worker %s using %.0fMB (limit %dMB); restarting', worker.pid, used, max_worker_memory_mb,
+        )
+        worker.alive = False
+
+
+def worker_exit(server, worker):
+    # Keep the request metrics of recycled workers in the shared total
+    from website.metrics import registry
+    registry.retire()
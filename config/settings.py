@@ -3,6 +3,8 @@ Django settings for Kaffero Showcase Website.
 """
 
 import os
+import sys
+import tempfile
 from pathlib import Path
 import dj_database_url
 
@@ -15,6 +17,9 @@ SECRET_KEY = os.environ.get('SECRET_KEY', 'django-insecure-6$^1s*=4d5)__p7f2he@@
 
 DEBUG = os.environ.get('DEBUG', 'True').lower() == 'true'
 
+# Running the test suite (manage.py test)
+TESTING = sys.argv[1:2] == ['test']
+
 ALLOWED_HOSTS = os.environ.get('ALLOWED_HOSTS', 'localhost,127.0.0.1,.railway.app,kaffero.in,.kaffero.in').split(',')
 
 CSRF_TRUSTED_ORIGINS = [
@@ -40,6 +45,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'website.metrics.RequestMetricsMiddleware',  # Outermost so it times everything
+    'website.db_routing.ReplicaMiddleware',  # Before anything that queries
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Whitenoise for static files
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -54,7 +61,7 @@ ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'website.metrics.InstrumentedDjangoTemplates',  # Times template renders
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -87,6 +94,20 @@ else:
         }
     }
 
+# Optional read replica for the reads of GET requests (see website/db_routing.py)
+DATABASE_REPLICA_URL = os.environ.get('DATABASE_REPLICA_URL')
+
+if DATABASE_REPLICA_URL:
+    DATABASES['replica'] = {
+        **dj_database_url.config(default=DATABASE_REPLICA_URL, conn_max_age=600),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['website.db_routing.ReplicaRouter']
+# Seconds a browser keeps reading from the primary after a request of it wrote,
+# so it never sees its own change missing while the replica catches up
+DATABASE_REPLICA_STICKY_SECONDS = int(os.environ.get('DATABASE_REPLICA_STICKY_SECONDS', 15))
+
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -126,6 +147,46 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = os.environ.get('MEDIA_ROOT', BASE_DIR / 'media')
 
 
+# Cache
+# Besides cached pages, the default cache holds the version tokens that tell
+# every worker to reload the site settings and content catalog, so it must be
+# shared by all of them. The file-based default is only shared by the
+# processes on one host: with more than one host (or replica), set REDIS_URL
+# to a networked cache, otherwise edits reach only the workers on the host
+# that saved them. Tests get a private in-memory cache so runs never see each
+# other's entries.
+#
+# Rate limit counters need increments that are atomic across workers, which
+# the file cache cannot give, so they have their own alias: Redis when
+# configured, otherwise a table in the database (website.ratelimit.CounterCache).
+REDIS_URL = os.environ.get('REDIS_URL', '')
+
+if TESTING:
+    CACHES = {
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'ratelimit': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'ratelimit'},
+    }
+elif REDIS_URL:
+    CACHES = {
+        'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL},
+        'ratelimit': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'ratelimit',
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_LOCATION', os.path.join(tempfile.gettempdir(), 'kaffero-cache')),
+            # Past this many files a third of them are deleted at random; a
+            # lost version token only costs each worker one reload
+            'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', 10000))},
+        },
+        'ratelimit': {'BACKEND': 'website.ratelimit.CounterCache'},
+    }
+
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -133,11 +194,15 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # =============================================================================
 # SITE SETTINGS (Kaffero)
 # =============================================================================
+# These seed the SiteConfig row and are editable from the dashboard afterwards.
 
 SITE_NAME = 'Kaffero'
 SITE_TAGLINE = 'Built for cafés that never stop brewing'
 SITE_DESCRIPTION = 'Complete cafe management system with orders, tables, kitchen display, waiter app, and QR ordering.'
 
+# Absolute base URL for links in emails
+SITE_URL = os.environ.get('SITE_URL', 'https://www.kaffero.online').rstrip('/')
+
 # Company Info
 COMPANY_NAME = 'Ralfiz Technologies'
 COMPANY_EMAIL = 'kafferoapp@gmail.com'
@@ -167,6 +232,36 @@ DEFAULT_FROM_EMAIL = 'Kaffero <kafferoapp@gmail.com>'
 ADMIN_EMAIL = 'kafferoapp@gmail.com'
 
 
+# =============================================================================
+# BACKGROUND JOBS
+# =============================================================================
+# Run by `manage.py runworkers`: the `worker` process in the Procfile, or on
+# Railway a second service using railway.worker.json
+
+# Run jobs in the web process after the request commits. On by default so
+# emails still go out where no worker is deployed; set JOBS_RUN_INLINE=false
+# on the web service once a worker runs
+JOBS_RUN_INLINE = os.environ.get('JOBS_RUN_INLINE', 'True').lower() == 'true'
+# Seconds an idle worker waits before checking the queue again
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 1))
+# Seconds a claimed job may run before it is considered lost and queued again
+JOB_LEASE_SECONDS = int(os.environ.get('JOB_LEASE_SECONDS', 600))
+# Seconds before the first retry of a failed job; doubled for each further attempt
+JOB_RETRY_DELAY = int(os.environ.get('JOB_RETRY_DELAY', 60))
+
+
+# =============================================================================
+# NEWSLETTER CAMPAIGNS
+# =============================================================================
+
+# Sending limits of the SMTP provider (defaults suit a Gmail account); 0 disables
+NEWSLETTER_SEND_RATE = float(os.environ.get('NEWSLETTER_SEND_RATE', 5))      # messages per second
+NEWSLETTER_DAILY_QUOTA = int(os.environ.get('NEWSLETTER_DAILY_QUOTA', 450))  # messages per 24 hours
+# Seconds after which a claimed batch still marked 'sending' is taken to be
+# from a sender that died; must be longer than one batch takes to send
+NEWSLETTER_SEND_LEASE_SECONDS = int(os.environ.get('NEWSLETTER_SEND_LEASE_SECONDS', 600))
+
+
 # =============================================================================
 # CLOUDFLARE TURNSTILE (Spam Protection)
 # =============================================================================
@@ -175,6 +270,76 @@ TURNSTILE_SITE_KEY = os.environ.get('TURNSTILE_SITE_KEY', '')
 TURNSTILE_SECRET_KEY = os.environ.get('TURNSTILE_SECRET_KEY', '')
 
 
+# =============================================================================
+# CHATBOT
+# =============================================================================
+
+# Share of a visitor's (IDF-weighted) words an FAQ must contain for the bot to answer with it
+CHATBOT_FAQ_MIN_SCORE = float(os.environ.get('CHATBOT_FAQ_MIN_SCORE', 0.6))
+
+
+# =============================================================================
+# CHAT ARCHIVE
+# =============================================================================
+
+# Resolved conversations idle this long are compacted by `manage.py compact_chats`
+CHAT_ARCHIVE_AFTER_DAYS = int(os.environ.get('CHAT_ARCHIVE_AFTER_DAYS', 90))
+
+
+# =============================================================================
+# DEMO EXPIRY
+# =============================================================================
+
+# Demos ending within this many days are listed as expiring soon
+DEMO_EXPIRING_SOON_DAYS = int(os.environ.get('DEMO_EXPIRING_SOON_DAYS', 2))
+# Seconds between runs of the expiry sweep, a recurring job of `runworkers`
+DEMO_EXPIRY_INTERVAL = int(os.environ.get('DEMO_EXPIRY_INTERVAL', 300))
+
+
+# =============================================================================
+# LIVE DASHBOARD FEED
+# =============================================================================
+
+# Without Postgres LISTEN/NOTIFY, each process checks for new rows this often
+LIVE_FEED_POLL_INTERVAL = float(os.environ.get('LIVE_FEED_POLL_INTERVAL', 3))
+# How long the browser waits before reconnecting (each WSGI request returns at once)
+LIVE_FEED_RETRY_SECONDS = float(os.environ.get('LIVE_FEED_RETRY_SECONDS', 5))
+# How long one feed stays open under ASGI
+LIVE_FEED_STREAM_SECONDS = int(os.environ.get('LIVE_FEED_STREAM_SECONDS', 300))
+# Recent events kept in memory per process for reconnecting browsers
+LIVE_FEED_BUFFER = int(os.environ.get('LIVE_FEED_BUFFER', 200))
+
+
+# =============================================================================
+# RATE LIMITING
+# =============================================================================
+# Per-client limits on the public write endpoints, per 'ip' and per browser
+# 'session'. Rates are '<count>/<s|m|h|d>'.
+
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'True').lower() == 'true'
+RATE_LIMIT_CACHE = 'ratelimit'
+RATE_LIMITS = {
+    'chat': {'ip': '60/m', 'session': '20/m'},
+    'demo': {'ip': '10/h', 'session': '5/h'},
+    'contact': {'ip': '10/h', 'session': '5/h'},
+    'newsletter': {'ip': '20/h', 'session': '5/h'},
+}
+
+# Number of proxies in front of the app that append to X-Forwarded-For
+# (1 on Railway). 0 trusts the first address, which clients can forge.
+TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS', 0))
+
+
+# =============================================================================
+# SPAM PRE-FILTER
+# =============================================================================
+# Local checks on demo/contact submissions, run before Turnstile
+
+SPAM_REJECT_SCORE = int(os.environ.get('SPAM_REJECT_SCORE', 5))
+# Submissions sooner than this after the form was rendered look automated
+SPAM_MIN_SUBMIT_SECONDS = int(os.environ.get('SPAM_MIN_SUBMIT_SECONDS', 3))
+
+
 # =============================================================================
 # PRICING CONFIGURATION
 # =============================================================================
@@ -213,6 +378,26 @@ PRICING = {
 # Annual renewal fee (percentage of license)
 RENEWAL_FEE_PERCENT = 20
 
+# Seconds a worker trusts its SiteConfig snapshot before checking the
+# shared version again
+SITE_CONFIG_CHECK_INTERVAL = int(os.environ.get('SITE_CONFIG_CHECK_INTERVAL', 5))
+# Likewise for its catalog of features, FAQs, screenshots and testimonials
+CATALOG_CHECK_INTERVAL = int(os.environ.get('CATALOG_CHECK_INTERVAL', 5))
+
+
+# =============================================================================
+# METRICS
+# =============================================================================
+
+# Directory shared by all gunicorn workers for per-process metric files
+METRICS_DIR = os.environ.get('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'kaffero-metrics'))
+# Seconds between writes of a worker's metrics to METRICS_DIR
+METRICS_FLUSH_INTERVAL = int(os.environ.get('METRICS_FLUSH_INTERVAL', 10))
+# Optional bearer token so Prometheus can scrape /dashboard/metrics without a session
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+# Add a Server-Timing header (DB queries, template and total time) to responses
+METRICS_SERVER_TIMING = os.environ.get('METRICS_SERVER_TIMING', 'False').lower() == 'true'
+
 
 # =============================================================================
 # SECURITY SETTINGS (Production)
@@ -6,10 +6,12 @@ from django.contrib import admin
 from django.contrib.admin import AdminSite
 from django.urls import path
 from django.shortcuts import render
+from django.utils import timezone
 from .models import (
     DemoRequest, ContactMessage, NewsletterSubscriber,
-    Testimonial, FAQ, Feature, Screenshot, BlogPost
+    Testimonial, FAQ, Feature, Screenshot, BlogPost, DemoStatusChange, Job
 )
+from . import funnel
 
 
 class KafferoAdminSite(AdminSite):
@@ -49,6 +51,18 @@ class KafferoAdminSite(AdminSite):
 kaffero_admin = KafferoAdminSite(name='kaffero_admin')
 
 
+class DemoStatusChangeInline(admin.TabularInline):
+    """Read-only status history of a demo request."""
+    model = DemoStatusChange
+    fields = ['changed_at', 'from_status', 'to_status', 'changed_by']
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
 class DemoRequestAdmin(admin.ModelAdmin):
     list_display = ['cafe_name', 'contact_name', 'city', 'phone', 'status', 'created_at']
     list_filter = ['status', 'source', 'city', 'created_at']
@@ -77,6 +91,13 @@ class DemoRequestAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
+    inlines = [DemoStatusChangeInline]
+
+    def save_model(self, request, obj, form, change):
+        """Record status changes in the funnel; the admin saves in a transaction."""
+        if change and 'status' in form.changed_data:
+            funnel.record(obj, form.initial['status'], obj.status, request.user)
+        super().save_model(request, obj, form, change)
 
 
 class ContactMessageAdmin(admin.ModelAdmin):
@@ -131,6 +152,22 @@ class BlogPostAdmin(admin.ModelAdmin):
     ordering = ['-created_at']
 
 
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['task', 'status', 'priority', 'attempts', 'run_at', 'finished_at']
+    list_filter = ['status', 'task']
+    search_fields = ['task', 'unique_key', 'last_error']
+    readonly_fields = ['locked_by', 'locked_until', 'last_error', 'created_at', 'finished_at']
+    ordering = ['-created_at']
+    actions = ['requeue']
+
+    @admin.action(description='Queue selected jobs again')
+    def requeue(self, request, queryset):
+        count = queryset.exclude(status=Job.Status.RUNNING).update(
+            status=Job.Status.QUEUED, run_at=timezone.now(), attempts=0, last_error='', finished_at=None,
+        )
+        self.message_user(request, f'{count} jobs queued again.')
+
+
 # Register with custom admin site
 kaffero_admin.register(DemoRequest, DemoRequestAdmin)
 kaffero_admin.register(ContactMessage, ContactMessageAdmin)
@@ -140,6 +177,7 @@ kaffero_admin.register(FAQ, FAQAdmin)
 kaffero_admin.register(Feature, FeatureAdmin)
 kaffero_admin.register(Screenshot, ScreenshotAdmin)
 kaffero_admin.register(BlogPost, BlogPostAdmin)
+kaffero_admin.register(Job, JobAdmin)
 
 # Also register with default admin site for compatibility
 admin.site.register(DemoRequest, DemoRequestAdmin)
@@ -150,3 +188,4 @@ admin.site.register(FAQ, FAQAdmin)
 admin.site.register(Feature, FeatureAdmin)
 admin.site.register(Screenshot, ScreenshotAdmin)
 admin.site.register(BlogPost, BlogPostAdmin)
+admin.site.register(Job, JobAdmin)
@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class WebsiteConfig(AppConfig):
     name = 'website'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        # Registers the background tasks with website.jobs
+        from . import tasks  # noqa: F401
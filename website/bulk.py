@@ -0,0 +1,107 @@
+"""
+Bulk actions for the dashboard lists.
+
+A bulk form posts either the ticked rows of the current page (``ids``) or
+``select_all`` with the list's query string (``filters``), meaning every row
+the list's filters match, so acting on thousands of rows never sends their
+ids. ``run()`` applies an action as ``update()`` / ``delete()`` statements
+over primary key batches of ``BATCH_SIZE``, each in its own transaction, so
+locks stay short and memory flat however large the selection is.
+"""
+
+from collections import namedtuple
+
+from django.db import transaction
+from django.http import QueryDict
+from django.utils import timezone
+
+from . import funnel
+from .models import DemoRequest
+
+BATCH_SIZE = 1000
+
+# ``apply(queryset, user)`` acts on one batch and returns the rows changed
+Action = namedtuple('Action', ['label', 'done', 'apply'])
+
+
+def selection(filter_rows, data):
+    """The rows a bulk form selected; ``filter_rows`` is the list's filter function."""
+    if data.get('select_all'):
+        return filter_rows(QueryDict(data.get('filters', '')))
+    ids = [int(pk) for pk in data.getlist('ids') if pk.isdigit()]
+    return filter_rows(QueryDict()).filter(pk__in=ids)
+
+
+def run(queryset, action, user=None, batch_size=BATCH_SIZE):
+    """Apply ``action`` to every row of ``queryset``; returns the rows changed."""
+    ids = queryset.order_by('pk').values_list('pk', flat=True)
+    model = queryset.model
+    changed, last = 0, 0
+    while True:
+        batch = list(ids.filter(pk__gt=last)[:batch_size])
+        if not batch:
+            return changed
+        last = batch[-1]
+        with transaction.atomic():
+            changed += action.apply(model.objects.filter(pk__in=batch), user)
+        if len(batch) < batch_size:
+            return changed
+
+
+def delete(queryset, user):
+    count, by_model = queryset.delete()
+    return by_model.get(queryset.model._meta.label, 0)
+
+
+def updater(**values):
+    """An ``apply`` setting ``values``; callables are called once per batch.
+
+    Rows whose first field already has its new value are left alone, so
+    e.g. unsubscribing twice keeps the original ``unsubscribed_at``.
+    """
+    def apply(queryset, user):
+        values_now = {field: value() if callable(value) else value for field, value in values.items()}
+        first = next(iter(values))
+        return queryset.exclude(**{first: values_now[first]}).update(**values_now)
+    return apply
+
+
+def demo_status(status):
+    def apply(queryset, user):
+        return funnel.record_bulk(queryset, status, user)
+    return apply
+
+
+DELETE = Action('Delete', 'deleted', delete)
+
+DEMO_ACTIONS = {
+    **{
+        f'status:{value}': Action(f'Mark {label}', f'marked {label.lower()}', demo_status(value))
+        for value, label in DemoRequest.Status.choices
+    },
+    'delete': DELETE,
+}
+
+MESSAGE_ACTIONS = {
+    'read': Action('Mark read', 'marked read', updater(is_read=True)),
+    'unread': Action('Mark unread', 'marked unread', updater(is_read=False)),
+    'replied': Action('Mark replied', 'marked replied', updater(is_replied=True, is_read=True, replied_at=timezone.now)),
+    'delete': DELETE,
+}
+
+CHAT_ACTIONS = {
+    'resolve': Action('Mark resolved', 'marked resolved', updater(is_resolved=True, updated_at=timezone.now)),
+    'unresolve': Action('Reopen', 'reopened', updater(is_resolved=False, updated_at=timezone.now)),
+    'delete': DELETE,
+}
+
+SUBSCRIBER_ACTIONS = {
+    'unsubscribe': Action('Unsubscribe', 'unsubscribed', updater(is_active=False, unsubscribed_at=timezone.now)),
+    'resubscribe': Action('Resubscribe', 'resubscribed', updater(is_active=True, unsubscribed_at=None)),
+    'delete': DELETE,
+}
+
+
+def choices(actions):
+    """``[(value, label)]`` for the action menu."""
+    return [(value, action.label) for value, action in actions.items()]
@@ -0,0 +1,225 @@
+"""
+Newsletter campaign sending for Kaffero website.
+
+``queue_recipients`` snapshots the active subscribers into
+``CampaignRecipient`` rows; ``send_campaign`` then works through the pending
+rows in batches:
+
+- the campaign is rendered once and only the unsubscribe link is filled in
+  per recipient
+- every batch goes out over one open connection from ``get_connection()``
+- sending is paced to ``NEWSLETTER_SEND_RATE`` messages per second and stops
+  (status ``paused``) once ``NEWSLETTER_DAILY_QUOTA`` messages have been sent
+  in the last 24 hours
+
+A batch is claimed (``pending`` -> ``sending``) before any of it is sent and
+each row is marked ``sent`` or ``failed`` afterwards. If the process dies in
+between, a later run marks the rows still in ``sending`` after
+``NEWSLETTER_SEND_LEASE_SECONDS`` as failed instead of sending them again: a
+recipient may miss a campaign, but never gets it twice. Younger claims
+belong to a sender still running, which may work alongside. ``retry_failed``
+requeues failures on request.
+
+Recipients who unsubscribed (or were deleted) after the campaign was queued,
+e.g. while it was paused by the quota, are marked ``skipped`` when their
+batch comes up instead of being sent.
+"""
+
+import smtplib
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import Q
+from django.urls import reverse
+from django.utils import timezone
+
+from .emails import inline_css, render_email
+from .models import Campaign, CampaignRecipient, NewsletterSubscriber
+from .newsletter import unsubscribe_token
+
+BATCH_SIZE = 100
+
+# Replaced with each recipient's unsubscribe URL after rendering
+UNSUBSCRIBE_PLACEHOLDER = '%%UNSUBSCRIBE_URL%%'
+
+INTERRUPTED_ERROR = 'Interrupted while sending; not retried automatically to avoid a duplicate'
+
+
+def queue_recipients(campaign, batch_size=1000):
+    """Add every active subscriber not yet queued for ``campaign``."""
+    subscribers = NewsletterSubscriber.objects.filter(is_active=True).order_by('pk').values_list('pk', 'email')
+    batch = []
+    queued = 0
+    for subscriber_id, email in subscribers.iterator(chunk_size=batch_size):
+        batch.append(CampaignRecipient(campaign=campaign, subscriber_id=subscriber_id, email=email))
+        if len(batch) >= batch_size:
+            queued += len(CampaignRecipient.objects.bulk_create(batch, ignore_conflicts=True))
+            batch = []
+    if batch:
+        queued += len(CampaignRecipient.objects.bulk_create(batch, ignore_conflicts=True))
+    return queued
+
+
+def retry_failed(campaign):
+    """Requeue the failed recipients of ``campaign``."""
+    return campaign.recipients.filter(status=CampaignRecipient.Status.FAILED).update(
+        status=CampaignRecipient.Status.PENDING, error='',
+    )
+
+
+def render_campaign(campaign):
+    """Render ``campaign`` once; returns ``(html, text)`` with a link placeholder."""
+    html, text = render_email('emails/newsletter_campaign.html', {
+        'campaign': campaign,
+        'unsubscribe_url': UNSUBSCRIBE_PLACEHOLDER,
+    })
+    # The body is authored in the dashboard and may bring its own <style>
+    return inline_css(html), text
+
+
+def unsubscribe_url(subscriber_id):
+    path = reverse('newsletter_unsubscribe', kwargs={'token': unsubscribe_token(subscriber_id)})
+    return f'{settings.SITE_URL}{path}'
+
+
+def build_message(campaign, recipient, html, text, connection):
+    url = unsubscribe_url(recipient.subscriber_id) if recipient.subscriber_id else settings.SITE_URL
+    message = EmailMultiAlternatives(
+        subject=campaign.subject,
+        body=text.replace(UNSUBSCRIBE_PLACEHOLDER, url),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[recipient.email],
+        connection=connection,
+        headers={
+            'List-Unsubscribe': f'<{url}>',
+            'List-Unsubscribe-Post': 'List-Unsubscribe=One-Click',
+        },
+    )
+    message.attach_alternative(html.replace(UNSUBSCRIBE_PLACEHOLDER, url), 'text/html')
+    return message
+
+
+def deliver(message, connection):
+    """Send ``message``, reconnecting once if the server dropped the session."""
+    try:
+        message.send()
+    except smtplib.SMTPServerDisconnected:
+        connection.close()
+        connection.open()
+        message.send()
+
+
+def sent_in_last_day():
+    since = timezone.now() - timedelta(days=1)
+    return CampaignRecipient.objects.filter(sent_at__gte=since).count()
+
+
+def skip_unsubscribed(campaign):
+    """Mark the pending recipients who are no longer active subscribers as skipped."""
+    return campaign.recipients.filter(status=CampaignRecipient.Status.PENDING).filter(
+        Q(subscriber__isnull=True) | Q(subscriber__is_active=False)
+    ).update(status=CampaignRecipient.Status.SKIPPED)
+
+
+def claim_batch(campaign, size):
+    """Move up to ``size`` pending recipients to ``sending`` and return them."""
+    with transaction.atomic():
+        skip_unsubscribed(campaign)
+        ids = list(
+            campaign.recipients.filter(status=CampaignRecipient.Status.PENDING, subscriber__is_active=True)
+            .order_by('id').values_list('id', flat=True)[:size]
+        )
+        # The status condition keeps a concurrent sender from claiming them too
+        CampaignRecipient.objects.filter(id__in=ids, status=CampaignRecipient.Status.PENDING).update(
+            status=CampaignRecipient.Status.SENDING, claimed_at=timezone.now(),
+        )
+    return list(CampaignRecipient.objects.filter(id__in=ids, status=CampaignRecipient.Status.SENDING))
+
+
+class RateLimiter:
+    """Sleep as needed to stay at or below ``rate`` calls per second."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_at = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if now < self.next_at:
+            time.sleep(self.next_at - now)
+        self.next_at = max(now, self.next_at) + self.interval
+
+
+def send_campaign(campaign, batch_size=BATCH_SIZE, rate=None, daily_quota=None, log=None):
+    """Send every pending recipient of ``campaign``; returns counts by outcome."""
+    rate = settings.NEWSLETTER_SEND_RATE if rate is None else rate
+    daily_quota = settings.NEWSLETTER_DAILY_QUOTA if daily_quota is None else daily_quota
+    log = log or (lambda message: None)
+    counts = {'sent': 0, 'failed': 0, 'interrupted': 0}
+
+    # Rows left in 'sending' by a run that died may already have been
+    # delivered; younger claims are a concurrent run's batch in flight
+    expired = timezone.now() - timedelta(seconds=settings.NEWSLETTER_SEND_LEASE_SECONDS)
+    counts['interrupted'] = campaign.recipients.filter(status=CampaignRecipient.Status.SENDING).filter(
+        Q(claimed_at__lt=expired) | Q(claimed_at__isnull=True)
+    ).update(status=CampaignRecipient.Status.FAILED, error=INTERRUPTED_ERROR)
+    if counts['interrupted']:
+        log(f"Marked {counts['interrupted']} interrupted recipients as failed")
+
+    if campaign.status == Campaign.Status.DRAFT:
+        log(f'Queued {queue_recipients(campaign)} recipients')
+    Campaign.objects.filter(pk=campaign.pk, started_at__isnull=True).update(started_at=timezone.now())
+    Campaign.objects.filter(pk=campaign.pk).update(status=Campaign.Status.SENDING)
+
+    html, text = render_campaign(campaign)
+    limiter = RateLimiter(rate)
+    remaining_quota = daily_quota - sent_in_last_day() if daily_quota else None
+
+    connection = get_connection(fail_silently=False)
+    connection.open()
+    try:
+        while True:
+            size = batch_size if remaining_quota is None else min(batch_size, remaining_quota)
+            if size <= 0:
+                Campaign.objects.filter(pk=campaign.pk).update(status=Campaign.Status.PAUSED)
+                log(f'Daily quota of {daily_quota} reached; paused')
+                return counts
+
+            batch = claim_batch(campaign, size)
+            if not batch:
+                break
+
+            sent, failed = [], {}
+            for recipient in batch:
+                limiter.wait()
+                message = build_message(campaign, recipient, html, text, connection)
+                try:
+                    deliver(message, connection)
+                except Exception as exc:
+                    failed[recipient.id] = str(exc)
+                else:
+                    sent.append(recipient.id)
+
+            now = timezone.now()
+            CampaignRecipient.objects.filter(id__in=sent).update(
+                status=CampaignRecipient.Status.SENT, sent_at=now, error='',
+            )
+            for recipient_id, error in failed.items():
+                CampaignRecipient.objects.filter(id=recipient_id).update(
+                    status=CampaignRecipient.Status.FAILED, error=error[:1000],
+                )
+            counts['sent'] += len(sent)
+            counts['failed'] += len(failed)
+            if remaining_quota is not None:
+                remaining_quota -= len(sent)
+            log(f"Sent {counts['sent']}, failed {counts['failed']}")
+    finally:
+        connection.close()
+
+    Campaign.objects.filter(pk=campaign.pk).update(status=Campaign.Status.SENT, finished_at=timezone.now())
+    return counts
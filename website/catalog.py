@@ -0,0 +1,115 @@
+"""
+Process-local catalog of the small content tables.
+
+Features, FAQs, screenshots and testimonials are shown on most public pages
+but edited a few times a month, so each worker keeps an immutable snapshot
+of their active rows, with the lookups the views need (features by slug,
+FAQs by category), and those pages run no queries for them.
+
+As with the site configuration, a version token in the shared cache tells
+workers when any process saved or deleted one of these rows. It is checked
+at most every ``CATALOG_CHECK_INTERVAL`` seconds, and a changed version
+reloads the whole catalog (one query per table) on the next request that
+reads it.
+
+If that reload fails, the worker keeps its previous snapshot and retries on
+its next check; a worker without one raises, except before the tables are
+migrated, when it serves an empty catalog until they are.
+"""
+
+import logging
+import time
+import uuid
+from collections import defaultdict
+from types import MappingProxyType
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connections, router
+
+from .models import FAQ, Feature, Screenshot, Testimonial
+
+logger = logging.getLogger(__name__)
+
+VERSION_CACHE_KEY = 'catalog:version'
+
+MODELS = (Feature, FAQ, Screenshot, Testimonial)
+
+_catalog = None
+_version = None
+_checked_at = 0.0
+
+
+class Catalog:
+    """Active features, FAQs, screenshots and testimonials, in their display order."""
+
+    def __init__(self, features=(), faqs=(), screenshots=(), testimonials=()):
+        self.features = tuple(features)
+        self.highlighted_features = tuple(feature for feature in self.features if feature.is_highlighted)
+        self.features_by_slug = MappingProxyType({feature.slug: feature for feature in self.features})
+
+        self.faqs = tuple(faqs)
+        by_category = defaultdict(list)
+        for faq in self.faqs:
+            by_category[faq.category].append(faq)
+        self.faqs_by_category = MappingProxyType({category: tuple(faqs) for category, faqs in by_category.items()})
+
+        self.screenshots = tuple(screenshots)
+        self.testimonials = tuple(testimonials)
+        self.featured_testimonials = tuple(testimonial for testimonial in self.testimonials if testimonial.is_featured)
+
+    def faqs_in(self, category):
+        return self.faqs_by_category.get(category, ())
+
+    def related_features(self, feature, count=4):
+        """Up to ``count`` other features, in display order."""
+        return tuple(other for other in self.features if other.pk != feature.pk)[:count]
+
+
+def _load():
+    """Read the active rows."""
+    return Catalog(*(list(model.objects.filter(is_active=True)) for model in MODELS))
+
+
+def _migrated():
+    """Whether every catalog table exists (False if that cannot be checked either)."""
+    try:
+        tables = set(connections[router.db_for_read(Feature)].introspection.table_names())
+    except DatabaseError:
+        return False
+    return all(model._meta.db_table in tables for model in MODELS)
+
+
+def get_catalog():
+    """Return the current catalog snapshot for this process."""
+    global _catalog, _version, _checked_at
+
+    now = time.monotonic()
+    if _catalog is not None and now - _checked_at < settings.CATALOG_CHECK_INTERVAL:
+        return _catalog
+
+    shared_version = cache.get(VERSION_CACHE_KEY)
+    if shared_version is None:
+        cache.add(VERSION_CACHE_KEY, uuid.uuid4().hex, timeout=None)
+        shared_version = cache.get(VERSION_CACHE_KEY)
+    if _catalog is None or shared_version != _version:
+        try:
+            _catalog = _load()
+            _version = shared_version
+        except DatabaseError:
+            if _catalog is not None:
+                logger.exception('Could not reload the catalog; keeping the previous one')
+            elif not _migrated():
+                # Leaves _version unset, so the next check tries again
+                _catalog = Catalog()
+            else:
+                raise
+    _checked_at = now
+    return _catalog
+
+
+def invalidate():
+    """Publish a new version so every process (this one on its next read) reloads."""
+    global _checked_at
+    cache.set(VERSION_CACHE_KEY, uuid.uuid4().hex, timeout=None)
+    _checked_at = 0.0
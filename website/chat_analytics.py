@@ -0,0 +1,135 @@
+"""
+Daily chat analytics for Kaffero website.
+
+Two rollup tables hold everything the analytics page shows, so its queries
+read one row per day (and intent) however many messages there are:
+
+- ``ChatDailyStats``: conversations started, messages, visitor messages and
+  leads per day
+- ``ChatIntentDaily``: visitor messages per day and intent
+
+``record_turn()`` adds each chat turn with an upsert per table as the turn
+is written. Leads are counted on the day their conversation started.
+``rebuild()`` (``manage.py rebuild_chat_rollups``) recomputes days from the
+live and archived messages; it is idempotent and picks up changes made
+outside the chat view, such as leads marked by staff or found by
+``backfill_chat_leads``.
+"""
+
+from collections import Counter, defaultdict
+from datetime import datetime, time
+
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .chat_archive import decode
+from .models import ChatArchive, ChatConversation, ChatDailyStats, ChatIntentDaily, ChatMessage
+from .rollups import increment
+
+# (intent, label, keywords), checked in order; the first keyword found in
+# the lowercased message decides the intent and the bot's answer
+INTENTS = [
+    ('greeting', 'Greeting', ['hi', 'hello', 'hey', 'good morning', 'good evening']),
+    ('pricing', 'Pricing', ['price', 'cost', 'pricing', 'how much', 'rate', 'fees']),
+    ('demo', 'Demo', ['demo', 'trial', 'try', 'test']),
+    ('features', 'Features', ['feature', 'what can', 'capabilities', 'does it']),
+    ('qr_ordering', 'QR Ordering', ['qr', 'scan']),
+    ('kitchen', 'Kitchen Display', ['kitchen', 'kot']),
+    ('support', 'Support', ['support', 'help', 'problem', 'issue']),
+    ('contact', 'Contact', ['contact', 'phone', 'call', 'whatsapp', 'email']),
+    ('cafe_details', 'Cafe Details', ['my cafe', 'cafe name', 'my restaurant']),
+    ('thanks', 'Thanks', ['thank', 'thanks', 'thx']),
+    ('bye', 'Goodbye', ['bye', 'goodbye', 'see you']),
+]
+OTHER = 'other'
+INTENT_LABELS = {intent: label for intent, label, keywords in INTENTS} | {OTHER: 'Other'}
+
+STAT_FIELDS = ['conversations', 'messages', 'visitor_messages', 'leads']
+
+
+def classify(message):
+    """The intent of a visitor message."""
+    text = message.lower()
+    for intent, label, keywords in INTENTS:
+        if any(keyword in text for keyword in keywords):
+            return intent
+    return OTHER
+
+
+def record_turn(conversation, intent, new_conversation=False, new_lead=False):
+    """Count a visitor message and the bot's reply in today's rollups."""
+    day = timezone.localdate()
+    counts = {'messages': 2, 'visitor_messages': 1, 'conversations': int(new_conversation)}
+    if new_lead:
+        lead_day = timezone.localdate(conversation.created_at)
+        if lead_day == day:
+            counts['leads'] = 1
+        else:
+            increment(ChatDailyStats, {'day': lead_day}, {'leads': 1})
+    increment(ChatDailyStats, {'day': day}, counts)
+    increment(ChatIntentDaily, {'day': day, 'intent': intent}, {'count': 1})
+
+
+def record_lead(conversation):
+    """Count a conversation marked as a lead by staff."""
+    increment(ChatDailyStats, {'day': timezone.localdate(conversation.created_at)}, {'leads': 1})
+
+
+def rebuild(since=None):
+    """Recompute the rollups for ``since`` (a date) onwards, or for all days.
+
+    Returns the number of days written.
+    """
+    start = timezone.make_aware(datetime.combine(since, time.min)) if since else None
+    stats = defaultdict(Counter)
+    intents = Counter()
+
+    conversations = ChatConversation.objects.all()
+    messages = ChatMessage.objects.all()
+    archives = ChatArchive.objects.all()
+    if start:
+        conversations = conversations.filter(created_at__gte=start)
+        messages = messages.filter(created_at__gte=start)
+        archives = archives.filter(conversation__updated_at__gte=start)
+
+    for row in conversations.annotate(day=TruncDate('created_at')).values('day').annotate(
+        total=Count('id'), leads=Count('id', filter=Q(is_lead=True)),
+    ):
+        stats[row['day']]['conversations'] += row['total']
+        stats[row['day']]['leads'] += row['leads']
+
+    for row in messages.annotate(day=TruncDate('created_at')).values('day', 'role').annotate(total=Count('id')):
+        stats[row['day']]['messages'] += row['total']
+        if row['role'] == ChatMessage.Role.USER:
+            stats[row['day']]['visitor_messages'] += row['total']
+
+    visitor_messages = messages.filter(role=ChatMessage.Role.USER).values_list('created_at', 'content')
+    for created_at, content in visitor_messages.iterator(chunk_size=5000):
+        intents[(timezone.localdate(created_at), classify(content))] += 1
+
+    # Archived messages are only stored in the compressed transcripts
+    for blob in archives.values_list('transcript', flat=True).iterator(chunk_size=100):
+        for role, content, created_at in decode(blob):
+            created_at = datetime.fromisoformat(created_at)
+            if start and created_at < start:
+                continue
+            day = timezone.localdate(created_at)
+            stats[day]['messages'] += 1
+            if role == ChatMessage.Role.USER:
+                stats[day]['visitor_messages'] += 1
+                intents[(day, classify(content))] += 1
+
+    with transaction.atomic():
+        for model in (ChatDailyStats, ChatIntentDaily):
+            existing = model.objects.filter(day__gte=since) if since else model.objects.all()
+            existing.delete()
+        ChatDailyStats.objects.bulk_create(
+            [ChatDailyStats(day=day, **counts) for day, counts in sorted(stats.items())], batch_size=500,
+        )
+        ChatIntentDaily.objects.bulk_create(
+            [ChatIntentDaily(day=day, intent=intent, count=count) for (day, intent), count in sorted(intents.items())],
+            batch_size=500,
+        )
+    return len(stats)
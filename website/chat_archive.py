@@ -0,0 +1,275 @@
+"""
+Chat history compaction for Kaffero website.
+
+Every visitor message adds two ``ChatMessage`` rows, and they used to stay
+forever. ``compact()`` takes resolved conversations that have not been
+updated for ``CHAT_ARCHIVE_AFTER_DAYS``, folds their messages into one
+transcript in ``ChatArchive`` and deletes the message rows, so the hot
+table only holds recent and open conversations.
+
+A transcript is stored as chunks of ``CHUNK_SIZE`` messages, each its own
+zlib-compressed JSON list, laid end to end with their byte offsets in
+``chunk_offsets``. Every chunk but the last is full, so the chunk holding
+message ``i`` is ``i // chunk_size``. Reading a page of an archived
+conversation fetches and decodes one chunk, however long the conversation,
+and continuing an archived conversation rewrites only its last chunk.
+
+``transcript()`` returns a conversation's messages whether they are archived,
+live or both (a visitor can come back to an archived conversation), so the
+dashboard and exports do not need to know where they are stored.
+``transcript_page()`` does the same a page at a time, newest first, walking
+back through the live rows by ``(created_at, id)`` and then into the
+archive, one chunk per page.
+"""
+
+import json
+import zlib
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import BinaryField, Exists, OuterRef, Q
+from django.db.models.functions import Substr
+from django.utils import timezone
+
+from .models import ChatArchive, ChatConversation, ChatMessage
+
+BATCH_SIZE = 200
+
+# Messages per transcript page, and the most a caller may ask for
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Messages per compressed chunk of a new archive
+CHUNK_SIZE = 100
+
+
+class ArchivedMessage:
+    """Read-only stand-in for a ``ChatMessage`` restored from an archive."""
+
+    def __init__(self, role, content, created_at):
+        self.role = role
+        self.content = content
+        self.created_at = datetime.fromisoformat(created_at)
+
+    def get_role_display(self):
+        return ChatMessage.Role(self.role).label
+
+
+def encode(entries, chunk_size=None):
+    """Compress ``[role, content, created_at]`` entries in chunks of ``chunk_size``.
+
+    Returns ``(blob, chunk offsets, raw size)``.
+    """
+    chunk_size = chunk_size or CHUNK_SIZE
+    chunks, offsets, position, raw_size = [], [], 0, 0
+    for start in range(0, len(entries), chunk_size):
+        raw = json.dumps(entries[start:start + chunk_size], ensure_ascii=False, separators=(',', ':')).encode()
+        chunk = zlib.compress(raw, 9)
+        chunks.append(chunk)
+        offsets.append(position)
+        position += len(chunk)
+        raw_size += len(raw)
+    return b''.join(chunks), offsets, raw_size
+
+
+def decode(blob):
+    """Every entry of ``blob``, a run of chunks (or a single one)."""
+    data = bytes(blob)
+    entries = []
+    while data:
+        stream = zlib.decompressobj()
+        entries.extend(json.loads(stream.decompress(data)))
+        data = stream.unused_data
+    return entries
+
+
+def read_chunk(archive, index):
+    """The entries of chunk ``index`` of ``archive``, fetching only that chunk's bytes."""
+    offsets = archive.chunk_offsets
+    start = offsets[index]
+    end = offsets[index + 1] if index + 1 < len(offsets) else None
+    if 'transcript' not in archive.get_deferred_fields():
+        return decode(bytes(archive.transcript)[start:end])
+    length = [] if end is None else [end - start]
+    blob = ChatArchive.objects.filter(pk=archive.pk).annotate(
+        chunk=Substr('transcript', start + 1, *length, output_field=BinaryField()),
+    ).values_list('chunk', flat=True).get()
+    return decode(blob)
+
+
+def append(archive, entries):
+    """Add ``entries`` to ``archive``, re-encoding only its last chunk."""
+    if not archive.chunk_offsets:
+        archive.chunk_size = archive.chunk_size or CHUNK_SIZE
+        archive.transcript, archive.chunk_offsets, archive.raw_size = encode(entries, archive.chunk_size)
+        archive.message_count = len(entries)
+        return
+    last = archive.chunk_offsets[-1]
+    blob = bytes(archive.transcript)
+    tail = decode(blob[last:])
+    chunks, offsets, raw_size = encode(tail + entries, archive.chunk_size)
+    archive.transcript = blob[:last] + chunks
+    archive.chunk_offsets = archive.chunk_offsets[:-1] + [last + offset for offset in offsets]
+    archive.raw_size += raw_size - len(json.dumps(tail, ensure_ascii=False, separators=(',', ':')).encode())
+    archive.message_count += len(entries)
+
+
+def archive_of(conversation):
+    """``conversation``'s ``ChatArchive``, or None if it has never been compacted."""
+    try:
+        return conversation.archive
+    except ChatArchive.DoesNotExist:
+        return None
+
+
+def transcript(conversation):
+    """Every message of ``conversation`` in order, archived ones first."""
+    archive = archive_of(conversation)
+    archived = [ArchivedMessage(*entry) for entry in decode(archive.transcript)] if archive else []
+    return archived + list(conversation.messages.order_by('created_at', 'id'))
+
+
+def parse_cursor(cursor):
+    """``'<created_at>|<id>'`` or ``'archive:<index>'``; raises ValueError if malformed."""
+    if cursor.startswith('archive:'):
+        return 'archive', int(cursor.split(':', 1)[1])
+    created_at, message_id = cursor.rsplit('|', 1)
+    return 'live', (datetime.fromisoformat(created_at), int(message_id))
+
+
+def transcript_page(conversation, before=None, limit=PAGE_SIZE):
+    """Up to ``limit`` messages older than the ``before`` cursor (the newest when None).
+
+    Returns ``(messages oldest first, cursor for the page before or None)``.
+    Only touches the archive once the live messages run out.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    kind, position = parse_cursor(before) if before else ('live', None)
+
+    page = []
+    if kind == 'live':
+        live = conversation.messages.order_by('-created_at', '-id')
+        if position:
+            created_at, message_id = position
+            live = live.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=message_id))
+        page = list(live[:limit + 1])
+        page.reverse()
+        if len(page) > limit:
+            page = page[1:]
+            return page, f'{page[0].created_at.isoformat()}|{page[0].pk}'
+
+    # Live messages exhausted; continue with the archived ones, never
+    # further back than the start of the chunk holding the newest of them
+    archive = archive_of(conversation)
+    if archive is None:
+        return page, None
+    end = archive.message_count if kind == 'live' else position
+    start = end
+    if end > 0 and len(page) < limit:
+        index = (end - 1) // archive.chunk_size
+        chunk_start = index * archive.chunk_size
+        start = max(end - (limit - len(page)), chunk_start)
+        entries = read_chunk(archive, index)[start - chunk_start:end - chunk_start]
+        page = [ArchivedMessage(*entry) for entry in entries] + page
+    return page, f'archive:{start}' if start > 0 else None
+
+
+def archived_transcripts(conversation_ids):
+    """``{conversation_id: [[role, content, created_at], ...]}`` for archived conversations."""
+    archives = ChatArchive.objects.filter(conversation_id__in=conversation_ids)
+    return {
+        conversation_id: decode(blob)
+        for conversation_id, blob in archives.values_list('conversation_id', 'transcript')
+    }
+
+
+def candidates(cutoff):
+    """Resolved conversations idle since before ``cutoff`` that still have message rows."""
+    return ChatConversation.objects.filter(
+        is_resolved=True,
+        updated_at__lt=cutoff,
+    ).filter(Exists(ChatMessage.objects.filter(conversation=OuterRef('pk'))))
+
+
+def table_size(model):
+    """Bytes used by ``model``'s table and indexes, or None if the database can't say."""
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        try:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT pg_total_relation_size(%s)', [table])
+            elif connection.vendor == 'sqlite':
+                # Bytes in use on each b-tree's pages, i.e. the size after VACUUM
+                cursor.execute(
+                    'SELECT SUM(pgsize - unused) FROM dbstat WHERE name = %s OR name IN '
+                    '(SELECT name FROM sqlite_master WHERE type = %s AND tbl_name = %s)',
+                    [table, 'index', table],
+                )
+            else:
+                return None
+        except DatabaseError:
+            return None
+        return cursor.fetchone()[0]
+
+
+def compact(days=None, batch_size=BATCH_SIZE, dry_run=False, log=None):
+    """Archive the messages of resolved conversations idle for ``days``.
+
+    Returns counts: ``conversations``, ``messages``, ``raw_bytes`` (the
+    transcripts as JSON) and ``compressed_bytes``.
+    """
+    days = settings.CHAT_ARCHIVE_AFTER_DAYS if days is None else days
+    log = log or (lambda message: None)
+    cutoff = timezone.now() - timedelta(days=days)
+    stats = {'conversations': 0, 'messages': 0, 'raw_bytes': 0, 'compressed_bytes': 0}
+
+    last_pk = 0
+    while True:
+        ids = list(
+            candidates(cutoff).filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        last_pk = ids[-1]
+
+        with transaction.atomic():
+            entries = defaultdict(list)
+            read_ids = []
+            rows = ChatMessage.objects.filter(conversation_id__in=ids).order_by(
+                'conversation_id', 'created_at', 'id'
+            ).values_list('id', 'conversation_id', 'role', 'content', 'created_at')
+            for message_id, conversation_id, role, content, created_at in rows:
+                entries[conversation_id].append([role, content, created_at.isoformat()])
+                read_ids.append(message_id)
+
+            # Conversations archived before and then continued by the visitor
+            existing = ChatArchive.objects.in_bulk(list(entries))
+            created, updated = [], []
+            for conversation_id, messages in entries.items():
+                stats['conversations'] += 1
+                stats['messages'] += len(messages)
+                archive = existing.get(conversation_id)
+                if archive is None:
+                    archive = ChatArchive(conversation_id=conversation_id, chunk_size=CHUNK_SIZE)
+                    created.append(archive)
+                else:
+                    updated.append(archive)
+                append(archive, messages)
+                stats['raw_bytes'] += archive.raw_size
+                stats['compressed_bytes'] += len(archive.transcript)
+
+            if not dry_run:
+                ChatArchive.objects.bulk_create(created)
+                for archive in updated:
+                    archive.save()
+                # Exactly the rows read above: any committed since, whatever
+                # their id, stay live for the next run
+                step = connection.features.max_query_params or max(len(read_ids), 1)
+                for start in range(0, len(read_ids), step):
+                    ChatMessage.objects.filter(id__in=read_ids[start:start + step]).delete()
+
+        log(f"{stats['conversations']} conversations, {stats['messages']} messages")
+
+    return stats
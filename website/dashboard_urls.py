@@ -14,14 +14,20 @@ urlpatterns = [
 
     # Dashboard home
     path('', views.dashboard_home, name='home'),
+    path('live/', views.live_feed, name='live_feed'),
 
     # Demo Requests
     path('demos/', views.demo_list, name='demo_list'),
+    path('demos/export/', views.demo_export, name='demo_export'),
+    path('demos/bulk/', views.demo_bulk, name='demo_bulk'),
+    path('demos/funnel/', views.demo_funnel, name='demo_funnel'),
     path('demos/<int:pk>/', views.demo_detail, name='demo_detail'),
     path('demos/<int:pk>/delete/', views.demo_delete, name='demo_delete'),
 
     # Contact Messages
     path('messages/', views.message_list, name='message_list'),
+    path('messages/export/', views.message_export, name='message_export'),
+    path('messages/bulk/', views.message_bulk, name='message_bulk'),
     path('messages/<int:pk>/', views.message_detail, name='message_detail'),
     path('messages/<int:pk>/delete/', views.message_delete, name='message_delete'),
 
@@ -57,9 +63,29 @@ urlpatterns = [
 
     # Newsletter Subscribers
     path('subscribers/', views.subscriber_list, name='subscriber_list'),
+    path('subscribers/export/', views.subscriber_export, name='subscriber_export'),
+    path('subscribers/import/', views.subscriber_import, name='subscriber_import'),
+    path('subscribers/bulk/', views.subscriber_bulk, name='subscriber_bulk'),
+
+    # Newsletter Campaigns
+    path('campaigns/', views.campaign_list, name='campaign_list'),
+    path('campaigns/create/', views.campaign_create, name='campaign_create'),
+    path('campaigns/<int:pk>/', views.campaign_detail, name='campaign_detail'),
+    path('campaigns/<int:pk>/edit/', views.campaign_edit, name='campaign_edit'),
+    path('campaigns/<int:pk>/delete/', views.campaign_delete, name='campaign_delete'),
 
     # Chat Conversations
     path('chats/', views.chat_list, name='chat_list'),
+    path('chats/export/', views.chat_export, name='chat_export'),
+    path('chats/bulk/', views.chat_bulk, name='chat_bulk'),
+    path('chats/analytics/', views.chat_analytics, name='chat_analytics'),
     path('chats/<int:pk>/', views.chat_detail, name='chat_detail'),
+    path('chats/<int:pk>/messages/', views.chat_messages, name='chat_messages'),
     path('chats/<int:pk>/delete/', views.chat_delete, name='chat_delete'),
+
+    # Site Settings
+    path('settings/', views.site_settings_edit, name='site_settings'),
+
+    # Monitoring
+    path('metrics', views.metrics, name='metrics'),
 ]
@@ -3,21 +3,43 @@ Custom dashboard views for Kaffero admin panel.
 """
 
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.core.exceptions import NON_FIELD_ERRORS, ValidationError
 from django.core.paginator import Paginator
-from django.http import JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, HttpResponse, HttpResponseForbidden, StreamingHttpResponse
 from django.views.decorators.http import require_POST
-from django.db.models import Count
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce, Length
+from django.template.defaultfilters import time as time_format
 from django.utils import timezone
+from django.conf import settings
+import hmac
+import io
+import json
+from datetime import timedelta
 
 from .models import (
     DemoRequest, ContactMessage, NewsletterSubscriber,
     Testimonial, FAQ, Feature, Screenshot, BlogPost,
-    ChatConversation, ChatMessage
+    ChatConversation, ChatMessage, SiteConfig, Campaign, CampaignRecipient,
+    ChatDailyStats, ChatIntentDaily, DemoFunnelDaily
 )
 from .forms import DemoRequestForm, ContactForm
+from . import campaigns as campaign_sender
+from . import chat_analytics as chat_rollups
+from . import chat_archive
+from . import demo_expiry
+from . import bulk
+from . import exports
+from . import funnel
+from . import live
+from . import metrics as request_metrics
+from . import newsletter
 
 
 # =============================================================================
@@ -61,13 +83,22 @@ def dashboard_logout(request):
 @login_required(login_url='dashboard:login')
 def dashboard_home(request):
     """Dashboard home with stats and recent activity."""
+    demo_stats = DemoRequest.objects.aggregate(
+        total=Count('id'),
+        pending=Count('id', filter=Q(status='pending')),
+    )
+    message_stats = ContactMessage.objects.aggregate(
+        total=Count('id'),
+        unread=Count('id', filter=Q(is_read=False)),
+    )
+
     context = {
         'page_title': 'Dashboard',
         # Stats
-        'demo_count': DemoRequest.objects.count(),
-        'pending_demos': DemoRequest.objects.filter(status='pending').count(),
-        'message_count': ContactMessage.objects.count(),
-        'unread_messages': ContactMessage.objects.filter(is_read=False).count(),
+        'demo_count': demo_stats['total'],
+        'pending_demos': demo_stats['pending'],
+        'message_count': message_stats['total'],
+        'unread_messages': message_stats['unread'],
         'subscriber_count': NewsletterSubscriber.objects.filter(is_active=True).count(),
         'blog_count': BlogPost.objects.filter(status='published').count(),
         'feature_count': Feature.objects.filter(is_active=True).count(),
@@ -81,24 +112,62 @@ def dashboard_home(request):
     return render(request, 'dashboard/home.html', context)
 
 
+@login_required(login_url='dashboard:login')
+def live_feed(request):
+    """Server-sent events for new demo requests, messages and chat turns."""
+    hub = live.get_hub()
+    last_event_id = request.headers.get('Last-Event-ID')
+    if isinstance(request, ASGIRequest):
+        response = StreamingHttpResponse(live.stream(hub, last_event_id), content_type='text/event-stream')
+    else:
+        # Don't tie up a sync worker; the browser reconnects after the retry delay
+        text, marks = live.open_feed(hub, last_event_id)
+        response = HttpResponse(text, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 # =============================================================================
 # Demo Requests Management
 # =============================================================================
 
-@login_required(login_url='dashboard:login')
-def demo_list(request):
-    """List all demo requests."""
+def bulk_response(request, filter_rows, actions, list_url, noun):
+    """Run the posted bulk action over the selected rows and return to the list."""
+    action = actions.get(request.POST.get('action'))
+    if action is None:
+        messages.error(request, 'Please choose an action.')
+    else:
+        count = bulk.run(bulk.selection(filter_rows, request.POST), action, request.user)
+        messages.success(request, f'{count:,} {noun} {action.done}.')
+    filters = request.POST.get('filters', '')
+    return redirect(f'{reverse(list_url)}?{filters}' if filters else list_url)
+
+
+def filter_demos(params):
+    """Demo requests matching the demo list filters in ``params``."""
     demos = DemoRequest.objects.all().order_by('-created_at')
 
     # Filter by status
-    status_filter = request.GET.get('status')
+    status_filter = params.get('status')
     if status_filter:
         demos = demos.filter(status=status_filter)
 
+    # Filter by demo expiry: active, expiring or expired
+    demos = demo_expiry.filter_state(demos, params.get('demo'))
+
     # Search
-    search = request.GET.get('search')
+    search = params.get('search')
     if search:
         demos = demos.filter(cafe_name__icontains=search) | demos.filter(contact_name__icontains=search)
+    return demos
+
+
+@login_required(login_url='dashboard:login')
+def demo_list(request):
+    """List all demo requests."""
+    demos = demo_expiry.annotate_state(filter_demos(request.GET))
+    status_filter = request.GET.get('status')
 
     paginator = Paginator(demos, 10)
     page = request.GET.get('page')
@@ -109,18 +178,42 @@ def demo_list(request):
         'demos': demos,
         'status_choices': DemoRequest.Status.choices,
         'current_status': status_filter,
+        'demo_states': demo_expiry.STATES,
+        'current_demo_state': request.GET.get('demo'),
+        'bulk_actions': bulk.choices(bulk.DEMO_ACTIONS),
     }
     return render(request, 'dashboard/demos/list.html', context)
 
 
+@login_required(login_url='dashboard:login')
+def demo_export(request):
+    """Export the filtered demo requests as CSV or JSON Lines."""
+    return exports.export_response(
+        filter_demos(request.GET), exports.DEMO_FIELDS, 'demos', request.GET.get('format'),
+    )
+
+
+@login_required(login_url='dashboard:login')
+@require_POST
+def demo_bulk(request):
+    """Apply a bulk action to the selected demo requests."""
+    return bulk_response(request, filter_demos, bulk.DEMO_ACTIONS, 'dashboard:demo_list', 'demo requests')
+
+
 @login_required(login_url='dashboard:login')
 def demo_detail(request, pk):
     """View and edit demo request details."""
     demo = get_object_or_404(DemoRequest, pk=pk)
 
     if request.method == 'POST':
+        status = request.POST.get('status', demo.status)
+        if status not in DemoRequest.Status.values:
+            messages.error(request, 'Please choose a valid status.')
+            return redirect('dashboard:demo_detail', pk=pk)
+
         # Update demo details
-        demo.status = request.POST.get('status', demo.status)
+        previous_status = demo.status
+        demo.status = status
         demo.demo_url = request.POST.get('demo_url', demo.demo_url)
         demo.demo_username = request.POST.get('demo_username', demo.demo_username)
         demo.demo_password = request.POST.get('demo_password', demo.demo_password)
@@ -129,7 +222,10 @@ def demo_detail(request, pk):
         if request.POST.get('demo_expires_at'):
             demo.demo_expires_at = request.POST.get('demo_expires_at')
 
-        demo.save()
+        with transaction.atomic():
+            if demo.status != previous_status:
+                funnel.record(demo, previous_status, demo.status, request.user)
+            demo.save()
         messages.success(request, 'Demo request updated successfully.')
         return redirect('dashboard:demo_detail', pk=pk)
 
@@ -144,28 +240,120 @@ def demo_detail(request, pk):
 @login_required(login_url='dashboard:login')
 @require_POST
 def demo_delete(request, pk):
-    """Delete a demo request."""
+    """Delete a demo request; its status history stays in the funnel."""
     demo = get_object_or_404(DemoRequest, pk=pk)
     demo.delete()
     messages.success(request, 'Demo request deleted successfully.')
     return redirect('dashboard:demo_list')
 
 
+FUNNEL_RANGES = [30, 90, 180, 365]
+
+
+def funnel_rates(row):
+    """Add the conversion and decline rates to a funnel ``row`` of new/converted/declined counts."""
+    new = row['new']
+    row['conversion_rate'] = row['converted'] * 100 / new if new else 0
+    row['decline_rate'] = row['declined'] * 100 / new if new else 0
+    return row
+
+
+@login_required(login_url='dashboard:login')
+def demo_funnel(request):
+    """Demo request funnel by stage, source, week and city, read from the daily aggregates."""
+    try:
+        days = int(request.GET.get('days', 90))
+    except ValueError:
+        days = 90
+    if days not in FUNNEL_RANGES:
+        days = 90
+    since = timezone.localdate() - timedelta(days=days - 1)
+    rows = DemoFunnelDaily.objects.filter(day__gte=since)
+    Status = DemoRequest.Status
+    outcomes = {
+        'new': Coalesce(Sum('entered', filter=Q(status=Status.PENDING)), 0),
+        'converted': Coalesce(Sum('entered', filter=Q(status=Status.CONVERTED)), 0),
+        'declined': Coalesce(Sum('entered', filter=Q(status=Status.DECLINED)), 0),
+    }
+
+    by_status = {
+        row['status']: row
+        for row in rows.values('status').annotate(
+            entered_total=Sum('entered'), exited_total=Sum('exited'), seconds=Sum('seconds_in_stage'),
+        )
+    }
+    new = by_status.get(Status.PENDING, {}).get('entered_total') or 0
+    stages = []
+    for value, label in Status.choices:
+        row = by_status.get(value, {})
+        entered, exited = row.get('entered_total') or 0, row.get('exited_total') or 0
+        stages.append({
+            'status': value,
+            'label': label,
+            'entered': entered,
+            'exited': exited,
+            'avg_days': row.get('seconds', 0) / exited / 86400 if exited else None,
+            'rate': entered * 100 / new if new else 0,
+        })
+
+    sources = [
+        funnel_rates(row) for row in rows.values('source').annotate(**outcomes).order_by('-new')
+    ]
+    source_labels = dict(DemoRequest.Source.choices)
+    for row in sources:
+        row['label'] = source_labels.get(row['source'], row['source'])
+
+    # Weeks start on Monday; the first one may be partial
+    weeks = {}
+    for row in rows.values('day').annotate(**outcomes).order_by('day'):
+        week = weeks.setdefault(row['day'] - timedelta(days=row['day'].weekday()), {'new': 0, 'converted': 0})
+        week['new'] += row['new']
+        week['converted'] += row['converted']
+    peak = max((week['new'] for week in weeks.values()), default=0) or 1
+    throughput = [
+        {'week': week, **counts, 'height': round(counts['new'] * 100 / peak)}
+        for week, counts in weeks.items()
+    ]
+
+    cities = [
+        funnel_rates(row) for row in rows.values('city').annotate(**outcomes).order_by('-new', 'city')[:10]
+    ]
+
+    context = {
+        'page_title': 'Demo Funnel',
+        'days': days,
+        'ranges': FUNNEL_RANGES,
+        'stages': stages,
+        'new': new,
+        'sources': sources,
+        'throughput': throughput,
+        'cities': cities,
+    }
+    return render(request, 'dashboard/demos/funnel.html', context)
+
+
 # =============================================================================
 # Contact Messages Management
 # =============================================================================
 
-@login_required(login_url='dashboard:login')
-def message_list(request):
-    """List all contact messages."""
+def filter_messages(params):
+    """Contact messages matching the message list filters in ``params``."""
     msgs = ContactMessage.objects.all().order_by('-created_at')
 
     # Filter by read status
-    read_filter = request.GET.get('read')
+    read_filter = params.get('read')
     if read_filter == 'unread':
         msgs = msgs.filter(is_read=False)
     elif read_filter == 'read':
         msgs = msgs.filter(is_read=True)
+    return msgs
+
+
+@login_required(login_url='dashboard:login')
+def message_list(request):
+    """List all contact messages."""
+    msgs = filter_messages(request.GET)
+    read_filter = request.GET.get('read')
 
     paginator = Paginator(msgs, 10)
     page = request.GET.get('page')
@@ -175,27 +363,47 @@ def message_list(request):
         'page_title': 'Contact Messages',
         'messages_list': msgs,
         'current_filter': read_filter,
+        'bulk_actions': bulk.choices(bulk.MESSAGE_ACTIONS),
     }
     return render(request, 'dashboard/messages/list.html', context)
 
 
+@login_required(login_url='dashboard:login')
+def message_export(request):
+    """Export the filtered contact messages as CSV or JSON Lines."""
+    return exports.export_response(
+        filter_messages(request.GET), exports.MESSAGE_FIELDS, 'messages', request.GET.get('format'),
+    )
+
+
+@login_required(login_url='dashboard:login')
+@require_POST
+def message_bulk(request):
+    """Apply a bulk action to the selected contact messages."""
+    return bulk_response(request, filter_messages, bulk.MESSAGE_ACTIONS, 'dashboard:message_list', 'messages')
+
+
 @login_required(login_url='dashboard:login')
 def message_detail(request, pk):
     """View message details and mark as read."""
     msg = get_object_or_404(ContactMessage, pk=pk)
+    update_fields = []
 
     # Mark as read
     if not msg.is_read:
         msg.is_read = True
-        msg.save()
+        update_fields.append('is_read')
 
     if request.method == 'POST':
         if 'mark_replied' in request.POST:
             msg.is_replied = True
             msg.replied_at = timezone.now()
-            msg.save()
+            update_fields += ['is_replied', 'replied_at']
             messages.success(request, 'Message marked as replied.')
 
+    if update_fields:
+        msg.save(update_fields=update_fields)
+
     context = {
         'page_title': f'Message from {msg.name}',
         'msg': msg,
@@ -644,16 +852,23 @@ def faq_delete(request, pk):
 # Newsletter Subscribers
 # =============================================================================
 
-@login_required(login_url='dashboard:login')
-def subscriber_list(request):
-    """List all newsletter subscribers."""
+def filter_subscribers(params):
+    """Subscribers matching the subscriber list filters in ``params``."""
     subscribers = NewsletterSubscriber.objects.all().order_by('-subscribed_at')
 
-    status_filter = request.GET.get('status')
+    status_filter = params.get('status')
     if status_filter == 'active':
         subscribers = subscribers.filter(is_active=True)
     elif status_filter == 'inactive':
         subscribers = subscribers.filter(is_active=False)
+    return subscribers
+
+
+@login_required(login_url='dashboard:login')
+def subscriber_list(request):
+    """List all newsletter subscribers."""
+    subscribers = filter_subscribers(request.GET)
+    status_filter = request.GET.get('status')
 
     paginator = Paginator(subscribers, 20)
     page = request.GET.get('page')
@@ -663,30 +878,201 @@ def subscriber_list(request):
         'page_title': 'Newsletter Subscribers',
         'subscribers': subscribers,
         'current_filter': status_filter,
+        'bulk_actions': bulk.choices(bulk.SUBSCRIBER_ACTIONS),
     }
     return render(request, 'dashboard/subscribers/list.html', context)
 
 
+@login_required(login_url='dashboard:login')
+def subscriber_export(request):
+    """Export the filtered newsletter subscribers as CSV or JSON Lines."""
+    return exports.export_response(
+        filter_subscribers(request.GET), exports.SUBSCRIBER_FIELDS, 'subscribers', request.GET.get('format'),
+    )
+
+
+@login_required(login_url='dashboard:login')
+@require_POST
+def subscriber_bulk(request):
+    """Apply a bulk action to the selected newsletter subscribers."""
+    return bulk_response(
+        request, filter_subscribers, bulk.SUBSCRIBER_ACTIONS, 'dashboard:subscriber_list', 'subscribers',
+    )
+
+
+@login_required(login_url='dashboard:login')
+@require_POST
+def subscriber_import(request):
+    """Import newsletter subscribers from an uploaded CSV file."""
+    upload = request.FILES.get('file')
+    if not upload:
+        messages.error(request, 'Please choose a CSV file to import.')
+        return redirect('dashboard:subscriber_list')
+
+    lines = io.TextIOWrapper(upload.file, encoding='utf-8-sig', errors='replace', newline='')
+    counts = newsletter.import_emails(
+        newsletter.read_csv_emails(lines),
+        reactivate=request.POST.get('reactivate') == 'on',
+    )
+    messages.success(
+        request,
+        f"Imported {counts['added']:,} subscribers "
+        f"({counts['existing']:,} already present, {counts['invalid']:,} invalid)."
+    )
+    return redirect('dashboard:subscriber_list')
+
+
 # =============================================================================
-# Chat Conversations Management
+# Newsletter Campaigns
 # =============================================================================
 
 @login_required(login_url='dashboard:login')
-def chat_list(request):
-    """List all chat conversations."""
+def campaign_list(request):
+    """List newsletter campaigns with delivery counts."""
+    campaigns = Campaign.objects.annotate(
+        total=Count('recipients'),
+        sent=Count('recipients', filter=Q(recipients__status=CampaignRecipient.Status.SENT)),
+        failed=Count('recipients', filter=Q(recipients__status=CampaignRecipient.Status.FAILED)),
+    ).order_by('-created_at')
+
+    context = {
+        'page_title': 'Campaigns',
+        'campaigns': campaigns,
+    }
+    return render(request, 'dashboard/campaigns/list.html', context)
+
+
+def fill_campaign(campaign, data):
+    """Copy the posted fields onto ``campaign``; returns its validation errors by field."""
+    campaign.subject = data.get('subject', '').strip()
+    campaign.preheader = data.get('preheader', '').strip()
+    campaign.body = data.get('body', '')
+    try:
+        campaign.full_clean()
+    except ValidationError as exc:
+        return exc.message_dict
+    return {}
+
+
+@login_required(login_url='dashboard:login')
+def campaign_create(request):
+    """Create a draft campaign."""
+    campaign, errors = None, {}
+    if request.method == 'POST':
+        campaign = Campaign()
+        errors = fill_campaign(campaign, request.POST)
+        if not errors:
+            campaign.save()
+            messages.success(request, 'Campaign draft created.')
+            return redirect('dashboard:campaign_detail', pk=campaign.pk)
+
+    context = {
+        'page_title': 'New Campaign',
+        'campaign': campaign,
+        'errors': errors,
+    }
+    return render(request, 'dashboard/campaigns/form.html', context)
+
+
+@login_required(login_url='dashboard:login')
+def campaign_edit(request, pk):
+    """Edit a draft campaign."""
+    campaign = get_object_or_404(Campaign, pk=pk)
+    if campaign.status != Campaign.Status.DRAFT:
+        messages.error(request, 'Only draft campaigns can be edited.')
+        return redirect('dashboard:campaign_detail', pk=pk)
+
+    errors = {}
+    if request.method == 'POST':
+        errors = fill_campaign(campaign, request.POST)
+        if not errors:
+            campaign.save()
+            messages.success(request, 'Campaign updated successfully.')
+            return redirect('dashboard:campaign_detail', pk=pk)
+
+    context = {
+        'page_title': 'Edit Campaign',
+        'campaign': campaign,
+        'errors': errors,
+    }
+    return render(request, 'dashboard/campaigns/form.html', context)
+
+
+@login_required(login_url='dashboard:login')
+def campaign_detail(request, pk):
+    """Campaign preview, delivery progress and failures."""
+    campaign = get_object_or_404(Campaign, pk=pk)
+
+    if request.method == 'POST' and 'retry_failed' in request.POST:
+        requeued = campaign_sender.retry_failed(campaign)
+        messages.success(request, f'{requeued} failed recipients requeued.')
+        return redirect('dashboard:campaign_detail', pk=pk)
+
+    counts = dict(
+        campaign.recipients.order_by().values_list('status').annotate(count=Count('id'))
+    )
+    total = sum(counts.values())
+    html, text = campaign_sender.render_campaign(campaign)
+
+    context = {
+        'page_title': f'Campaign: {campaign.subject}',
+        'campaign': campaign,
+        'counts': {status: counts.get(status, 0) for status in CampaignRecipient.Status.values},
+        'total': total,
+        # A draft has no recipients yet; show who it would go to
+        'active_subscribers': 0 if total else NewsletterSubscriber.objects.filter(is_active=True).count(),
+        'failures': (
+            campaign.recipients.filter(status=CampaignRecipient.Status.FAILED)[:50]
+            if counts.get(CampaignRecipient.Status.FAILED) else []
+        ),
+        'preview_html': html,
+    }
+    return render(request, 'dashboard/campaigns/detail.html', context)
+
+
+@login_required(login_url='dashboard:login')
+@require_POST
+def campaign_delete(request, pk):
+    """Delete a campaign that has not started sending."""
+    campaign = get_object_or_404(Campaign, pk=pk)
+    if campaign.status != Campaign.Status.DRAFT:
+        messages.error(request, 'Only draft campaigns can be deleted.')
+        return redirect('dashboard:campaign_detail', pk=pk)
+    campaign.delete()
+    messages.success(request, 'Campaign deleted.')
+    return redirect('dashboard:campaign_list')
+
+
+# =============================================================================
+# Chat Conversations Management
+# =============================================================================
+
+def filter_chats(params):
+    """Conversations matching the chat list filters in ``params``."""
     chats = ChatConversation.objects.all().order_by('-updated_at')
 
     # Filter by lead status
-    lead_filter = request.GET.get('leads')
+    lead_filter = params.get('leads')
     if lead_filter == 'true':
         chats = chats.filter(is_lead=True)
 
     # Filter by resolved status
-    resolved_filter = request.GET.get('resolved')
+    resolved_filter = params.get('resolved')
     if resolved_filter == 'true':
         chats = chats.filter(is_resolved=True)
     elif resolved_filter == 'false':
         chats = chats.filter(is_resolved=False)
+    return chats
+
+
+@login_required(login_url='dashboard:login')
+def chat_list(request):
+    """List all chat conversations."""
+    chats = filter_chats(request.GET).annotate(
+        num_messages=Count('messages') + Coalesce('archive__message_count', 0),
+    )
+    lead_filter = request.GET.get('leads')
+    resolved_filter = request.GET.get('resolved')
 
     paginator = Paginator(chats, 20)
     page = request.GET.get('page')
@@ -697,18 +1083,93 @@ def chat_list(request):
         'chats': chats,
         'lead_filter': lead_filter,
         'resolved_filter': resolved_filter,
+        'bulk_actions': bulk.choices(bulk.CHAT_ACTIONS),
     }
     return render(request, 'dashboard/chats/list.html', context)
 
 
+ANALYTICS_RANGES = [7, 30, 90, 365]
+
+
+@login_required(login_url='dashboard:login')
+def chat_analytics(request):
+    """Chat volume, lead capture and intents per day, read from the daily rollups."""
+    try:
+        days = int(request.GET.get('days', 30))
+    except ValueError:
+        days = 30
+    if days not in ANALYTICS_RANGES:
+        days = 30
+    today = timezone.localdate()
+    since = today - timedelta(days=days - 1)
+
+    rows = {row.day: row for row in ChatDailyStats.objects.filter(day__gte=since)}
+    series = [
+        rows.get(day) or ChatDailyStats(day=day)
+        for day in (since + timedelta(days=offset) for offset in range(days))
+    ]
+    totals = {field: sum(getattr(row, field) for row in series) for field in chat_rollups.STAT_FIELDS}
+    peak = max(row.conversations for row in series) or 1
+    for row in series:
+        row.height = round(row.conversations * 100 / peak)
+
+    intents = list(
+        ChatIntentDaily.objects.filter(day__gte=since)
+        .values('intent').annotate(total=Sum('count')).order_by('-total')
+    )
+    top = intents[0]['total'] if intents else 1
+    for intent in intents:
+        intent['label'] = chat_rollups.INTENT_LABELS.get(intent['intent'], intent['intent'])
+        intent['width'] = round(intent['total'] * 100 / top)
+
+    context = {
+        'page_title': 'Chat Analytics',
+        'days': days,
+        'ranges': ANALYTICS_RANGES,
+        'series': series,
+        'totals': totals,
+        'lead_rate': totals['leads'] * 100 / totals['conversations'] if totals['conversations'] else 0,
+        'messages_per_conversation': totals['messages'] / totals['conversations'] if totals['conversations'] else 0,
+        'intents': intents,
+    }
+    return render(request, 'dashboard/chats/analytics.html', context)
+
+
+@login_required(login_url='dashboard:login')
+def chat_export(request):
+    """Export the filtered chat conversations, with transcripts."""
+    return exports.export_response(
+        filter_chats(request.GET), exports.CHAT_FIELDS, 'chats', request.GET.get('format'), transcripts=True,
+    )
+
+
+@login_required(login_url='dashboard:login')
+@require_POST
+def chat_bulk(request):
+    """Apply a bulk action to the selected conversations."""
+    return bulk_response(request, filter_chats, bulk.CHAT_ACTIONS, 'dashboard:chat_list', 'conversations')
+
+
+def transcript_conversations():
+    """Conversations with what the transcript views need, without the archive blob."""
+    return ChatConversation.objects.select_related('archive').defer('archive__transcript').annotate(
+        num_live_messages=Count('messages'),
+        archive_size=Length('archive__transcript'),
+    )
+
+
 @login_required(login_url='dashboard:login')
 def chat_detail(request, pk):
     """View chat conversation details."""
-    chat = get_object_or_404(ChatConversation, pk=pk)
-    chat_messages = chat.messages.all().order_by('created_at')
+    chat = get_object_or_404(transcript_conversations(), pk=pk)
+    # Only the latest page is rendered; older messages (live, then archived)
+    # are fetched from chat_messages as the transcript is scrolled up
+    chat_messages, older_cursor = chat_archive.transcript_page(chat)
 
     if request.method == 'POST':
         if 'mark_lead' in request.POST:
+            if not chat.is_lead:
+                chat_rollups.record_lead(chat)
             chat.is_lead = True
             chat.save()
             messages.success(request, 'Marked as lead.')
@@ -722,14 +1183,41 @@ def chat_detail(request, pk):
             chat.save()
             messages.success(request, 'Notes saved.')
 
+    archive = chat_archive.archive_of(chat)
     context = {
         'page_title': f'Chat #{chat.pk}',
         'chat': chat,
         'chat_messages': chat_messages,
+        'older_cursor': older_cursor,
+        'message_total': chat.num_live_messages + (archive.message_count if archive else 0),
+        'archive': archive,
     }
     return render(request, 'dashboard/chats/detail.html', context)
 
 
+@login_required(login_url='dashboard:login')
+def chat_messages(request, pk):
+    """JSON page of a conversation's messages older than the ``before`` cursor."""
+    chat = get_object_or_404(transcript_conversations(), pk=pk)
+    try:
+        limit = int(request.GET.get('limit', chat_archive.PAGE_SIZE))
+        page, older_cursor = chat_archive.transcript_page(chat, request.GET.get('before') or None, limit)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid cursor.'}, status=400)
+
+    return JsonResponse({
+        'messages': [
+            {
+                'role': msg.role,
+                'content': msg.content,
+                'time': time_format(timezone.localtime(msg.created_at), 'h:i A'),
+            }
+            for msg in page
+        ],
+        'before': older_cursor,
+    })
+
+
 @login_required(login_url='dashboard:login')
 @require_POST
 def chat_delete(request, pk):
@@ -738,3 +1226,69 @@ def chat_delete(request, pk):
     chat.delete()
     messages.success(request, 'Chat conversation deleted.')
     return redirect('dashboard:chat_list')
+
+
+# =============================================================================
+# Site Settings
+# =============================================================================
+
+SITE_CONFIG_TEXT_FIELDS = [
+    'site_name', 'site_tagline', 'site_description',
+    'company_name', 'company_email', 'company_phone', 'company_whatsapp', 'company_address',
+    'social_linkedin', 'social_instagram', 'social_facebook', 'social_youtube',
+]
+
+
+@login_required(login_url='dashboard:login')
+def site_settings_edit(request):
+    """Edit site-wide settings shown across the public website."""
+    config = SiteConfig.load()
+    pricing_json = json.dumps(config.pricing, indent=2, ensure_ascii=False)
+
+    if request.method == 'POST':
+        for field in SITE_CONFIG_TEXT_FIELDS:
+            setattr(config, field, request.POST.get(field, '').strip())
+        pricing_json = request.POST.get('pricing', '')
+
+        try:
+            config.pricing = json.loads(pricing_json or '{}')
+            config.renewal_fee_percent = int(request.POST.get('renewal_fee_percent', 20))
+            config.full_clean()
+        except ValidationError as exc:
+            for field, errors in exc.message_dict.items():
+                if field != NON_FIELD_ERRORS:
+                    label = SiteConfig._meta.get_field(field).verbose_name.capitalize()
+                    errors = [f'{label}: {error}' for error in errors]
+                for error in errors:
+                    messages.error(request, error)
+        except ValueError:
+            messages.error(request, 'Pricing must be valid JSON and the renewal fee a whole number.')
+        else:
+            config.save()
+            messages.success(request, 'Site settings updated successfully.')
+            return redirect('dashboard:site_settings')
+
+    context = {
+        'page_title': 'Site Settings',
+        'config': config,
+        'pricing_json': pricing_json,
+    }
+    return render(request, 'dashboard/settings/form.html', context)
+
+
+# =============================================================================
+# Metrics
+# =============================================================================
+
+def metrics(request):
+    """Request metrics from all workers in Prometheus text format."""
+    token = settings.METRICS_TOKEN
+    authorized = request.user.is_authenticated and request.user.is_staff
+    if not authorized and token:
+        header = request.headers.get('Authorization', '')
+        authorized = hmac.compare_digest(header.encode(), f'Bearer {token}'.encode())
+    if not authorized:
+        return HttpResponseForbidden('Staff access required.')
+
+    content = request_metrics.render_prometheus(request_metrics.collect())
+    return HttpResponse(content, content_type='text/plain; version=0.0.4; charset=utf-8')
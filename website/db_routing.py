@@ -0,0 +1,93 @@
+"""
+Read replica routing for Kaffero website.
+
+With ``DATABASE_REPLICA_URL`` set, ``ReplicaMiddleware`` lets the reads of
+safe requests (GET, HEAD, OPTIONS) - public pages and the dashboard's
+lists and reports - go to the ``replica`` database, so they no longer
+compete with the chat and form writes on the primary. Everything else reads
+from the primary:
+
+- requests that write (POSTs, but also a GET saving its session), and any
+  read in the same request after its first write
+- for ``DATABASE_REPLICA_STICKY_SECONDS`` afterwards, every request from
+  the same browser (a cookie), so a redirect after a form post or a
+  dashboard edit always shows what was just saved despite replication lag
+- anything outside a request: management commands and job workers, whose
+  claims and ``select_for_update()`` must see the primary
+
+Without a replica everything uses ``default``. To try it locally, point
+``DATABASE_REPLICA_URL`` at a second SQLite file (e.g.
+``sqlite:///replica.sqlite3``), migrate it with ``--database replica`` and
+copy rows into it to stand in for replication.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+REPLICA = 'replica'
+STICKY_COOKIE = 'kaffero_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# The routing state of the current request; None outside requests
+_state = ContextVar('db_routing', default=None)
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+@contextmanager
+def routing(replica=True):
+    """Route reads to the replica (if ``replica`` and one is configured) until the first write."""
+    state = SimpleNamespace(replica=replica and replica_configured(), wrote=False)
+    token = _state.set(state)
+    try:
+        yield state
+    finally:
+        _state.reset(token)
+
+
+class ReplicaRouter:
+    """Reads go to the replica inside ``routing()``; writes always go to the primary."""
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state and state.replica and not state.wrote:
+            return REPLICA
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+
+class ReplicaMiddleware:
+    """Route the reads of safe requests to the replica; see the module docstring."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        replica = request.method in SAFE_METHODS and STICKY_COOKIE not in request.COOKIES
+        with routing(replica) as state:
+            response = self.get_response(request)
+
+        if state.wrote and replica_configured():
+            response.set_cookie(
+                STICKY_COOKIE, '1',
+                max_age=settings.DATABASE_REPLICA_STICKY_SECONDS,
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
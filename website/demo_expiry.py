@@ -0,0 +1,152 @@
+"""
+Demo expiry for Kaffero website.
+
+``sweep()`` (the recurring ``tasks.expire_demos`` job, or ``manage.py
+expire_demos``) finds requests whose demo ended before now through the
+``demo_expires_at`` index and moves them to ``expired`` a batch at a time
+with ``funnel.record_bulk()``, so the change is logged like any other. Those
+with an email address get a follow-up queued (``expiry_notice``), which
+``send_notices()`` then delivers the way campaigns are sent: claimed
+(``queued`` -> ``sending``) before sending over one connection, and never
+sent twice if a run dies half way.
+
+``filter_state()`` and ``annotate_state()`` give the dashboard active,
+expiring soon and expired demos as database conditions rather than
+evaluating ``DemoRequest.is_demo_active`` row by row.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import Case, CharField, Q, Value, When
+from django.utils import timezone
+
+from . import funnel
+from .campaigns import deliver
+from .emails import render_email
+from .models import DemoRequest
+
+BATCH_SIZE = 500
+NOTICE_BATCH_SIZE = 50
+
+# Statuses with a demo that can run out; converted and declined requests keep theirs
+LIVE_STATUSES = [
+    DemoRequest.Status.PROCESSING,
+    DemoRequest.Status.DEMO_CREATED,
+    DemoRequest.Status.CONTACTED,
+]
+
+ACTIVE = 'active'
+EXPIRING = 'expiring'
+EXPIRED = 'expired'
+STATES = [(ACTIVE, 'Active demo'), (EXPIRING, 'Expiring soon'), (EXPIRED, 'Expired demo')]
+
+Notice = DemoRequest.ExpiryNotice
+
+
+def _conditions(now=None):
+    now = now or timezone.now()
+    soon = now + timedelta(days=settings.DEMO_EXPIRING_SOON_DAYS)
+    return {
+        EXPIRED: Q(demo_expires_at__lte=now),
+        EXPIRING: Q(demo_expires_at__gt=now, demo_expires_at__lte=soon),
+        ACTIVE: Q(demo_expires_at__gt=now),
+    }
+
+
+def filter_state(queryset, state, now=None):
+    """Requests in ``queryset`` whose demo is in ``state``; unknown states filter nothing."""
+    condition = _conditions(now).get(state)
+    return queryset if condition is None else queryset.filter(condition)
+
+
+def annotate_state(queryset, now=None):
+    """Annotate ``demo_state``: expired, expiring, active or '' without a demo."""
+    conditions = _conditions(now)
+    return queryset.annotate(demo_state=Case(
+        *(When(conditions[state], then=Value(state)) for state in (EXPIRED, EXPIRING, ACTIVE)),
+        default=Value(''),
+        output_field=CharField(),
+    ))
+
+
+def due(now=None):
+    """Requests whose demo has ended but that have not been moved to ``expired``."""
+    return DemoRequest.objects.filter(demo_expires_at__lte=now or timezone.now(), status__in=LIVE_STATUSES)
+
+
+def sweep(now=None, batch_size=BATCH_SIZE):
+    """Expire every due request; returns how many were expired."""
+    now = now or timezone.now()
+    expired = 0
+    while True:
+        with transaction.atomic():
+            ids = list(due(now).order_by('demo_expires_at', 'pk').values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                return expired
+            # Rechecked under the row locks, in case staff moved one on meanwhile
+            expired += funnel.record_bulk(due(now).filter(pk__in=ids), DemoRequest.Status.EXPIRED)
+            DemoRequest.objects.filter(
+                pk__in=ids, status=DemoRequest.Status.EXPIRED, expiry_notice=Notice.NONE,
+            ).exclude(email='').update(expiry_notice=Notice.QUEUED)
+
+
+def claim_notices(size):
+    """Move up to ``size`` queued notices to ``sending`` and return their requests."""
+    with transaction.atomic():
+        ids = list(
+            DemoRequest.objects.filter(expiry_notice=Notice.QUEUED).order_by('pk').values_list('pk', flat=True)[:size]
+        )
+        DemoRequest.objects.filter(pk__in=ids, expiry_notice=Notice.QUEUED).update(expiry_notice=Notice.SENDING)
+    return list(DemoRequest.objects.filter(pk__in=ids, expiry_notice=Notice.SENDING))
+
+
+def build_notice(demo, connection):
+    html, text = render_email('emails/demo_expired.html', {'demo_request': demo})
+    message = EmailMultiAlternatives(
+        subject=f'Your Kaffero demo for {demo.cafe_name} has ended',
+        body=text,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[demo.email],
+        connection=connection,
+    )
+    message.attach_alternative(html, 'text/html')
+    return message
+
+
+def send_notices(batch_size=NOTICE_BATCH_SIZE, log=None):
+    """Email every queued expiry follow-up; returns counts by outcome."""
+    log = log or (lambda message: None)
+    counts = {'sent': 0, 'failed': 0, 'interrupted': 0}
+
+    # Notices left in 'sending' by a previous run may already have been delivered
+    counts['interrupted'] = DemoRequest.objects.filter(expiry_notice=Notice.SENDING).update(
+        expiry_notice=Notice.FAILED,
+    )
+
+    connection = get_connection(fail_silently=False)
+    connection.open()
+    try:
+        while True:
+            batch = claim_notices(batch_size)
+            if not batch:
+                break
+            sent, failed = [], []
+            for demo in batch:
+                try:
+                    deliver(build_notice(demo, connection), connection)
+                except Exception as exc:
+                    log(f'{demo.email}: {exc}')
+                    failed.append(demo.pk)
+                else:
+                    sent.append(demo.pk)
+            DemoRequest.objects.filter(pk__in=sent).update(expiry_notice=Notice.SENT, last_contacted_at=timezone.now())
+            DemoRequest.objects.filter(pk__in=failed).update(expiry_notice=Notice.FAILED)
+            counts['sent'] += len(sent)
+            counts['failed'] += len(failed)
+            log(f"Sent {counts['sent']}, failed {counts['failed']}")
+    finally:
+        connection.close()
+    return counts
@@ -0,0 +1,316 @@
+"""
+Precompiled email rendering for Kaffero website.
+
+``render_to_string`` followed by ``strip_tags`` re-renders the whole
+``emails/base_email.html`` chrome for every message and spends most of its
+time re-parsing the result to get a (whitespace-riddled) text part. Instead,
+each email template is compiled once per process:
+
+- ``{% extends %}`` and ``{% block %}`` are resolved into one flat list of
+  nodes, and adjacent static text is merged into fragments
+- ``<style>`` rules with simple selectors are inlined into the static markup
+- the HTML-to-text conversion of the static fragments is done up front
+
+Rendering a message then only renders the dynamic nodes (variables, ``if``,
+``for``...) and splices their output into the cached HTML and text. Templates
+the flattening cannot handle (``{{ block.super }}``, blocks nested inside
+other tags) are rendered normally. With ``DEBUG`` on, a compiled template is
+rebuilt when any of its files change.
+"""
+
+import html
+import os
+import re
+from html.parser import HTMLParser
+
+from django.conf import settings
+from django.template import Context, engines
+from django.template.base import TextNode, VariableNode
+from django.template.loader import get_template
+from django.template.loader_tags import BlockNode, ExtendsNode
+
+# Private-use characters delimiting the index of a dynamic node in compiled source
+MARKER = '\ue000{}\ue001'
+MARKER_RE = re.compile(r'\ue000(\d+)\ue001')
+
+# Elements whose start and end begin a new line / paragraph in the text part
+LINE_TAGS = {'br', 'div', 'li', 'tr', 'table', 'ul', 'ol', 'hr', 'header', 'footer', 'section'}
+PARAGRAPH_TAGS = {'p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'blockquote'}
+HIDDEN_TAGS = {'head', 'style', 'script', 'title'}
+
+STYLE_RE = re.compile(r'<style[^>]*>(.*?)</style>', re.S | re.I)
+START_TAG_RE = re.compile(r'<([a-zA-Z][a-zA-Z0-9]*)(\s[^<>]*?)?(/?)>')
+SELECTOR_RE = re.compile(r'^([a-z][a-z0-9]*)?(?:\.([\w-]+))?(?:#([\w-]+))?$', re.I)
+
+
+class _TextConverter(HTMLParser):
+    """Collects the readable text of an HTML document."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.hidden = 0
+        self.links = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in HIDDEN_TAGS:
+            self.hidden += 1
+        elif tag in PARAGRAPH_TAGS:
+            self.parts.append('\n\n')
+        elif tag in LINE_TAGS:
+            self.parts.append('\n')
+        elif tag == 'td':
+            self.parts.append(' ')
+        if tag == 'li':
+            self.parts.append('- ')
+        elif tag == 'a':
+            self.links.append(dict(attrs).get('href') or '')
+
+    def handle_endtag(self, tag):
+        if tag in HIDDEN_TAGS:
+            self.hidden = max(self.hidden - 1, 0)
+        elif tag in PARAGRAPH_TAGS:
+            self.parts.append('\n\n')
+        elif tag in LINE_TAGS:
+            self.parts.append('\n')
+        elif tag == 'a' and self.links:
+            href = self.links.pop()
+            # Web links (or ones filled in at send time) are spelled out;
+            # mailto:/tel: links already show their address
+            if href.startswith(('http://', 'https://', '\ue000')):
+                self.parts.append(f' ({href})')
+
+    def handle_data(self, data):
+        if not self.hidden:
+            self.parts.append(re.sub(r'\s+', ' ', data))
+
+    def text(self):
+        return _tidy(''.join(self.parts))
+
+
+def _tidy(text):
+    """Collapse runs of spaces and blank lines left by the markup."""
+    text = re.sub(r' *\n *', '\n', re.sub(r' {2,}', ' ', text))
+    return re.sub(r'\n{3,}', '\n\n', text).strip()
+
+
+def html_to_text(markup):
+    """Plain-text version of ``markup`` for the text/plain part of an email."""
+    converter = _TextConverter()
+    converter.feed(markup)
+    converter.close()
+    return converter.text()
+
+
+def _snippet_text(markup):
+    # Most dynamic output is an escaped value with no markup at all
+    if '<' in markup:
+        return html_to_text(markup)
+    if '&' in markup:
+        markup = html.unescape(markup)
+    return re.sub(r'\s+', ' ', markup).strip()
+
+
+def _css_rules(css):
+    """Split ``css`` into inlinable rules and rules to keep in a ``<style>``.
+
+    Inlinable rules are ``(specificity, order, (tag, class, id), declarations)``
+    sorted so later entries win; at-rules, pseudo-classes, descendant
+    selectors and the like are kept as CSS text.
+    """
+    inlined, kept = [], []
+    # At-rules contain nested braces; keep them whole
+    for block in re.findall(r'@[^{]+\{(?:[^{}]*\{[^{}]*\})*[^{}]*\}', css):
+        kept.append(block)
+    css = re.sub(r'@[^{]+\{(?:[^{}]*\{[^{}]*\})*[^{}]*\}', '', css)
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    for selectors, declarations in re.findall(r'([^{}]+)\{([^{}]*)\}', css):
+        declarations = declarations.strip().rstrip(';').strip()
+        for selector in selectors.split(','):
+            selector = selector.strip()
+            match = SELECTOR_RE.match(selector)
+            if not selector or not match:
+                kept.append(f'{selector} {{ {declarations} }}')
+                continue
+            tag, cls, id_ = match.groups()
+            specificity = (100 if id_ else 0) + (10 if cls else 0) + (1 if tag else 0)
+            inlined.append((specificity, len(inlined), (tag and tag.lower(), cls, id_), declarations))
+    inlined.sort(key=lambda rule: rule[:2])
+    return inlined, kept
+
+
+def inline_css(markup):
+    """Move ``<style>`` rules with simple selectors onto matching elements.
+
+    Supports ``tag``, ``.class``, ``#id`` and combinations such as
+    ``td.label``; declarations already in a ``style`` attribute win. Other
+    rules are left in a ``<style>`` element.
+    """
+    styles = STYLE_RE.findall(markup)
+    if not styles:
+        return markup
+    rules, kept = _css_rules('\n'.join(styles))
+    markup = STYLE_RE.sub('', markup)
+    if kept:
+        markup = re.sub(
+            r'(</head>|<body)', lambda m: f'<style>{" ".join(kept)}</style>{m.group(1)}',
+            markup, count=1, flags=re.I,
+        )
+
+    def apply(match):
+        tag, attrs, close = match.group(1).lower(), match.group(2) or '', match.group(3)
+        classes = set((re.search(r'\sclass="([^"]*)"', attrs) or [None, ''])[1].split())
+        id_ = (re.search(r'\sid="([^"]*)"', attrs) or [None, None])[1]
+        declarations = [
+            decl for (rule_tag, rule_cls, rule_id), decl in ((r[2], r[3]) for r in rules)
+            if (not rule_tag or rule_tag == tag)
+            and (not rule_cls or rule_cls in classes)
+            and (not rule_id or rule_id == id_)
+        ]
+        if not declarations:
+            return match.group(0)
+        existing = re.search(r'\sstyle="([^"]*)"', attrs)
+        if existing:
+            declarations.append(existing.group(1))
+            attrs = attrs[:existing.start()] + attrs[existing.end():]
+        style = '; '.join(d.strip().rstrip(';') for d in declarations if d.strip())
+        return f'<{match.group(1)}{attrs} style="{style}"{close}>'
+
+    return START_TAG_RE.sub(apply, markup)
+
+
+class _Unsupported(Exception):
+    pass
+
+
+def _flatten(template):
+    """Resolve ``{% extends %}`` chains into one list of nodes.
+
+    Returns ``(nodes, templates)`` where ``templates`` is every template
+    involved, child first.
+    """
+    templates = [template]
+    blocks = {}
+    nodes = template.nodelist
+    while True:
+        extends = next((node for node in nodes if isinstance(node, ExtendsNode)), None)
+        if extends is None:
+            break
+        if not isinstance(extends.parent_name.var, str) or extends.parent_name.filters:
+            raise _Unsupported('dynamic {% extends %}')
+        for name, block in extends.blocks.items():
+            blocks.setdefault(name, block)
+        parent = template.engine.get_template(extends.parent_name.var)
+        templates.append(parent)
+        nodes = parent.nodelist
+
+    def expand(nodelist):
+        for node in nodelist:
+            if isinstance(node, BlockNode):
+                yield from expand(blocks.get(node.name, node).nodelist)
+            elif isinstance(node, TextNode):
+                yield node
+            else:
+                if node.get_nodes_by_type(BlockNode):
+                    raise _Unsupported('{% block %} inside another tag')
+                for variable in node.get_nodes_by_type(VariableNode):
+                    if 'block.' in variable.filter_expression.token:
+                        raise _Unsupported('{{ block.super }}')
+                yield node
+
+    return list(expand(nodes)), templates
+
+
+def _version(templates):
+    return tuple(os.stat(t.origin.name).st_mtime_ns for t in templates if t.origin.name)
+
+
+class CompiledEmail:
+    """An email template with its static HTML and text worked out in advance."""
+
+    def __init__(self, template_name):
+        self.template_name = template_name
+        self.template = get_template(template_name).template
+        try:
+            nodes, templates = _flatten(self.template)
+        except _Unsupported:
+            nodes, templates = None, [self.template]
+        self.templates = templates
+        self.version = _version(templates)
+
+        if nodes is None:
+            self.html_parts = self.text_parts = self.nodes = None
+            return
+
+        # Merge adjacent text into fragments; dynamic nodes become markers
+        self.nodes = []
+        source = []
+        for node in nodes:
+            if isinstance(node, TextNode):
+                source.append(node.s)
+            else:
+                source.append(MARKER.format(len(self.nodes)))
+                self.nodes.append(node)
+        source = inline_css(''.join(source))
+        self.html_parts = self._split(source)
+        self.text_parts = self._split(html_to_text(source))
+
+    @staticmethod
+    def _split(source):
+        """``'a<m0>b'`` -> ``['a', 0, 'b']``."""
+        parts = MARKER_RE.split(source)
+        return [int(part) if i % 2 else part for i, part in enumerate(parts) if part or i % 2]
+
+    def render(self, context):
+        """Return ``(html, text)`` for ``context``."""
+        context = Context(context or {}, autoescape=self.template.engine.autoescape)
+        if self.nodes is None:
+            markup = self.template.render(context)
+            return markup, html_to_text(markup)
+
+        with context.render_context.push_state(self.template), context.bind_template(self.template):
+            outputs = [node.render_annotated(context) for node in self.nodes]
+        markup = ''.join(part if isinstance(part, str) else outputs[part] for part in self.html_parts)
+        text = ''.join(
+            part if isinstance(part, str) else _snippet_text(outputs[part]) for part in self.text_parts
+        )
+        return markup, _tidy(text)
+
+
+_compiled = {}
+
+
+def compile_email(template_name):
+    """Return the process-wide ``CompiledEmail`` for ``template_name``."""
+    compiled = _compiled.get(template_name)
+    if compiled is not None and settings.DEBUG:
+        try:
+            if _version(compiled.templates) != compiled.version:
+                compiled = None
+        except OSError:
+            compiled = None
+    if compiled is None:
+        compiled = _compiled[template_name] = CompiledEmail(template_name)
+    return compiled
+
+
+def render_email(template_name, context):
+    """Render an email template; returns ``(html, text)``."""
+    return compile_email(template_name).render(context)
+
+
+def precompile():
+    """Compile every template under ``emails/`` (called once at startup)."""
+    names = set()
+    for engine in engines.all():
+        for template_dir in getattr(engine, 'template_dirs', ()):
+            email_dir = os.path.join(template_dir, 'emails')
+            if os.path.isdir(email_dir):
+                names.update(
+                    f'emails/{name}' for name in os.listdir(email_dir)
+                    if name.endswith('.html') and name != 'base_email.html'
+                )
+    for name in sorted(names):
+        compile_email(name)
+    return sorted(names)
+
@@ -0,0 +1,155 @@
+"""
+Streaming CSV / JSON Lines exports for the dashboard lists.
+
+Rows are read with ``values_list().iterator(chunk_size=...)`` (a server-side
+cursor on PostgreSQL) and written through ``StreamingHttpResponse``, so
+memory stays flat however many rows match and the header is sent before the
+first chunk is fetched. Chat exports fetch the transcripts of each chunk of
+conversations with two extra queries: live messages and archived ones.
+
+Most cells come from public forms, so CSV text cells that a spreadsheet
+would run as a formula (starting with ``=``, ``+``, ``-``, ``@``, a tab or
+a carriage return) are prefixed with ``'``. JSON Lines is left as stored.
+"""
+
+import csv
+import json
+from itertools import islice
+
+from django.db import models
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .chat_archive import archived_transcripts
+from .models import ChatMessage
+
+# Spreadsheets treat text cells starting with these as formulas
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+CHUNK_SIZE = 2000
+
+# Flush the response roughly every 64KB rather than once per row
+BUFFER_SIZE = 64 * 1024
+
+DEMO_FIELDS = [
+    'id', 'created_at', 'updated_at', 'cafe_name', 'city', 'num_tables', 'num_outlets',
+    'contact_name', 'phone', 'email', 'whatsapp', 'source', 'status', 'demo_url',
+    'demo_username', 'demo_expires_at', 'credentials_sent_at', 'last_contacted_at',
+    'message', 'notes',
+]
+MESSAGE_FIELDS = [
+    'id', 'created_at', 'name', 'email', 'phone', 'subject', 'message',
+    'is_read', 'is_replied', 'replied_at',
+]
+SUBSCRIBER_FIELDS = ['id', 'email', 'is_active', 'subscribed_at', 'unsubscribed_at']
+CHAT_FIELDS = [
+    'id', 'created_at', 'updated_at', 'session_id', 'visitor_name', 'visitor_email',
+    'visitor_phone', 'page_url', 'ip_address', 'is_lead', 'is_resolved', 'admin_notes',
+]
+
+
+class Echo:
+    """Pseudo-buffer that hands back what ``csv.writer`` writes to it."""
+
+    def write(self, value):
+        return value
+
+
+def _isoformat_dates(rows, columns):
+    """Replace date/datetime values in ``columns`` with ISO 8601 strings."""
+    for row in rows:
+        row = list(row)
+        for i in columns:
+            if row[i] is not None:
+                row[i] = row[i].isoformat()
+        yield row
+
+
+def _buffered(lines):
+    """Yield the first line at once, then join lines into ~BUFFER_SIZE chunks."""
+    lines = iter(lines)
+    first = next(lines, None)
+    if first is not None:
+        yield first
+    chunk, size = [], 0
+    for line in lines:
+        chunk.append(line)
+        size += len(line)
+        if size >= BUFFER_SIZE:
+            yield ''.join(chunk)
+            chunk, size = [], 0
+    if chunk:
+        yield ''.join(chunk)
+
+
+def _with_transcripts(rows, chunk_size):
+    """Append each conversation's messages to its row, one query per chunk."""
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        transcripts = {row[0]: [] for row in chunk}
+        for conversation_id, entries in archived_transcripts(transcripts).items():
+            transcripts[conversation_id] = [tuple(entry) for entry in entries]
+        messages = ChatMessage.objects.filter(conversation_id__in=transcripts).order_by(
+            'conversation_id', 'created_at', 'id'
+        ).values_list('conversation_id', 'role', 'content', 'created_at')
+        for conversation_id, role, content, created_at in messages:
+            transcripts[conversation_id].append((role, content, created_at.isoformat()))
+        for row in chunk:
+            row.append(transcripts[row[0]])
+            yield row
+
+
+def _csv_cell(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return f"'{value}"
+    return value
+
+
+def _csv_lines(fields, rows, transcripts):
+    writer = csv.writer(Echo())
+    yield writer.writerow(fields + (['transcript'] if transcripts else []))
+    for row in rows:
+        if transcripts:
+            row[-1] = '\n'.join(f'{role}: {content}' for role, content, created_at in row[-1])
+        # csv writes None as an empty field
+        yield writer.writerow([_csv_cell(value) for value in row])
+
+
+def _jsonl_lines(fields, rows, transcripts):
+    for row in rows:
+        record = dict(zip(fields, row))
+        if transcripts:
+            record['messages'] = [
+                {'role': role, 'content': content, 'created_at': created_at}
+                for role, content, created_at in row[-1]
+            ]
+        yield json.dumps(record, ensure_ascii=False) + '\n'
+
+
+def export_response(queryset, fields, name, export_format, transcripts=False, chunk_size=CHUNK_SIZE):
+    """Stream ``fields`` of every row in ``queryset`` as a file download."""
+    if export_format not in FORMATS:
+        export_format = 'csv'
+
+    date_columns = [
+        i for i, field in enumerate(fields)
+        if isinstance(queryset.model._meta.get_field(field), models.DateField)
+    ]
+    rows = queryset.values_list(*fields).iterator(chunk_size=chunk_size)
+    rows = _isoformat_dates(rows, date_columns)
+    if transcripts:
+        rows = _with_transcripts(rows, chunk_size)
+    lines = (_csv_lines if export_format == 'csv' else _jsonl_lines)(fields, rows, transcripts)
+
+    response = StreamingHttpResponse(_buffered(lines), content_type=FORMATS[export_format])
+    filename = f"kaffero-{name}-{timezone.localdate():%Y%m%d}.{export_format}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
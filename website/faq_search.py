@@ -0,0 +1,150 @@
+"""
+FAQ retrieval for the Kaffero chatbot.
+
+Each process keeps a BM25 index of the active FAQs (question and answer,
+the question counting twice) so the chatbot can answer questions its
+keyword intents do not cover from the FAQs staff already maintain.
+
+The index is an inverted one: for each term, the FAQs containing it and
+how often. Scoring a message only visits the FAQs that share a term with
+it, so it takes well under a millisecond even with thousands of FAQs.
+A match must also contain most of the message's informative words
+(``CHATBOT_FAQ_MIN_SCORE`` of their IDF weight) to be used.
+
+The FAQs come from the process's ``catalog``, so searching runs no
+queries. When the catalog is reloaded, only the FAQs whose ``updated_at``
+changed (or that were removed) are re-indexed.
+"""
+
+import math
+import re
+import threading
+from collections import Counter, defaultdict, namedtuple
+
+from django.conf import settings
+
+from .catalog import get_catalog
+
+# BM25 term frequency saturation and length normalization
+K1 = 1.2
+B = 0.75
+
+# Messages with fewer informative words than this are never matched
+MIN_TERMS = 2
+
+WORD_RE = re.compile(r'[a-z0-9]+')
+STOPWORDS = frozenset('''
+    a about an and any are as at be by can could do does for from get have how i if in is it its
+    me my of on or our please should so tell that the there this to us was we what when where which
+    who will with would you your kaffero
+'''.split())
+
+Match = namedtuple('Match', ['faq_id', 'question', 'answer', 'score'])
+
+
+def stem(word):
+    """Fold simple plurals: ``outlets`` -> ``outlet``, ``categories`` -> ``category``."""
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+        return word[:-1]
+    return word
+
+
+def tokenize(text):
+    return [stem(word) for word in WORD_RE.findall(text.lower()) if word not in STOPWORDS]
+
+
+class Index:
+    """BM25 inverted index over FAQs, updated one FAQ at a time."""
+
+    def __init__(self):
+        self.faqs = {}                       # id -> (updated_at, question, answer, length, terms)
+        self.postings = defaultdict(dict)    # term -> {id: term frequency}
+        self.total_length = 0
+
+    def add(self, faq):
+        self.remove(faq.pk)
+        terms = Counter(tokenize(faq.question) * 2 + tokenize(faq.answer))
+        for term, count in terms.items():
+            self.postings[term][faq.pk] = count
+        length = sum(terms.values())
+        self.faqs[faq.pk] = (faq.updated_at, faq.question, faq.answer, length, tuple(terms))
+        self.total_length += length
+
+    def remove(self, faq_id):
+        entry = self.faqs.pop(faq_id, None)
+        if entry is None:
+            return
+        self.total_length -= entry[3]
+        for term in entry[4]:
+            del self.postings[term][faq_id]
+            if not self.postings[term]:
+                del self.postings[term]
+
+    def idf(self, term):
+        # Words no FAQ uses weigh as much as the rarest ones, not more, so a
+        # few unknown words in a question do not swamp a small FAQ list
+        count = len(self.postings.get(term, ())) or 1
+        return math.log(1 + (len(self.faqs) - count + 0.5) / (count + 0.5))
+
+    def search(self, text):
+        """The best ``Match`` for ``text``, or None. ``score`` is the share of its terms' IDF found."""
+        terms = set(tokenize(text))
+        if len(terms) < MIN_TERMS or not self.faqs:
+            return None
+        average_length = self.total_length / len(self.faqs)
+        scores = defaultdict(float)
+        found = defaultdict(float)
+        total = 0.0
+        for term in terms:
+            idf = self.idf(term)
+            total += idf
+            for faq_id, count in self.postings.get(term, {}).items():
+                length = self.faqs[faq_id][3]
+                scores[faq_id] += idf * count * (K1 + 1) / (count + K1 * (1 - B + B * length / average_length))
+                found[faq_id] += idf
+        if not scores:
+            return None
+        best = max(scores, key=lambda faq_id: (scores[faq_id], -faq_id))
+        updated_at, question, answer = self.faqs[best][:3]
+        return Match(best, question, answer, found[best] / total)
+
+
+_index = Index()
+_indexed = None     # the catalog snapshot _index was last brought in line with
+_lock = threading.Lock()
+
+
+def _refresh(index, faqs):
+    """Bring ``index`` in line with ``faqs``, re-indexing only what changed."""
+    current = {faq.pk: faq for faq in faqs}
+    for faq_id in set(index.faqs) - set(current):
+        index.remove(faq_id)
+    for faq_id, faq in current.items():
+        if index.faqs.get(faq_id, (None,))[0] != faq.updated_at:
+            index.add(faq)
+
+
+def get_index():
+    """Return this process's FAQ index, up to date with its catalog."""
+    global _indexed
+
+    catalog = get_catalog()
+    if catalog is not _indexed:
+        with _lock:
+            if catalog is not _indexed:
+                _refresh(_index, catalog.faqs)
+                _indexed = catalog
+    return _index
+
+
+def best_match(text):
+    """The FAQ answering ``text`` confidently enough, or None."""
+    index = get_index()
+    with _lock:
+        match = index.search(text)
+    if match and match.score >= settings.CHATBOT_FAQ_MIN_SCORE:
+        return match
+    return None
+
@@ -2,10 +2,12 @@
 Forms for Kaffero showcase website.
 """
 
-import requests
+from functools import partial
+
 from django import forms
 from django.conf import settings
-from .models import DemoRequest, ContactMessage, NewsletterSubscriber
+from .models import DemoRequest, ContactMessage
+from . import spam
 
 
 def verify_turnstile(token):
@@ -17,6 +19,9 @@ def verify_turnstile(token):
         # Skip validation if no secret key configured (development)
         return True
 
+    # Imported here: requests is slow to import and only needed for this call
+    import requests
+
     try:
         response = requests.post(
             'https://challenges.cloudflare.com/turnstile/v0/siteverify',
@@ -32,9 +37,27 @@ def verify_turnstile(token):
         return False
 
 
+def honeypot_field():
+    """Field people never see; see ``website.spam``."""
+    return forms.CharField(required=False, widget=forms.TextInput(attrs={
+        'tabindex': '-1',
+        'autocomplete': 'off',
+    }))
+
+
+def timestamp_field(form_name):
+    """Hidden field carrying the signed time the form was rendered."""
+    return forms.CharField(
+        required=False, widget=forms.HiddenInput, initial=partial(spam.form_token, form_name),
+    )
+
+
 class DemoRequestForm(forms.ModelForm):
     """Form for demo requests."""
 
+    website = honeypot_field()
+    rendered_at = timestamp_field('demo')
+
     privacy_agreed = forms.BooleanField(
         required=True,
         label='I agree to the privacy policy'
@@ -88,6 +111,9 @@ class DemoRequestForm(forms.ModelForm):
 class ContactForm(forms.ModelForm):
     """Form for contact messages."""
 
+    website = honeypot_field()
+    rendered_at = timestamp_field('contact')
+
     class Meta:
         model = ContactMessage
         fields = ['name', 'email', 'phone', 'subject', 'message']
@@ -115,15 +141,14 @@ class ContactForm(forms.ModelForm):
         }
 
 
-class NewsletterForm(forms.ModelForm):
-    """Form for newsletter subscription."""
+class NewsletterForm(forms.Form):
+    """Form for newsletter subscription.
 
-    class Meta:
-        model = NewsletterSubscriber
-        fields = ['email']
-        widgets = {
-            'email': forms.EmailInput(attrs={
-                'class': 'form-input',
-                'placeholder': 'Enter your email'
-            })
-        }
+    Not a ModelForm: duplicates are handled by the upsert in
+    ``website.newsletter.subscribe`` rather than a uniqueness query.
+    """
+
+    email = forms.EmailField(max_length=254, widget=forms.EmailInput(attrs={
+        'class': 'form-input',
+        'placeholder': 'Enter your email'
+    }))
@@ -0,0 +1,159 @@
+"""
+Demo request funnel for Kaffero website.
+
+``DemoRequest.status`` only holds the current stage, so every status change
+is also appended to ``DemoStatusChange`` (in the same transaction as the
+save), and counted in ``DemoFunnelDaily``: requests entering and leaving
+each status per day, source and city, with the time they spent in the
+stage they left. The funnel page reads only the daily table, so it costs
+the same however many years of requests there are.
+
+``record()`` does both as a status changes, ``record_bulk()`` for a whole
+selection at once; new requests are recorded by the ``post_save`` signal. ``rebuild()`` (``manage.py rebuild_demo_funnel``)
+recomputes the daily table from the log, and ``seed()`` gives requests made
+before the log existed their initial transitions. The log keeps the rows of
+deleted requests, so their history stays in the daily table and in a
+rebuild alike.
+"""
+
+from collections import Counter, defaultdict
+from datetime import datetime, time
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import DemoFunnelDaily, DemoRequest, DemoStatusChange
+from .rollups import increment, increment_many
+
+BATCH_SIZE = 1000
+
+
+def normalize_city(city):
+    """``' kochi '`` and ``'Kochi'`` count as the same city."""
+    return ' '.join(city.split()).title()[:100]
+
+
+def stage_seconds(entered_at, left_at):
+    return max(int((left_at - entered_at).total_seconds()), 0)
+
+
+def record(demo, from_status, to_status, user=None, at=None):
+    """Log ``demo`` moving from ``from_status`` (blank when new) to ``to_status``.
+
+    Call inside the transaction that saves the new status. Sets
+    ``demo.status_changed_at``, which that save stores.
+    """
+    at = at or timezone.now()
+    city = normalize_city(demo.city)
+    seconds = stage_seconds(demo.status_changed_at or demo.created_at, at) if from_status else 0
+    DemoStatusChange.objects.create(
+        demo=demo, source=demo.source, city=city, from_status=from_status, to_status=to_status,
+        seconds_in_stage=seconds, changed_at=at, changed_by=user,
+    )
+    keys = {'day': timezone.localdate(at), 'source': demo.source, 'city': city}
+    increment(DemoFunnelDaily, {**keys, 'status': to_status}, {'entered': 1})
+    if from_status:
+        increment(DemoFunnelDaily, {**keys, 'status': from_status}, {'exited': 1, 'seconds_in_stage': seconds})
+    demo.status_changed_at = at
+
+
+def record_bulk(demos, to_status, user=None):
+    """Move every request in the ``demos`` queryset to ``to_status``, logging each like ``record()``.
+
+    Reads the rows once, then writes the log, the aggregates and the new
+    status with one statement each. Call inside a
+    transaction; returns the number of requests changed.
+    """
+    at = timezone.now()
+    rows = list(demos.select_for_update().exclude(status=to_status).values_list(
+        'pk', 'status', 'source', 'city', 'created_at', 'status_changed_at',
+    ))
+    if not rows:
+        return 0
+    counts = defaultdict(Counter)
+    changes = []
+    for pk, from_status, source, city, created_at, status_changed_at in rows:
+        city = normalize_city(city)
+        seconds = stage_seconds(status_changed_at or created_at, at)
+        changes.append(DemoStatusChange(
+            demo_id=pk, source=source, city=city, from_status=from_status, to_status=to_status,
+            seconds_in_stage=seconds, changed_at=at, changed_by=user,
+        ))
+        key = (timezone.localdate(at), source, city)
+        counts[key + (to_status,)]['entered'] += 1
+        left = counts[key + (from_status,)]
+        left['exited'] += 1
+        left['seconds_in_stage'] += seconds
+
+    DemoStatusChange.objects.bulk_create(changes)
+    increment_many(DemoFunnelDaily, ['day', 'source', 'city', 'status'], counts)
+    DemoRequest.objects.filter(pk__in=[row[0] for row in rows]).update(
+        status=to_status, status_changed_at=at, updated_at=at,
+    )
+    return len(rows)
+
+
+def seed(batch_size=BATCH_SIZE):
+    """Log the transitions of requests that have none; returns the number seeded.
+
+    A request is taken to have arrived as pending and, if it has moved on,
+    to have reached its current status when it was last updated.
+    """
+    unlogged = DemoRequest.objects.filter(
+        ~Exists(DemoStatusChange.objects.filter(demo=OuterRef('pk')))
+    ).order_by('pk').only('status', 'source', 'city', 'created_at', 'updated_at', 'status_changed_at')
+    seeded = 0
+    while True:
+        demos = list(unlogged[:batch_size])
+        if not demos:
+            break
+        changes, moved = [], []
+        for demo in demos:
+            keys = {'demo': demo, 'source': demo.source, 'city': normalize_city(demo.city)}
+            changes.append(DemoStatusChange(**keys, to_status=DemoRequest.Status.PENDING, changed_at=demo.created_at))
+            if demo.status != DemoRequest.Status.PENDING:
+                demo.status_changed_at = demo.status_changed_at or demo.updated_at
+                changes.append(DemoStatusChange(
+                    **keys, from_status=DemoRequest.Status.PENDING, to_status=demo.status,
+                    seconds_in_stage=stage_seconds(demo.created_at, demo.status_changed_at),
+                    changed_at=demo.status_changed_at,
+                ))
+                moved.append(demo)
+        with transaction.atomic():
+            DemoStatusChange.objects.bulk_create(changes, batch_size=batch_size)
+            DemoRequest.objects.bulk_update(moved, ['status_changed_at'], batch_size=batch_size)
+        seeded += len(demos)
+    return seeded
+
+
+def rebuild(since=None):
+    """Recompute ``DemoFunnelDaily`` for ``since`` (a date) onwards, or for all days.
+
+    Returns the number of rows written.
+    """
+    start = timezone.make_aware(datetime.combine(since, time.min)) if since else None
+    counts = defaultdict(Counter)
+
+    changes = DemoStatusChange.objects.filter(changed_at__gte=start) if start else DemoStatusChange.objects.all()
+    rows = changes.values_list('source', 'city', 'from_status', 'to_status', 'seconds_in_stage', 'changed_at')
+
+    for source, city, from_status, to_status, seconds, changed_at in rows.iterator(chunk_size=5000):
+        key = (timezone.localdate(changed_at), source, city)
+        counts[key + (to_status,)]['entered'] += 1
+        if from_status:
+            left = counts[key + (from_status,)]
+            left['exited'] += 1
+            left['seconds_in_stage'] += seconds
+
+    with transaction.atomic():
+        existing = DemoFunnelDaily.objects.filter(day__gte=since) if since else DemoFunnelDaily.objects.all()
+        existing.delete()
+        DemoFunnelDaily.objects.bulk_create(
+            [
+                DemoFunnelDaily(day=day, source=source, city=city, status=status, **values)
+                for (day, source, city, status), values in sorted(counts.items())
+            ],
+            batch_size=500,
+        )
+    return len(counts)
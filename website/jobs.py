@@ -0,0 +1,271 @@
+"""
+Background jobs for Kaffero website.
+
+Slow work (sending email, batch jobs) is queued as ``Job`` rows instead of
+being done inside the request, and run by ``manage.py runworkers``; no
+broker is needed besides the database.
+
+- ``@task`` registers a function as a job; ``enqueue()`` adds a row for it
+  with JSON keyword arguments, a ``priority`` (higher first), ``run_at`` for
+  later and an optional ``unique_key``, of which only one job can be queued
+  or running at a time. Queued inside a transaction, a job becomes visible
+  when it commits.
+- ``claim()`` hands jobs out a batch at a time. On Postgres the ready rows
+  are locked with ``SELECT ... FOR UPDATE SKIP LOCKED``, so workers never
+  wait on each other; elsewhere (SQLite) a conditional ``UPDATE`` only
+  takes rows that are still queued. Either way a claimed job holds a lease
+  of ``JOB_LEASE_SECONDS``: a job whose worker died is queued again once
+  its lease runs out.
+- A job that raises is retried after ``JOB_RETRY_DELAY`` seconds, doubling
+  each time, until it has run ``max_attempts`` times.
+- ``@periodic(seconds)`` registers a recurring task. Running workers keep
+  one job queued for it (``ensure_periodic()``, checked every
+  ``PERIODIC_CHECK_SECONDS``), and a run that succeeds queues the same row
+  again ``seconds`` later instead of finishing it.
+
+Tasks may run more than once (a retry, or a lease that ran out), so they
+should be safe to repeat. With ``JOBS_RUN_INLINE`` (the default, for
+deployments without a worker) jobs run in the process that queued them once
+its transaction commits.
+"""
+
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, close_old_connections, connection, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 3
+PERIODIC_CHECK_SECONDS = 60
+
+TASKS = {}
+PERIODIC = {}   # task name -> seconds between runs
+
+
+def task(func):
+    """Register ``func`` as a task, named after its module and function."""
+    TASKS[f'{func.__module__}.{func.__name__}'] = func
+    func.task_name = f'{func.__module__}.{func.__name__}'
+    return func
+
+
+def periodic(seconds):
+    """Register the decorated function as a task run every ``seconds`` by the workers."""
+    def register(func):
+        task(func)
+        PERIODIC[func.task_name] = seconds
+        return func
+    return register
+
+
+def periodic_key(name):
+    return f'periodic:{name}'
+
+
+def ensure_periodic():
+    """Queue each periodic task that has no queued or running job; returns the jobs added."""
+    keys = {periodic_key(name): name for name in PERIODIC}
+    busy = set(Job.objects.filter(
+        unique_key__in=keys, status__in=[Job.Status.QUEUED, Job.Status.RUNNING],
+    ).values_list('unique_key', flat=True))
+    return [enqueue(TASKS[name], unique_key=key) for key, name in keys.items() if key not in busy]
+
+
+def enqueue(func, kwargs=None, priority=0, run_at=None, unique_key='', max_attempts=MAX_ATTEMPTS):
+    """Queue ``func(**kwargs)``; returns the job.
+
+    With a ``unique_key`` already queued or running, nothing is added and
+    that job is returned instead.
+    """
+    job = Job(
+        task=func.task_name, kwargs=kwargs or {}, priority=priority, run_at=run_at or timezone.now(),
+        unique_key=unique_key, max_attempts=max_attempts,
+    )
+    if unique_key:
+        try:
+            with transaction.atomic():
+                job.save()
+        except IntegrityError:
+            return Job.objects.filter(unique_key=unique_key, status__in=[Job.Status.QUEUED, Job.Status.RUNNING]).first()
+    else:
+        job.save()
+    if settings.JOBS_RUN_INLINE:
+        transaction.on_commit(lambda: _run_inline(job.pk))
+    return job
+
+
+def _run_inline(pk):
+    for job in _take(Job.objects.filter(pk=pk), f'inline-{uuid.uuid4().hex[:8]}', timezone.now()):
+        run(job)
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+
+
+def _take(candidates, worker, now):
+    """Lease the still-queued jobs among ``candidates`` to ``worker``."""
+    token = f'{worker}:{uuid.uuid4().hex[:8]}'
+    Job.objects.filter(pk__in=list(candidates.values_list('pk', flat=True)), status=Job.Status.QUEUED).update(
+        status=Job.Status.RUNNING, locked_by=token, attempts=F('attempts') + 1,
+        locked_until=now + timedelta(seconds=settings.JOB_LEASE_SECONDS),
+    )
+    return list(Job.objects.filter(locked_by=token, status=Job.Status.RUNNING).order_by('-priority', 'run_at', 'pk'))
+
+
+def recover(now=None):
+    """Queue again the jobs whose lease ran out; returns how many."""
+    now = now or timezone.now()
+    expired = Job.objects.filter(status=Job.Status.RUNNING, locked_until__lt=now)
+    failed = expired.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.Status.FAILED, finished_at=now, locked_until=None, last_error='Lease expired',
+    )
+    return failed + expired.update(status=Job.Status.QUEUED, locked_until=None, last_error='Lease expired')
+
+
+def claim(size=1, worker=None):
+    """Lease up to ``size`` ready jobs, highest priority first."""
+    now = timezone.now()
+    worker = worker or worker_name()
+    recover(now)
+    ready = Job.objects.filter(status=Job.Status.QUEUED, run_at__lte=now).order_by('-priority', 'run_at', 'pk')
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            return _take(ready.select_for_update(skip_locked=True)[:size], worker, now)
+    # Outside a transaction, so SQLite never has to upgrade a read lock;
+    # workers racing for the same rows each get the ones they updated
+    return _take(ready[:size], worker, now)
+
+
+def run(job):
+    """Run a claimed job and record the outcome; returns True if it succeeded."""
+    func = TASKS.get(job.task)
+    mine = Job.objects.filter(pk=job.pk, locked_by=job.locked_by, status=Job.Status.RUNNING)
+    try:
+        if func is None:
+            raise LookupError(f'Unknown task {job.task}')
+        func(**job.kwargs)
+    except Exception as exc:
+        logger.exception('Job %s (%s) failed', job.pk, job.task)
+        now = timezone.now()
+        error = f'{type(exc).__name__}: {exc}'
+        if job.attempts < job.max_attempts:
+            delay = settings.JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+            mine.update(
+                status=Job.Status.QUEUED, run_at=now + timedelta(seconds=delay), locked_until=None, last_error=error,
+            )
+        else:
+            mine.update(status=Job.Status.FAILED, finished_at=now, locked_until=None, last_error=error)
+        return False
+    now = timezone.now()
+    if job.unique_key == periodic_key(job.task) and job.task in PERIODIC:
+        mine.update(
+            status=Job.Status.QUEUED, run_at=now + timedelta(seconds=PERIODIC[job.task]), finished_at=now,
+            attempts=0, locked_until=None, last_error='',
+        )
+    else:
+        mine.update(status=Job.Status.DONE, finished_at=now, locked_until=None, last_error='')
+    return True
+
+
+def work(stop, batch_size=1, poll_interval=None, burst=False, log=None):
+    """Claim and run jobs until ``stop`` is set, or the queue is empty with ``burst``.
+
+    Returns counts of jobs ``done`` and ``failed``.
+    """
+    log = log or (lambda message: None)
+    poll_interval = settings.JOB_POLL_INTERVAL if poll_interval is None else poll_interval
+    name = worker_name()
+    counts = {'done': 0, 'failed': 0}
+    next_periodic_check = 0.0
+    try:
+        while not stop.is_set():
+            close_old_connections()
+            try:
+                if time.monotonic() >= next_periodic_check:
+                    ensure_periodic()
+                    next_periodic_check = time.monotonic() + PERIODIC_CHECK_SECONDS
+                jobs = claim(batch_size, name)
+            except DatabaseError:
+                # e.g. a dropped connection or a busy SQLite file; try again later
+                logger.exception('Worker %s could not claim jobs', name)
+                stop.wait(poll_interval)
+                continue
+            if not jobs:
+                if burst:
+                    break
+                stop.wait(poll_interval)
+                continue
+            for job in jobs:
+                outcome = 'done' if run(job) else 'failed'
+                counts[outcome] += 1
+                log(f'{name} {job.task} #{job.pk}: {outcome}')
+    finally:
+        connections.close_all()
+    return counts
+
+
+def process_context():
+    """The ``multiprocessing`` context for worker processes: fork where available, else spawn."""
+    # Forked workers must not share the parent's database connections
+    connections.close_all()
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('fork' if 'fork' in methods else 'spawn')
+
+
+def setup_process():
+    """Prepare a process started from ``process_context()`` to use Django."""
+    # Spawned workers start from scratch; forked ones already have Django set up
+    django.setup()
+
+
+def _work_in_process(stop, options):
+    # The parent handles Ctrl-C and SIGTERM by setting ``stop``
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    setup_process()
+    work(stop, **options)
+
+
+def run_workers(workers=1, processes=False, **options):
+    """Run ``work()`` in ``workers`` threads (or processes) until SIGINT or SIGTERM.
+
+    With ``burst`` it returns once every worker found the queue empty.
+    Running jobs are finished before the workers exit.
+    """
+    if processes:
+        context = process_context()
+        stop = context.Event()
+        pool = [context.Process(target=_work_in_process, args=(stop, options)) for _ in range(workers)]
+    else:
+        stop = threading.Event()
+        pool = [threading.Thread(target=work, args=(stop,), kwargs=options) for _ in range(workers)]
+
+    def shutdown(signum, frame):
+        stop.set()
+
+    previous = {signum: signal.signal(signum, shutdown) for signum in (signal.SIGINT, signal.SIGTERM)}
+    try:
+        for worker in pool:
+            worker.start()
+        for worker in pool:
+            # Joined with a timeout so the signal handlers run promptly
+            while worker.is_alive():
+                worker.join(1)
+    finally:
+        for signum, handler in previous.items():
+            signal.signal(signum, handler)
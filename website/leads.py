@@ -0,0 +1,182 @@
+"""
+Contact details (lead) extraction from chat messages.
+
+``extract()`` finds every email address and Indian mobile number in a
+message with precompiled patterns and normalizes them: emails lowercased,
+phone numbers to E.164 (``+919876543210``). ``record()`` adds what was
+found to a conversation: all distinct contacts go to ``contacts``, the first
+email and phone fill ``visitor_email`` / ``visitor_phone``, and the
+conversation becomes a lead.
+
+``backfill()`` re-runs the extraction over every stored visitor message,
+live or archived, splitting the work into primary key ranges scanned by a
+process pool, then bulk-updates the conversations. It does not touch
+``updated_at``, so backfilled conversations keep their place in the
+archiving schedule.
+"""
+
+import re
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from django.db import transaction
+from django.db.models import Max, Min
+
+from .chat_archive import decode
+from .jobs import process_context, setup_process
+from .models import ChatArchive, ChatConversation, ChatMessage
+
+# user@example.com; the domain needs a dot and a letters-only TLD
+EMAIL_RE = re.compile(r'[\w.+-]+@(?:[A-Za-z0-9-]+\.)+[A-Za-z]{2,}')
+# 98765 43210, +91-98470-12345, 09876543210...; not part of a longer number.
+# The leading lookahead lets the scan skip past non-digits cheaply.
+PHONE_RE = re.compile(r'(?=[+\d])(?<![\d+])(?:(?:\+|00)?91[\s.-]?|0)?([6-9](?:[\s.-]?\d){9})(?![\s.-]?\d)')
+NON_DIGIT_RE = re.compile(r'\D')
+
+CHUNK_SIZE = 20000
+UPDATE_BATCH_SIZE = 500
+LEAD_FIELDS = ['visitor_email', 'visitor_phone', 'is_lead', 'contacts']
+
+Contacts = namedtuple('Contacts', ['emails', 'phones'])
+
+
+def normalize_email(email):
+    return email.strip('.').lower()
+
+
+NO_CONTACTS = Contacts((), ())
+
+
+def _unique(values):
+    return tuple(dict.fromkeys(values))
+
+
+def extract(text):
+    """Every distinct email and phone number in ``text``, in order of appearance."""
+    emails = EMAIL_RE.findall(text) if '@' in text else ()
+    phones = PHONE_RE.findall(text)
+    # Most messages contain neither
+    if not emails and not phones:
+        return NO_CONTACTS
+    return Contacts(
+        _unique(normalize_email(email) for email in emails),
+        _unique('+91' + NON_DIGIT_RE.sub('', digits) for digits in phones),
+    )
+
+
+def merge(first, second):
+    return Contacts(_unique(first.emails + second.emails), _unique(first.phones + second.phones))
+
+
+def record(conversation, found):
+    """Add ``found`` contacts to ``conversation``; returns True if anything changed."""
+    new = [contact for contact in found.emails + found.phones if contact not in conversation.contacts]
+    if not new:
+        return False
+    conversation.contacts = conversation.contacts + new
+    if found.emails and not conversation.visitor_email:
+        conversation.visitor_email = found.emails[0]
+    if found.phones and not conversation.visitor_phone:
+        conversation.visitor_phone = found.phones[0]
+    conversation.is_lead = True
+    return True
+
+
+# =============================================================================
+# Backfill
+# =============================================================================
+
+def scan(task):
+    """Extract contacts from one primary key range of messages or archives.
+
+    ``task`` is ``(source, start, end)``; returns ``(messages scanned,
+    [(conversation_id, Contacts), ...])`` with conversations in first-seen
+    order.
+    """
+    source, start, end = task
+    found = {}
+    scanned = 0
+
+    if source == 'archives':
+        rows = ChatArchive.objects.filter(pk__gte=start, pk__lt=end).order_by('pk')
+        texts = (
+            (conversation_id, content)
+            for conversation_id, blob in rows.values_list('conversation_id', 'transcript').iterator()
+            for role, content, created_at in decode(blob) if role == ChatMessage.Role.USER
+        )
+    else:
+        rows = ChatMessage.objects.filter(role=ChatMessage.Role.USER, pk__gte=start, pk__lt=end).order_by('pk')
+        texts = rows.values_list('conversation_id', 'content').iterator(chunk_size=2000)
+
+    for conversation_id, content in texts:
+        scanned += 1
+        contacts = extract(content)
+        if contacts.emails or contacts.phones:
+            previous = found.get(conversation_id)
+            found[conversation_id] = merge(previous, contacts) if previous else contacts
+    return scanned, list(found.items())
+
+
+def tasks(chunk_size):
+    """Primary key ranges to scan; archived messages come before live ones."""
+    for source, model in (('archives', ChatArchive), ('messages', ChatMessage)):
+        bounds = model.objects.aggregate(low=Min('pk'), high=Max('pk'))
+        if bounds['low'] is None:
+            continue
+        for start in range(bounds['low'], bounds['high'] + 1, chunk_size):
+            yield source, start, start + chunk_size
+
+
+def backfill(workers=None, chunk_size=CHUNK_SIZE, dry_run=False, log=None):
+    """Rescan every visitor message and update the conversations' lead fields.
+
+    ``workers=1`` scans in this process. Returns counts: ``messages``
+    scanned, ``conversations`` with contacts, ``updated`` conversations and
+    ``seconds`` spent scanning.
+    """
+    log = log or (lambda message: None)
+    stats = {'messages': 0, 'conversations': 0, 'updated': 0}
+    found = {}
+    started = time.perf_counter()
+
+    work = list(tasks(chunk_size))
+
+    def collect(results):
+        for done, (scanned, chunk) in enumerate(results, 1):
+            stats['messages'] += scanned
+            for conversation_id, contacts in chunk:
+                previous = found.get(conversation_id)
+                found[conversation_id] = merge(previous, contacts) if previous else contacts
+            log(f'{done}/{len(work)} ranges, {stats["messages"]:,} messages')
+
+    if workers == 1:
+        collect(map(scan, work))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=process_context(), initializer=setup_process) as pool:
+            collect(pool.map(scan, work))
+    stats['seconds'] = time.perf_counter() - started
+    stats['conversations'] = len(found)
+
+    ids = list(found)
+    for offset in range(0, len(ids), UPDATE_BATCH_SIZE):
+        batch = ChatConversation.objects.in_bulk(ids[offset:offset + UPDATE_BATCH_SIZE])
+        changed = []
+        for conversation in batch.values():
+            before = [getattr(conversation, field) for field in LEAD_FIELDS]
+            # Rebuilt from the whole transcript; earlier values were taken
+            # from the first match only and not normalized
+            contacts = found[conversation.pk]
+            conversation.contacts = []
+            if contacts.emails:
+                conversation.visitor_email = ''
+            if contacts.phones:
+                conversation.visitor_phone = ''
+            record(conversation, contacts)
+            if [getattr(conversation, field) for field in LEAD_FIELDS] != before:
+                changed.append(conversation)
+        stats['updated'] += len(changed)
+        if changed and not dry_run:
+            with transaction.atomic():
+                ChatConversation.objects.bulk_update(changed, LEAD_FIELDS)
+    return stats
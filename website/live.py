@@ -0,0 +1,294 @@
+"""
+Live activity feed for the Kaffero dashboard.
+
+New demo requests, contact messages and visitor chat messages are pushed to
+open dashboard pages as server-sent events, so staff see new leads without
+reloading the page (and re-running every count on it).
+
+Each process keeps one ``Hub``: a short in-memory buffer of recent events
+that every open feed reads from, so the number of open tabs does not change
+the number of queries. The hub is fed by
+
+- Postgres ``LISTEN``: ``publish()`` sends a ``NOTIFY`` from the
+  ``post_save`` signal (delivered when the transaction commits) and a
+  listener thread per process receives it, or
+- polling on other databases (SQLite): at most once every
+  ``LIVE_FEED_POLL_INTERVAL`` seconds per process, rows past the
+  high-water mark of each table are fetched.
+
+Ids are allocated before a transaction commits, so a row can appear after
+one with a higher id. What has been seen of each table is therefore a
+*mark*: the highest id plus a bitmap of which of the ``LOOKBACK`` ids
+below it have been seen. Polls re-check that window and rows found late are
+still delivered, each once. Event ids are the marks of all three tables, so
+a browser that reconnects to another worker carries on where it left off
+(``Last-Event-ID``). Under ASGI a feed stays open for
+``LIVE_FEED_STREAM_SECONDS``. Under WSGI (gunicorn's sync workers) each
+request returns what is pending straight away and the browser reconnects
+after ``LIVE_FEED_RETRY_SECONDS``, so a dashboard tab never holds a worker.
+"""
+
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+from collections import deque
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.models import Q
+from django.urls import reverse
+from django.utils.text import Truncator
+
+from .models import ChatMessage, ContactMessage, DemoRequest
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'kaffero_live'
+KINDS = ('demo', 'contact', 'chat')
+
+# Seconds between keepalive comments on an idle stream
+KEEPALIVE_SECONDS = 15
+
+# Ids below the highest one seen that are still watched for late commits
+LOOKBACK = 64
+WINDOW = (1 << LOOKBACK) - 1
+
+
+def querysets():
+    """The rows behind each kind of event."""
+    return {
+        'demo': DemoRequest.objects.all(),
+        'contact': ContactMessage.objects.all(),
+        'chat': ChatMessage.objects.filter(role=ChatMessage.Role.USER),
+    }
+
+
+def event_for(kind, obj):
+    """The event data sent to the browser for a new ``obj``."""
+    if kind == 'demo':
+        title, detail = obj.cafe_name, f'{obj.contact_name} • {obj.city}'
+        url = reverse('dashboard:demo_detail', args=[obj.pk])
+    elif kind == 'contact':
+        title, detail = obj.name, obj.get_subject_display()
+        url = reverse('dashboard:message_detail', args=[obj.pk])
+    else:
+        title, detail = f'Chat #{obj.conversation_id}', Truncator(obj.content).chars(120)
+        url = reverse('dashboard:chat_detail', args=[obj.conversation_id])
+    return {'kind': kind, 'id': obj.pk, 'title': title, 'detail': detail, 'url': url}
+
+
+def publish(kind, obj):
+    """Notify listening processes of a new ``obj``; other databases are polled instead."""
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_notify(%s, %s)', [CHANNEL, json.dumps(event_for(kind, obj))])
+
+
+def mark_seen(mark, pk):
+    """``mark``, a ``(highest id, bitmap)`` pair, with ``pk`` seen too.
+
+    Bit ``i`` is set once ``highest - i`` has been seen; ids more than
+    ``LOOKBACK`` below the highest count as seen.
+    """
+    highest, bits = mark
+    if pk - highest >= LOOKBACK:
+        return pk, 1
+    if pk > highest:
+        return pk, (bits << (pk - highest) | 1) & WINDOW
+    if highest - pk < LOOKBACK:
+        return highest, bits | 1 << (highest - pk)
+    return mark
+
+
+def is_seen(mark, pk):
+    highest, bits = mark
+    return pk <= highest - LOOKBACK or (pk <= highest and bool(bits >> (highest - pk) & 1))
+
+
+def seen_ids(mark):
+    """The ids within the look-back window that ``mark`` has seen."""
+    highest, bits = mark
+    return [highest - i for i in range(LOOKBACK) if bits >> i & 1]
+
+
+def parse_marks(value):
+    """``Last-Event-ID`` -> ``{kind: mark}``, or None if missing or malformed."""
+    marks = []
+    try:
+        for part in (value or '').split('.'):
+            highest, _, bits = part.partition('-')
+            # Without a bitmap everything up to the highest id counts as seen
+            marks.append((int(highest), int(bits, 16) & WINDOW if bits else WINDOW))
+    except ValueError:
+        return None
+    return dict(zip(KINDS, marks)) if len(marks) == len(KINDS) else None
+
+
+def format_marks(marks):
+    return '.'.join(f'{marks[kind][0]}-{marks[kind][1]:x}' for kind in KINDS)
+
+
+def render(events, marks):
+    """Format the unseen ``events`` as SSE messages; returns ``(text, marks after them)``."""
+    marks = dict(marks)
+    messages = []
+    for event in events:
+        if is_seen(marks[event['kind']], event['id']):
+            continue
+        marks[event['kind']] = mark_seen(marks[event['kind']], event['id'])
+        messages.append(f"id: {format_marks(marks)}\nevent: {event['kind']}\ndata: {json.dumps(event)}\n\n")
+    return ''.join(messages), marks
+
+
+class Hub:
+    """Recent events for every feed open in this process."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.events = deque()
+        # What has been seen per kind, and what is no longer in the buffer
+        self.marks = None
+        self.floor = None
+        self.polled_at = 0.0
+        self.listening = False
+
+    def start(self):
+        """Load the current marks and, on Postgres, start listening."""
+        marks = {}
+        for kind, qs in querysets().items():
+            mark = (0, 0)
+            for pk in qs.order_by('-pk').values_list('pk', flat=True)[:LOOKBACK]:
+                mark = mark_seen(mark, pk)
+            marks[kind] = mark
+        with self.lock:
+            if self.marks is not None:
+                return
+            self.marks, self.floor = marks, dict(marks)
+            self.polled_at = time.monotonic()
+        if connection.vendor == 'postgresql':
+            threading.Thread(target=self.listen, name='live-feed', daemon=True).start()
+
+    def current_marks(self):
+        with self.lock:
+            return dict(self.marks)
+
+    def add(self, event):
+        """Buffer ``event`` unless it has been seen already."""
+        kind = event['kind']
+        with self.lock:
+            if is_seen(self.marks[kind], event['id']):
+                return
+            self.events.append(event)
+            self.marks[kind] = mark_seen(self.marks[kind], event['id'])
+            if len(self.events) > settings.LIVE_FEED_BUFFER:
+                dropped = self.events.popleft()
+                self.floor[dropped['kind']] = mark_seen(self.floor[dropped['kind']], dropped['id'])
+
+    def since(self, marks):
+        """Buffered events the browser at ``marks`` has not seen."""
+        with self.lock:
+            return [event for event in self.events if not is_seen(marks[event['kind']], event['id'])]
+
+    def catch_up(self, marks):
+        """Events no longer buffered that the browser at ``marks`` has not seen."""
+        with self.lock:
+            floor = dict(self.floor)
+        events = []
+        for kind, qs in querysets().items():
+            missed = [pk for pk in seen_ids(floor[kind]) if not is_seen(marks[kind], pk)]
+            # Behind even the floor's look-back window
+            below = floor[kind][0] - LOOKBACK
+            if missed or marks[kind][0] < below:
+                rows = qs.filter(Q(pk__in=missed) | Q(pk__gt=marks[kind][0], pk__lte=below)).order_by('pk')
+                events.extend(event_for(kind, obj) for obj in rows[:settings.LIVE_FEED_BUFFER])
+        return events
+
+    def refresh_due(self):
+        return not self.listening and time.monotonic() - self.polled_at >= settings.LIVE_FEED_POLL_INTERVAL
+
+    def refresh(self):
+        """Poll for new rows, at most once per interval and only without a listener."""
+        with self.lock:
+            if not self.refresh_due():
+                return
+            self.polled_at = time.monotonic()
+            marks = dict(self.marks)
+        for kind, qs in querysets().items():
+            recent = qs.filter(pk__gt=marks[kind][0] - LOOKBACK).exclude(pk__in=seen_ids(marks[kind]))
+            for obj in recent.order_by('pk')[:settings.LIVE_FEED_BUFFER]:
+                self.add(event_for(kind, obj))
+
+    def listen(self):
+        """Receive ``NOTIFY`` payloads on a dedicated connection, reconnecting on errors."""
+        while True:
+            wrapper = connections.create_connection(DEFAULT_DB_ALIAS)
+            try:
+                wrapper.ensure_connection()
+                raw = wrapper.connection
+                with raw.cursor() as cursor:
+                    cursor.execute(f'LISTEN {CHANNEL}')
+                self.listening = True
+                while True:
+                    if select.select([raw], [], [], 60) == ([], [], []):
+                        continue
+                    raw.poll()
+                    while raw.notifies:
+                        self.add(json.loads(raw.notifies.pop(0).payload))
+            except Exception:
+                logger.exception('Live feed listener failed; polling until it reconnects')
+            finally:
+                self.listening = False
+                wrapper.close()
+            time.sleep(5)
+
+
+_hub = None
+_hub_lock = threading.Lock()
+
+
+def get_hub():
+    """This process's hub, started on first use (after gunicorn has forked)."""
+    global _hub
+    with _hub_lock:
+        if _hub is None:
+            hub = Hub()
+            hub.start()
+            _hub = hub
+    return _hub
+
+
+def open_feed(hub, last_event_id):
+    """``(SSE text, marks)`` for a browser (re)connecting with ``last_event_id``."""
+    text = f'retry: {int(settings.LIVE_FEED_RETRY_SECONDS * 1000)}\n\n'
+    marks = parse_marks(last_event_id)
+    if marks is None:
+        # A new page starts from now; the id is what it resumes from
+        marks = hub.current_marks()
+        return text + f'id: {format_marks(marks)}\n\n', marks
+    hub.refresh()
+    events, marks = render(hub.catch_up(marks) + hub.since(marks), marks)
+    return text + events, marks
+
+
+async def stream(hub, last_event_id):
+    """Async SSE stream for ASGI servers, open for ``LIVE_FEED_STREAM_SECONDS``."""
+    text, marks = await sync_to_async(open_feed)(hub, last_event_id)
+    yield text
+    deadline = time.monotonic() + settings.LIVE_FEED_STREAM_SECONDS
+    idle_since = time.monotonic()
+    while time.monotonic() < deadline:
+        await asyncio.sleep(1)
+        if hub.refresh_due():
+            await sync_to_async(hub.refresh)()
+        text, marks = render(hub.since(marks), marks)
+        if text:
+            yield text
+            idle_since = time.monotonic()
+        elif time.monotonic() - idle_since >= KEEPALIVE_SECONDS:
+            yield ': keepalive\n\n'
+            idle_since = time.monotonic()
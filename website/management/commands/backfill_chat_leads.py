@@ -0,0 +1,45 @@
+"""
+Re-extract visitor contact details from every stored chat message.
+
+    python manage.py backfill_chat_leads [--workers 4] [--chunk-size 20000] [--dry-run]
+
+Scans live and archived visitor messages in primary key ranges across a
+process pool and bulk-updates each conversation's email, phone, contacts
+and lead flag. Safe to rerun; conversations that are already up to date are
+not written.
+"""
+
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from website import leads
+
+
+class Command(BaseCommand):
+    help = 'Rescan chat messages for emails and phone numbers and update conversation lead fields'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='scanning processes (1 = no pool)')
+        parser.add_argument('--chunk-size', type=int, default=leads.CHUNK_SIZE, help='primary keys per scanned range')
+        parser.add_argument('--dry-run', action='store_true', help='report what would change')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        stats = leads.backfill(
+            workers=options['workers'],
+            chunk_size=options['chunk_size'],
+            dry_run=options['dry_run'],
+            log=lambda message: self.stdout.write(f'  {message}') if options['verbosity'] > 1 else None,
+        )
+        elapsed = time.perf_counter() - started
+        rate = stats['messages'] / stats['seconds'] if stats['seconds'] else 0
+        self.stdout.write(
+            f"Scanned {stats['messages']:,} messages in {stats['seconds']:.1f}s ({rate:,.0f}/s) "
+            f"with {options['workers']} workers"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{'Would update' if options['dry_run'] else 'Updated'} {stats['updated']:,} of "
+            f"{stats['conversations']:,} conversations with contacts ({elapsed:.1f}s total)"
+        ))
@@ -0,0 +1,62 @@
+"""
+Archive old resolved chat conversations.
+
+    python manage.py compact_chats [--days 90] [--dry-run]
+
+Folds the messages of resolved conversations idle for ``--days`` into one
+compressed transcript per conversation and deletes the message rows. Run it
+from cron; a rerun only picks up conversations that have new messages.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from website import chat_archive
+from website.models import ChatArchive, ChatMessage
+
+
+def kilobytes(size):
+    return 'unknown' if size is None else f'{size / 1024:,.0f}KB'
+
+
+class Command(BaseCommand):
+    help = 'Compact messages of old resolved chat conversations into compressed archives'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='idle days before archiving (default: CHAT_ARCHIVE_AFTER_DAYS)')
+        parser.add_argument('--batch-size', type=int, default=chat_archive.BATCH_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help='report what would be archived')
+
+    def handle(self, *args, **options):
+        rows_before = ChatMessage.objects.count()
+        sizes_before = [chat_archive.table_size(model) for model in (ChatMessage, ChatArchive)]
+        started = time.perf_counter()
+
+        stats = chat_archive.compact(
+            days=options['days'],
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+            log=lambda message: self.stdout.write(f'  {message}') if options['verbosity'] > 1 else None,
+        )
+
+        elapsed = time.perf_counter() - started
+        raw, compressed = stats['raw_bytes'], stats['compressed_bytes']
+        ratio = f' ({compressed / raw:.0%})' if raw else ''
+        self.stdout.write(
+            f"{'Would archive' if options['dry_run'] else 'Archived'} {stats['messages']:,} messages "
+            f"from {stats['conversations']:,} conversations in {elapsed:.1f}s: "
+            f"{kilobytes(raw)} of transcript -> {kilobytes(compressed)} compressed{ratio}"
+        )
+        if options['dry_run']:
+            return
+
+        rows_after = ChatMessage.objects.count()
+        sizes_after = [chat_archive.table_size(model) for model in (ChatMessage, ChatArchive)]
+        self.stdout.write(f'Message rows: {rows_before:,} -> {rows_after:,}')
+        if None not in sizes_before + sizes_after:
+            before, after = sum(sizes_before), sum(sizes_after)
+            self.stdout.write(self.style.SUCCESS(
+                f'Chat storage (messages + archives): {kilobytes(before)} -> {kilobytes(after)} '
+                f'({(before - after) / 1024:,.0f}KB freed once the database is vacuumed)'
+            ))
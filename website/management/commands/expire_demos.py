@@ -0,0 +1,43 @@
+"""
+Expire demo requests whose demo has ended and email the follow-ups.
+
+    python manage.py expire_demos [--no-notify]
+
+Moves requests past ``demo_expires_at`` to ``expired`` (logged in the demo
+funnel) and sends the queued follow-up emails. ``runworkers`` does the same
+every ``DEMO_EXPIRY_INTERVAL`` seconds (``tasks.expire_demos``); where no
+worker runs, schedule this command instead (``railway.cron.json``). A rerun
+only picks up demos that have ended since.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from website import demo_expiry
+
+
+class Command(BaseCommand):
+    help = 'Mark ended demos as expired and send the follow-up emails'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=demo_expiry.BATCH_SIZE)
+        parser.add_argument('--no-notify', action='store_true', help='expire only; leave follow-ups queued')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        expired = demo_expiry.sweep(batch_size=options['batch_size'])
+        self.stdout.write(f'Expired {expired:,} demos in {time.perf_counter() - started:.1f}s')
+        if options['no_notify']:
+            return
+
+        counts = demo_expiry.send_notices(
+            log=lambda message: self.stdout.write(f'  {message}') if options['verbosity'] > 1 else None,
+        )
+        if counts['interrupted']:
+            self.stdout.write(self.style.WARNING(
+                f"{counts['interrupted']} follow-ups were interrupted by an earlier run and not resent"
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f"Follow-ups: {counts['sent']:,} sent, {counts['failed']:,} failed"
+        ))
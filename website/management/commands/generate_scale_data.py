@@ -0,0 +1,482 @@
+"""
+Populate the lead and chat tables with realistic synthetic data in bulk.
+
+    python manage.py generate_scale_data --demos 1000000 --chats 200000 --seed 42
+
+Rows are streamed with ``COPY ... FROM STDIN`` on PostgreSQL and with one
+prepared ``executemany`` INSERT per batch elsewhere; ``--bulk-create`` uses
+the ORM instead (portable, but Django's per-value preparation makes it
+several times slower). Output is fully determined by ``--seed`` and the row
+counts.
+
+Rows bypass ``save()`` and so the ``post_save`` handlers: no live dashboard
+events are published. The funnel history those handlers would have written
+is filled in afterwards with ``funnel.seed()`` and ``funnel.rebuild()``.
+"""
+
+import csv
+import io
+import json
+import random
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone as dt_timezone
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from website import funnel
+from website.models import (
+    DemoRequest, DemoStatusChange, DemoFunnelDaily, ContactMessage, NewsletterSubscriber,
+    ChatConversation, ChatMessage
+)
+from website.views import get_chatbot_response
+
+FIRST_NAMES = [
+    'Arjun', 'Anjali', 'Rahul', 'Priya', 'Vishnu', 'Lakshmi', 'Akhil', 'Sneha', 'Nikhil', 'Divya',
+    'Rohan', 'Meera', 'Fahad', 'Ayesha', 'Joseph', 'Mariya', 'Karthik', 'Neha', 'Suresh', 'Kavya',
+]
+LAST_NAMES = [
+    'Nair', 'Menon', 'Pillai', 'Kumar', 'Thomas', 'Varghese', 'Iyer', 'Reddy', 'Sharma', 'Khan',
+    'Joseph', 'Krishnan', 'Das', 'Mathew', 'Rao', 'Shetty', 'Patel', 'George', 'Ali', 'Jose',
+]
+CAFE_WORDS = [
+    'Brew', 'Bean', 'Chai', 'Roast', 'Cup', 'Grind', 'Mocha', 'Spice', 'Coast', 'Monsoon',
+    'Filter', 'Kaapi', 'Cocoa', 'Toast', 'Urban', 'Hill', 'Lagoon', 'Cardamom', 'Malabar', 'Tea',
+]
+CAFE_SUFFIXES = ['Cafe', 'Café', 'Coffee House', 'Bistro', 'Tea Stall', 'Bakery & Cafe', 'Roasters']
+EMAIL_DOMAINS = ['gmail.com', 'gmail.com', 'gmail.com', 'yahoo.co.in', 'outlook.com', 'rediffmail.com', 'hotmail.com']
+
+# (city, weight) - Kerala first, then the metros the product sells into
+CITIES = [
+    ('Kochi', 18), ('Thiruvananthapuram', 10), ('Kozhikode', 9), ('Thrissur', 8), ('Kannur', 4),
+    ('Kottayam', 4), ('Kollam', 3), ('Palakkad', 3), ('Malappuram', 3), ('Alappuzha', 3),
+    ('Bengaluru', 12), ('Chennai', 7), ('Mumbai', 5), ('Hyderabad', 4), ('Pune', 3),
+    ('Coimbatore', 3), ('Mangaluru', 2), ('Mysuru', 2), ('Delhi', 2), ('Goa', 1),
+]
+
+DEMO_STATUSES = [
+    (DemoRequest.Status.PENDING, 30), (DemoRequest.Status.PROCESSING, 10),
+    (DemoRequest.Status.DEMO_CREATED, 20), (DemoRequest.Status.CONTACTED, 20),
+    (DemoRequest.Status.CONVERTED, 8), (DemoRequest.Status.DECLINED, 12),
+]
+DEMO_SOURCES = [
+    (DemoRequest.Source.GOOGLE, 35), (DemoRequest.Source.SOCIAL_MEDIA, 25),
+    (DemoRequest.Source.REFERRAL, 15), (DemoRequest.Source.JUST_DIAL, 10),
+    (DemoRequest.Source.WORD_OF_MOUTH, 10), (DemoRequest.Source.OTHER, 5),
+]
+CONTACT_SUBJECTS = [
+    (ContactMessage.Subject.GENERAL, 30), (ContactMessage.Subject.SALES, 35),
+    (ContactMessage.Subject.SUPPORT, 20), (ContactMessage.Subject.PARTNERSHIP, 5),
+    (ContactMessage.Subject.FEEDBACK, 7), (ContactMessage.Subject.OTHER, 3),
+]
+
+CHAT_PROMPTS = [
+    'hi', 'hello', 'Hey there', 'good morning',
+    'how much does it cost?', 'what is the price for 2 outlets?', 'pricing please', 'any fees after first year?',
+    'can I get a demo?', 'is there a free trial', 'I want to try it',
+    'what features do you have', 'does it work offline?', 'what can the waiter app do',
+    'how does QR ordering work', 'can customers scan and order', 'tell me about the kitchen display',
+    'do you print KOT', 'I need help with setup', 'who do I contact for support',
+    'my cafe is in Kochi', 'my cafe name is Brew Lagoon', 'what is your phone number',
+    'thanks', 'thank you so much', 'bye',
+]
+
+CONTACT_MESSAGES = [
+    'I would like to know more about pricing for my cafe.',
+    'Do you support multiple outlets with a central menu?',
+    'We are facing an issue with the printer setup.',
+    'Interested in a partnership for our restaurant chain.',
+    'Great product, the kitchen display saved us a lot of time!',
+    'Can you call me back regarding the Standard plan?',
+    'Is GST billing supported?',
+]
+
+
+def _weights(pairs):
+    values, weights = zip(*pairs)
+    cumulative, total = [], 0
+    for weight in weights:
+        total += weight
+        cumulative.append(total)
+    return list(values), cumulative
+
+
+def _batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Let generated ``created_at``/``updated_at`` values through ``bulk_create``."""
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate large volumes of realistic demo, contact, newsletter and chat data. '
+        'Rows are inserted without save() signals; demo funnel history is seeded afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--demos', type=int, default=10000, help='Demo requests to create')
+        parser.add_argument('--messages', type=int, default=10000, help='Contact messages to create')
+        parser.add_argument('--subscribers', type=int, default=50000, help='Newsletter subscribers to create')
+        parser.add_argument('--chats', type=int, default=5000, help='Chat conversations to create')
+        parser.add_argument('--chat-turns', type=float, default=4.0,
+                            help='Mean visitor/bot exchanges per conversation')
+        parser.add_argument('--years', type=float, default=3.0, help='Spread timestamps over this many years')
+        parser.add_argument('--until', help='Latest timestamp as YYYY-MM-DD (default: start of today)')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; same seed gives same data')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--bulk-create', action='store_true',
+                            help='Insert through Model.objects.bulk_create instead of COPY/executemany')
+        parser.add_argument('--clear', action='store_true', help='Delete existing rows of these models first')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.verbosity = options['verbosity']
+        if options['bulk_create']:
+            self.method = 'bulk_create'
+        elif connection.vendor == 'postgresql':
+            self.method = 'COPY'
+        else:
+            self.method = 'executemany'
+        if options['until']:
+            until = datetime.strptime(options['until'], '%Y-%m-%d')
+        else:
+            until = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+        self.now = until.replace(tzinfo=dt_timezone.utc)
+        self.span = timedelta(days=365 * options['years']).total_seconds()
+        self.bot_replies = {}
+
+        self.cities = _weights(CITIES)
+        self.demo_statuses = _weights(DEMO_STATUSES)
+        self.demo_sources = _weights(DEMO_SOURCES)
+        self.contact_subjects = _weights(CONTACT_SUBJECTS)
+
+        if options['clear']:
+            self.report('Clearing existing rows...')
+            for model in (
+                ChatMessage, ChatConversation, DemoStatusChange, DemoFunnelDaily, DemoRequest,
+                ContactMessage, NewsletterSubscriber,
+            ):
+                model.objects.all().delete()
+
+        self.report(f"Inserting with {self.method} in batches of {self.batch_size} (seed {options['seed']})")
+
+        started = time.perf_counter()
+        with explicit_timestamps(DemoRequest, ContactMessage, NewsletterSubscriber, ChatConversation, ChatMessage):
+            self._insert(DemoRequest, self._demo_rows(options['demos']), options['demos'])
+            self._insert(ContactMessage, self._contact_rows(options['messages']), options['messages'])
+            self._insert(NewsletterSubscriber, self._subscriber_rows(options['subscribers']), options['subscribers'])
+            self._generate_chats(options['chats'], options['chat_turns'])
+
+        if options['demos']:
+            # The post_save handlers that log status changes never ran
+            seeded = funnel.seed()
+            funnel.rebuild()
+            self.report(f'  funnel history: {seeded:,} demo requests seeded')
+
+        self.report(self.style.SUCCESS(f'Done in {time.perf_counter() - started:.1f}s'))
+
+    def report(self, message):
+        if self.verbosity > 0:
+            self.stdout.write(message)
+
+    # -------------------------------------------------------------------------
+    # Insertion
+    # -------------------------------------------------------------------------
+
+    def _insert(self, model, rows, total):
+        """Insert dict rows keyed by field attname; return the count inserted."""
+        if not total:
+            return 0
+        started = time.perf_counter()
+        count = 0
+        for batch in _batched(rows, self.batch_size):
+            with transaction.atomic():
+                if self.method == 'COPY':
+                    self._copy(model, batch)
+                elif self.method == 'executemany':
+                    self._executemany(model, batch)
+                else:
+                    model.objects.bulk_create([model(**row) for row in batch], batch_size=self.batch_size)
+            count += len(batch)
+        elapsed = time.perf_counter() - started
+        rate = count / elapsed if elapsed else count
+        self.report(f'  {model._meta.verbose_name_plural}: {count:,} rows in {elapsed:.1f}s ({rate:,.0f}/s)')
+        return count
+
+    def _adapters(self, model, columns):
+        """Per-column converters to database values, chosen once per batch.
+
+        Generated datetimes are always UTC-aware, so SQLite's naive UTC text
+        can be produced directly instead of going through
+        ``adapt_datetimefield_value`` for every value. JSON fields are
+        serialized.
+        """
+        fields = {field.attname: field for field in model._meta.concrete_fields}
+        if connection.vendor == 'sqlite':
+            def adapt_datetime(value):
+                return None if value is None else value.replace(tzinfo=None).isoformat(' ')
+        elif connection.vendor == 'postgresql':
+            adapt_datetime = None  # the driver handles aware datetimes
+        else:
+            adapt_datetime = connection.ops.adapt_datetimefield_value
+        adapters = []
+        for column in columns:
+            field = fields[column]
+            if isinstance(field, models.DateTimeField):
+                adapters.append(adapt_datetime)
+            elif isinstance(field, models.JSONField):
+                adapters.append(json.dumps)
+            else:
+                adapters.append(None)
+        return adapters
+
+    def _executemany(self, model, batch):
+        """Insert a batch with a single prepared multi-row statement."""
+        columns = list(batch[0])
+        adapters = self._adapters(model, columns)
+        quote = connection.ops.quote_name
+        sql = (
+            f'INSERT INTO {quote(model._meta.db_table)} ({", ".join(quote(c) for c in columns)}) '
+            f'VALUES ({", ".join(["%s"] * len(columns))})'
+        )
+        values = [
+            [adapt(row[column]) if adapt else row[column] for column, adapt in zip(columns, adapters)]
+            for row in batch
+        ]
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, values)
+
+    def _copy(self, model, batch):
+        """Stream a batch into PostgreSQL with ``COPY ... FROM STDIN``."""
+        columns = list(batch[0])
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in batch:
+            writer.writerow([self._copy_value(row[column]) for column in columns])
+        buffer.seek(0)
+
+        quote = connection.ops.quote_name
+        sql = (
+            f'COPY {quote(model._meta.db_table)} ({", ".join(quote(c) for c in columns)}) '
+            f"FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+        )
+        with connection.cursor() as cursor:
+            if hasattr(cursor.cursor, 'copy_expert'):  # psycopg2
+                cursor.cursor.copy_expert(sql, buffer)
+            else:  # psycopg 3
+                with cursor.cursor.copy(sql) as copy:
+                    copy.write(buffer.getvalue())
+
+    @staticmethod
+    def _copy_value(value):
+        if value is None:
+            return '\\N'
+        if value is True:
+            return 't'
+        if value is False:
+            return 'f'
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        if isinstance(value, (list, dict)):
+            return json.dumps(value)
+        return value
+
+    # -------------------------------------------------------------------------
+    # Value helpers
+    # -------------------------------------------------------------------------
+
+    def _pick(self, weighted):
+        values, cumulative = weighted
+        return self.rng.choices(values, cum_weights=cumulative)[0]
+
+    def _timestamp(self):
+        """Random time in the window, denser towards the present (growth)."""
+        return self.now - timedelta(seconds=int(self.span * self.rng.random() ** 2))
+
+    def _name(self):
+        return f'{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)}'
+
+    def _email(self, name, i):
+        local = name.lower().replace(' ', self.rng.choice(['.', '_', '']))
+        return f'{local}{i}@{self.rng.choice(EMAIL_DOMAINS)}'
+
+    def _phone(self):
+        """Indian mobile number in one of the formats people actually type."""
+        first = self.rng.choice('6789')
+        digits = first + ''.join(self.rng.choices('0123456789', k=9))
+        fmt = self.rng.random()
+        if fmt < 0.35:
+            return digits
+        if fmt < 0.65:
+            return f'+91 {digits[:5]} {digits[5:]}'
+        if fmt < 0.8:
+            return f'+91{digits}'
+        if fmt < 0.9:
+            return f'+91-{digits}'
+        return f'0{digits}'
+
+    def _cafe_name(self):
+        return f'{self.rng.choice(CAFE_WORDS)} {self.rng.choice(CAFE_WORDS)} {self.rng.choice(CAFE_SUFFIXES)}'
+
+    # -------------------------------------------------------------------------
+    # Row generators
+    # -------------------------------------------------------------------------
+
+    def _demo_rows(self, count):
+        rng = self.rng
+        for i in range(count):
+            created = self._timestamp()
+            status = self._pick(self.demo_statuses)
+            name = self._name()
+            phone = self._phone()
+            has_demo = status in (DemoRequest.Status.DEMO_CREATED, DemoRequest.Status.CONTACTED,
+                                  DemoRequest.Status.CONVERTED)
+            updated = created + timedelta(hours=rng.randint(0, 240)) if status != DemoRequest.Status.PENDING else created
+            yield {
+                'cafe_name': self._cafe_name(),
+                'city': self._pick(self.cities),
+                'num_tables': rng.choice([None, rng.randint(2, 60)]),
+                'num_outlets': rng.choices([1, 2, 3, 5], weights=[80, 12, 6, 2])[0],
+                'contact_name': name,
+                'phone': phone,
+                'email': self._email(name, i) if rng.random() < 0.7 else '',
+                'whatsapp': phone if rng.random() < 0.4 else '',
+                'source': self._pick(self.demo_sources),
+                'status': status,
+                'demo_url': f'https://demo{i}.kaffero.online' if has_demo else '',
+                'demo_username': 'admin' if has_demo else '',
+                'demo_password': '',
+                'demo_expires_at': created + timedelta(days=7) if has_demo else None,
+                'notes': '',
+                'message': '',
+                'created_at': created,
+                'updated_at': updated,
+                'credentials_sent_at': created + timedelta(hours=rng.randint(1, 48)) if has_demo else None,
+                'last_contacted_at': updated if status != DemoRequest.Status.PENDING else None,
+                'status_changed_at': updated if status != DemoRequest.Status.PENDING else None,
+                'expiry_notice': '',
+            }
+
+    def _contact_rows(self, count):
+        rng = self.rng
+        for i in range(count):
+            created = self._timestamp()
+            name = self._name()
+            is_read = rng.random() < 0.7
+            is_replied = is_read and rng.random() < 0.55
+            yield {
+                'name': name,
+                'email': self._email(name, i),
+                'phone': self._phone() if rng.random() < 0.6 else '',
+                'subject': self._pick(self.contact_subjects),
+                'message': rng.choice(CONTACT_MESSAGES),
+                'is_read': is_read,
+                'is_replied': is_replied,
+                'replied_at': created + timedelta(hours=rng.randint(1, 72)) if is_replied else None,
+                'created_at': created,
+            }
+
+    def _subscriber_rows(self, count):
+        rng = self.rng
+        for i in range(count):
+            subscribed = self._timestamp()
+            is_active = rng.random() < 0.92
+            unsubscribed = None
+            if not is_active:
+                unsubscribed = min(self.now, subscribed + timedelta(days=rng.randint(1, 400)))
+            yield {
+                'email': f'subscriber{i}.{rng.randrange(10 ** 6):06d}@{rng.choice(EMAIL_DOMAINS)}',
+                'is_active': is_active,
+                'subscribed_at': subscribed,
+                'unsubscribed_at': unsubscribed,
+            }
+
+    def _bot_reply(self, message):
+        reply = self.bot_replies.get(message)
+        if reply is None:
+            reply = self.bot_replies[message] = get_chatbot_response(message, None)
+        return reply
+
+    def _generate_chats(self, count, mean_turns):
+        """Insert conversations, then their messages using the new ids."""
+        if not count:
+            return
+        rng = self.rng
+        plans = []  # (created, turns, seconds between messages, lead contact) per conversation
+
+        def conversation_rows():
+            for i in range(count):
+                created = self._timestamp()
+                turns = min(60, 1 + int(rng.expovariate(1 / max(mean_turns - 1, 0.1))))
+                gap = rng.randint(5, 90)
+                is_lead = rng.random() < 0.15
+                name = self._name() if is_lead and rng.random() < 0.5 else ''
+                email = self._email(name or 'visitor', i) if is_lead and rng.random() < 0.6 else ''
+                phone = self._phone() if is_lead and (not email or rng.random() < 0.4) else ''
+                plans.append((created, turns, gap, email or phone))
+                yield {
+                    'session_id': f'{rng.getrandbits(128):032x}',
+                    'visitor_name': name,
+                    'visitor_email': email,
+                    'visitor_phone': phone,
+                    'contacts': [email or phone] if email or phone else [],
+                    'page_url': rng.choice(['https://www.kaffero.online/', 'https://www.kaffero.online/pricing/',
+                                            'https://www.kaffero.online/features/', '']),
+                    'user_agent': 'Mozilla/5.0 (Linux; Android 14) Mobile',
+                    'ip_address': f'{rng.randint(1, 223)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}',
+                    'is_resolved': rng.random() < 0.4,
+                    'is_lead': is_lead,
+                    'admin_notes': '',
+                    'created_at': created,
+                    'updated_at': created + timedelta(seconds=gap * turns * 2),
+                }
+
+        last_id = ChatConversation.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        self._insert(ChatConversation, conversation_rows(), count)
+
+        conversation_ids = list(
+            ChatConversation.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)
+        )
+
+        def message_rows():
+            for conversation_id, (created, turns, gap, contact) in zip(conversation_ids, plans):
+                lead_turn = rng.randrange(turns) if contact else -1
+                for turn in range(turns):
+                    user_message = contact if turn == lead_turn else rng.choice(CHAT_PROMPTS)
+                    sent = created + timedelta(seconds=gap * turn * 2)
+                    yield {
+                        'conversation_id': conversation_id,
+                        'role': ChatMessage.Role.USER,
+                        'content': user_message,
+                        'created_at': sent,
+                    }
+                    yield {
+                        'conversation_id': conversation_id,
+                        'role': ChatMessage.Role.BOT,
+                        'content': self._bot_reply(user_message),
+                        'created_at': sent + timedelta(seconds=1),
+                    }
+
+        total_messages = sum(plan[1] for plan in plans) * 2
+        self._insert(ChatMessage, message_rows(), total_messages)
@@ -0,0 +1,49 @@
+"""
+Bulk import newsletter subscribers from a CSV file.
+
+    python manage.py import_subscribers subscribers.csv [--reactivate]
+
+Reads the ``email`` column (or the first column when there is no such
+header) and inserts the addresses in multi-row upsert batches. Existing
+addresses are skipped; ``--reactivate`` resubscribes unsubscribed ones.
+"""
+
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from website import newsletter
+
+
+class Command(BaseCommand):
+    help = 'Import newsletter subscribers from a CSV file ("-" for stdin)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--column', default='email', help='header of the email column')
+        parser.add_argument('--reactivate', action='store_true', help='resubscribe unsubscribed addresses')
+        parser.add_argument('--batch-size', type=int, default=newsletter.IMPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            if options['path'] == '-':
+                counts = self.run_import(sys.stdin, options)
+            else:
+                with open(options['path'], newline='', encoding='utf-8-sig') as f:
+                    counts = self.run_import(f, options)
+        except OSError as exc:
+            raise CommandError(exc)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Added {counts['added']:,}, already present {counts['existing']:,}, "
+            f"invalid {counts['invalid']:,} in {time.perf_counter() - started:.1f}s"
+        ))
+
+    def run_import(self, lines, options):
+        return newsletter.import_emails(
+            newsletter.read_csv_emails(lines, options['column']),
+            reactivate=options['reactivate'],
+            batch_size=options['batch_size'],
+        )
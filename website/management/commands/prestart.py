@@ -0,0 +1,109 @@
+"""
+Prepare the database and static files before the web server starts.
+
+    python manage.py prestart && gunicorn config.wsgi
+
+``migrate`` only runs when the migration plan is non-empty and
+``collectstatic`` only runs when the static sources differ from the ones
+recorded at the last collection, so routine restarts and scale-ups skip
+both.
+"""
+
+import hashlib
+import os
+import time
+
+from django.apps import apps
+from django.conf import STATICFILES_STORAGE_ALIAS, settings
+from django.contrib.staticfiles.finders import get_finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.files.storage import storages
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+
+# Written to STATIC_ROOT after a successful collectstatic
+STAMP_NAME = '.source-hash'
+
+
+def pending_migrations(database=DEFAULT_DB_ALIAS):
+    """Return the unapplied migrations for ``database``."""
+    executor = MigrationExecutor(connections[database])
+    targets = executor.loader.graph.leaf_nodes()
+    return [migration for migration, backwards in executor.migration_plan(targets)]
+
+
+def static_source_hash():
+    """Hash the path and contents of every file collectstatic would copy."""
+    files = {}
+    ignore_patterns = apps.get_app_config('staticfiles').ignore_patterns
+    for finder in get_finders():
+        for path, storage in finder.list(ignore_patterns):
+            prefix = getattr(storage, 'prefix', None)
+            prefixed = os.path.join(prefix, path) if prefix else path
+            # First finder wins, as in collectstatic
+            files.setdefault(prefixed, storage.path(path))
+
+    digest = hashlib.sha256()
+    storage_class = type(storages[STATICFILES_STORAGE_ALIAS])
+    digest.update(f'{storage_class.__module__}.{storage_class.__qualname__}'.encode())
+    for prefixed in sorted(files):
+        digest.update(prefixed.encode())
+        with open(files[prefixed], 'rb') as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+
+def collected_hash():
+    """Return the source hash recorded at the last collectstatic, if any."""
+    manifest_name = getattr(staticfiles_storage, 'manifest_name', None)
+    if manifest_name and not os.path.exists(os.path.join(settings.STATIC_ROOT, manifest_name)):
+        return None
+    try:
+        with open(os.path.join(settings.STATIC_ROOT, STAMP_NAME)) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+class Command(BaseCommand):
+    help = 'Run migrate and collectstatic only when they have work to do'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--no-static', action='store_true', help='never run collectstatic')
+        parser.add_argument('--force', action='store_true', help='run both steps unconditionally')
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        self.migrate(options['database'], options['force'])
+        if not options['no_static']:
+            self.collectstatic(options['force'])
+
+    def migrate(self, database, force):
+        started = time.perf_counter()
+        pending = pending_migrations(database)
+        if not pending and not force:
+            self.report(f'Migrations up to date ({self.elapsed(started)})')
+            return
+        call_command('migrate', database=database, interactive=False, verbosity=self.verbosity)
+        self.report(f'Applied {len(pending)} migration(s) ({self.elapsed(started)})')
+
+    def collectstatic(self, force):
+        started = time.perf_counter()
+        source_hash = static_source_hash()
+        if source_hash == collected_hash() and not force:
+            self.report(f'Static files up to date ({self.elapsed(started)})')
+            return
+        call_command('collectstatic', interactive=False, verbosity=self.verbosity)
+        with open(os.path.join(settings.STATIC_ROOT, STAMP_NAME), 'w') as f:
+            f.write(source_hash)
+        self.report(f'Collected static files ({self.elapsed(started)})')
+
+    def report(self, message):
+        if self.verbosity:
+            self.stdout.write(message)
+
+    def elapsed(self, started):
+        return f'{(time.perf_counter() - started) * 1000:.0f}ms'
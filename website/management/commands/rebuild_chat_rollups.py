@@ -0,0 +1,35 @@
+"""
+Recompute the daily chat analytics rollups from the stored messages.
+
+    python manage.py rebuild_chat_rollups [--since 2026-01-01]
+
+The rollups are kept up to date as chat turns are written; run this after
+bulk changes (``backfill_chat_leads``, imports) or to recover from a gap.
+Rerunning it gives the same result.
+"""
+
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from website import chat_analytics
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily chat analytics rollups from live and archived messages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='first day to rebuild (YYYY-MM-DD); default: every day')
+
+    def handle(self, *args, **options):
+        try:
+            since = date.fromisoformat(options['since']) if options['since'] else None
+        except ValueError:
+            raise CommandError('--since must be a date in YYYY-MM-DD format.')
+
+        started = time.perf_counter()
+        days = chat_analytics.rebuild(since)
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {days:,} days of chat rollups in {time.perf_counter() - started:.1f}s'
+        ))
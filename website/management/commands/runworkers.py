@@ -0,0 +1,40 @@
+"""
+Run background jobs.
+
+    python manage.py runworkers [--workers 4] [--processes] [--batch-size 1] [--burst]
+
+Starts ``--workers`` threads (or processes with ``--processes``, for
+CPU-bound tasks) that claim jobs from the ``Job`` table and run them until
+interrupted; a running job is finished first. ``--burst`` exits once the
+queue is empty, e.g. to drain it from cron.
+"""
+
+from django.core.management.base import BaseCommand
+
+from website import jobs
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs in a pool of worker threads or processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='worker threads (or processes)')
+        parser.add_argument('--processes', action='store_true', help='run workers as processes instead of threads')
+        parser.add_argument('--batch-size', type=int, default=1, help='jobs claimed at a time by each worker')
+        parser.add_argument('--poll-interval', type=float, help='idle seconds between polls (default: JOB_POLL_INTERVAL)')
+        parser.add_argument('--burst', action='store_true', help='exit once the queue is empty')
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"Starting {options['workers']} worker {'processes' if options['processes'] else 'threads'}"
+        )
+        jobs.run_workers(
+            workers=options['workers'],
+            processes=options['processes'],
+            batch_size=options['batch_size'],
+            poll_interval=options['poll_interval'],
+            burst=options['burst'],
+            # A plain function, so it also reaches spawned processes
+            log=print if options['verbosity'] > 1 else None,
+        )
+        self.stdout.write(self.style.SUCCESS('Workers stopped'))
@@ -0,0 +1,46 @@
+"""
+Send a newsletter campaign.
+
+    python manage.py send_campaign 3 [--rate 5] [--daily-quota 450]
+
+Safe to rerun: an interrupted or paused campaign continues with the
+recipients that have not been sent yet.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from website import campaigns
+from website.models import Campaign
+
+
+class Command(BaseCommand):
+    help = 'Send (or resume) a newsletter campaign to its pending recipients'
+
+    def add_arguments(self, parser):
+        parser.add_argument('campaign_id', type=int)
+        parser.add_argument('--batch-size', type=int, default=campaigns.BATCH_SIZE)
+        parser.add_argument('--rate', type=float, help='messages per second (default: NEWSLETTER_SEND_RATE)')
+        parser.add_argument('--daily-quota', type=int, help='messages per 24 hours (default: NEWSLETTER_DAILY_QUOTA)')
+        parser.add_argument('--retry-failed', action='store_true', help='requeue failed recipients first')
+
+    def handle(self, *args, **options):
+        try:
+            campaign = Campaign.objects.get(pk=options['campaign_id'])
+        except Campaign.DoesNotExist:
+            raise CommandError(f"Campaign {options['campaign_id']} does not exist")
+
+        if options['retry_failed']:
+            self.stdout.write(f'Requeued {campaigns.retry_failed(campaign)} failed recipients')
+
+        counts = campaigns.send_campaign(
+            campaign,
+            batch_size=options['batch_size'],
+            rate=options['rate'],
+            daily_quota=options['daily_quota'],
+            log=self.stdout.write,
+        )
+        campaign.refresh_from_db()
+        self.stdout.write(self.style.SUCCESS(
+            f"{campaign.get_status_display()}: sent {counts['sent']}, failed {counts['failed']}, "
+            f"interrupted {counts['interrupted']}"
+        ))
@@ -0,0 +1,115 @@
+"""
+Measure time-to-first-response of a fresh container start.
+
+    python manage.py startup_benchmark --runs 5 --compare
+
+Each run executes the boot steps the way ``Procfile`` does, starts gunicorn
+with ``config/gunicorn.py`` (preloading and warming caches, as deployed) and
+polls ``--path`` until the first response arrives. ``prestart`` mode
+uses ``manage.py prestart``; ``always`` mode runs ``migrate`` and
+``collectstatic`` unconditionally, as the start command used to.
+"""
+
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+BOOT_STEPS = {
+    'prestart': [['prestart', '--verbosity', '0']],
+    'always': [
+        ['migrate', '--noinput', '--verbosity', '0'],
+        ['collectstatic', '--noinput', '--verbosity', '0'],
+    ],
+    'none': [],
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = 'Measure boot steps plus gunicorn start until the first HTTP response'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--mode', choices=sorted(BOOT_STEPS), default='prestart')
+        parser.add_argument('--compare', action='store_true', help='measure the "always" mode as well')
+        parser.add_argument('--path', default='/robots.txt', help='URL polled for the first response')
+        parser.add_argument('--workers', type=int, default=1)
+        parser.add_argument('--timeout', type=float, default=60.0, help='seconds to wait for a response')
+
+    def handle(self, *args, **options):
+        modes = [options['mode']]
+        if options['compare'] and 'always' not in modes:
+            modes.append('always')
+
+        for mode in modes:
+            boot, serve = [], []
+            for _ in range(options['runs']):
+                boot_time, serve_time = self.run_once(mode, options)
+                boot.append(boot_time)
+                serve.append(serve_time)
+            total = [b + s for b, s in zip(boot, serve)]
+
+            self.stdout.write(f"\n{mode} ({options['runs']} runs, median / min / max ms)")
+            for label, values in (('boot steps', boot), ('server start', serve), ('first response', total)):
+                self.stdout.write(
+                    f'  {label:<15} {statistics.median(values):>8.0f} {min(values):>8.0f} {max(values):>8.0f}'
+                )
+
+    def run_once(self, mode, options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'config.settings'))
+        manage = [sys.executable, os.path.join(settings.BASE_DIR, 'manage.py')]
+
+        started = time.perf_counter()
+        for step in BOOT_STEPS[mode]:
+            subprocess.run(manage + step, cwd=settings.BASE_DIR, env=env, check=True)
+        booted = time.perf_counter()
+
+        port = free_port()
+        server = subprocess.Popen(
+            [
+                sys.executable, '-m', 'gunicorn', 'config.wsgi',
+                '--config', os.path.join(settings.BASE_DIR, 'config', 'gunicorn.py'),
+                # Override the config's bind and worker count
+                '--bind', f'127.0.0.1:{port}',
+                '--workers', str(options['workers']),
+                '--log-level', 'warning',
+            ],
+            cwd=settings.BASE_DIR,
+            env=env,
+        )
+        try:
+            self.wait_for_response(server, f"http://127.0.0.1:{port}{options['path']}", options['timeout'])
+            responded = time.perf_counter()
+        finally:
+            server.terminate()
+            server.wait()
+
+        return (booted - started) * 1000, (responded - booted) * 1000
+
+    def wait_for_response(self, server, url, timeout):
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            if server.poll() is not None:
+                raise CommandError('gunicorn exited during startup')
+            try:
+                urllib.request.urlopen(url, timeout=timeout)
+                return
+            except urllib.error.HTTPError:
+                # Any HTTP response counts, including errors
+                return
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.01)
+        raise CommandError(f'No response from {url} within {timeout}s')
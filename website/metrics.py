@@ -0,0 +1,372 @@
+"""
+Request metrics for Kaffero website.
+
+``RequestMetricsMiddleware`` records, per resolved view, request latency
+histograms, status codes, response sizes, database query counts and time,
+and template render time. Each worker keeps its numbers in memory and
+periodically writes them to ``METRICS_DIR/metrics_<pid>.json``; the
+``/dashboard/metrics`` endpoint merges every worker's file and renders the
+totals in the Prometheus text exposition format.
+
+Workers are recycled (``max_requests``, the memory limit), so a worker's
+numbers are folded into ``metrics_dead.json`` when it exits and its own file
+is removed; files left by workers that died without exiting cleanly are
+folded in the same way by the next ``collect()``. Totals therefore never go
+down and the directory does not grow with every worker ever started.
+
+With ``METRICS_SERVER_TIMING`` enabled each response also carries a
+``Server-Timing`` header with that request's query count and timings, which
+the load benchmarks in ``benchmarks/`` rely on.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows; gunicorn does not run there anyway
+    fcntl = None
+
+from django.conf import settings
+from django.db import connections
+from django.template import TemplateDoesNotExist
+from django.template.backends import django as django_backend
+
+# Upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+DEAD_FILE = 'metrics_dead.json'
+WORKER_FILE = re.compile(r'^metrics_(\d+)\.json$')
+
+_local = threading.local()
+
+
+class RequestStats:
+    """Per-request accumulator for DB and template timings."""
+
+    def __init__(self):
+        self.query_count = 0
+        self.query_time = 0.0
+        self.template_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        """``connection.execute_wrapper`` hook counting and timing queries."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.query_time += time.perf_counter() - start
+            self.query_count += 1
+
+
+class MetricsRegistry:
+    """In-memory metric values for this process, flushed to a shared file."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.last_flush = 0.0
+        self.reset()
+
+    def reset(self):
+        self.requests = defaultdict(int)            # (view, method, status) -> count
+        self.latency_buckets = defaultdict(lambda: [0] * len(LATENCY_BUCKETS))
+        self.latency_sum = defaultdict(float)       # view -> seconds
+        self.latency_count = defaultdict(int)       # view -> count
+        self.response_bytes = defaultdict(int)      # view -> bytes
+        self.db_queries = defaultdict(int)          # view -> queries
+        self.db_time = defaultdict(float)           # view -> seconds
+        self.template_time = defaultdict(float)     # view -> seconds
+        self.spam_checks = defaultdict(int)         # (form, result) -> count
+        self.spam_rules = defaultdict(int)          # (form, rule) -> count
+
+    def observe(self, view, method, status, duration, size, stats):
+        with self.lock:
+            self.requests[(view, method, str(status))] += 1
+            buckets = self.latency_buckets[view]
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if duration <= bound:
+                    buckets[i] += 1
+            self.latency_sum[view] += duration
+            self.latency_count[view] += 1
+            self.response_bytes[view] += size
+            self.db_queries[view] += stats.query_count
+            self.db_time[view] += stats.query_time
+            self.template_time[view] += stats.template_time
+
+    def count_spam_check(self, form, result, rules):
+        with self.lock:
+            self.spam_checks[(form, result)] += 1
+            for rule in rules:
+                self.spam_rules[(form, rule)] += 1
+
+    def to_dict(self):
+        with self.lock:
+            return _dump(vars(self))
+
+    def path(self):
+        return os.path.join(settings.METRICS_DIR, f'metrics_{os.getpid()}.json')
+
+    def flush(self, force=False):
+        """Write this process's values to its file in ``METRICS_DIR``."""
+        now = time.monotonic()
+        if not force and now - self.last_flush < settings.METRICS_FLUSH_INTERVAL:
+            return
+        self.last_flush = now
+
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        _write(self.path(), self.to_dict())
+
+    def retire(self):
+        """Fold this process's values into the exited workers' total; for ``worker_exit``."""
+        self.flush(force=True)
+        with _dead_lock():
+            _fold([self.path()])
+            with self.lock:
+                self.reset()
+
+
+registry = MetricsRegistry()
+
+
+def _empty():
+    return {
+        'requests': defaultdict(int),
+        'latency_buckets': defaultdict(lambda: [0] * len(LATENCY_BUCKETS)),
+        'latency_sum': defaultdict(float),
+        'latency_count': defaultdict(int),
+        'response_bytes': defaultdict(int),
+        'db_queries': defaultdict(int),
+        'db_time': defaultdict(float),
+        'template_time': defaultdict(float),
+        'spam_checks': defaultdict(int),
+        'spam_rules': defaultdict(int),
+    }
+
+
+def _dump(totals):
+    """Metric values (a registry's or merged totals) as JSON-serializable data."""
+    return {
+        'requests': [[*key, value] for key, value in totals['requests'].items()],
+        'latency_buckets': dict(totals['latency_buckets']),
+        'latency_sum': dict(totals['latency_sum']),
+        'latency_count': dict(totals['latency_count']),
+        'response_bytes': dict(totals['response_bytes']),
+        'db_queries': dict(totals['db_queries']),
+        'db_time': dict(totals['db_time']),
+        'template_time': dict(totals['template_time']),
+        'spam_checks': [[*key, value] for key, value in totals['spam_checks'].items()],
+        'spam_rules': [[*key, value] for key, value in totals['spam_rules'].items()],
+    }
+
+
+def _merge(totals, data):
+    """Add the values of one metrics file to ``totals``."""
+    for view, method, status, value in data.get('requests', []):
+        totals['requests'][(view, method, status)] += value
+    for view, buckets in data.get('latency_buckets', {}).items():
+        merged = totals['latency_buckets'][view]
+        for i, value in enumerate(buckets[:len(LATENCY_BUCKETS)]):
+            merged[i] += value
+    for key in ('spam_checks', 'spam_rules'):
+        for form, label, value in data.get(key, []):
+            totals[key][(form, label)] += value
+    for key in ('latency_sum', 'latency_count', 'response_bytes', 'db_queries', 'db_time', 'template_time'):
+        for view, value in data.get(key, {}).items():
+            totals[key][view] += value
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write(path, data):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+@contextmanager
+def _dead_lock():
+    """Hold the lock on the exited workers' total, shared by every process."""
+    os.makedirs(settings.METRICS_DIR, exist_ok=True)
+    with open(os.path.join(settings.METRICS_DIR, 'metrics_dead.lock'), 'w') as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
+
+def _fold(paths):
+    """Add the files at ``paths`` to the exited workers' total and remove them; needs ``_dead_lock()``."""
+    dead_path = os.path.join(settings.METRICS_DIR, DEAD_FILE)
+    totals = _empty()
+    for path in [dead_path, *paths]:
+        data = _read(path)
+        if data:
+            _merge(totals, data)
+    _write(dead_path, _dump(totals))
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def collect():
+    """Merge the metric files of every worker, live or exited."""
+    registry.flush(force=True)
+    totals = _empty()
+    with _dead_lock():
+        names = os.listdir(settings.METRICS_DIR)
+        dead = [
+            os.path.join(settings.METRICS_DIR, name) for name in names
+            if WORKER_FILE.match(name) and not _alive(int(WORKER_FILE.match(name).group(1)))
+        ]
+        if dead:
+            _fold(dead)
+            names = os.listdir(settings.METRICS_DIR)
+        for name in sorted(names):
+            if name == DEAD_FILE or WORKER_FILE.match(name):
+                data = _read(os.path.join(settings.METRICS_DIR, name))
+                if data:
+                    _merge(totals, data)
+    return totals
+
+
+def _escape(value):
+    """Escape a label value for the text exposition format."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+
+
+def render_prometheus(totals):
+    """Render merged metrics in the Prometheus text exposition format."""
+    lines = [
+        '# HELP kaffero_http_requests_total Requests by view, method and status code.',
+        '# TYPE kaffero_http_requests_total counter',
+    ]
+    for (view, method, status), value in sorted(totals['requests'].items()):
+        lines.append(f'kaffero_http_requests_total{{{_labels(view=view, method=method, status=status)}}} {value}')
+
+    lines += [
+        '# HELP kaffero_http_request_duration_seconds Request latency by view.',
+        '# TYPE kaffero_http_request_duration_seconds histogram',
+    ]
+    for view in sorted(totals['latency_count']):
+        buckets = totals['latency_buckets'][view]
+        for bound, value in zip(LATENCY_BUCKETS, buckets):
+            lines.append(f'kaffero_http_request_duration_seconds_bucket{{{_labels(view=view, le=bound)}}} {value}')
+        count = totals['latency_count'][view]
+        lines.append(f'kaffero_http_request_duration_seconds_bucket{{{_labels(view=view, le="+Inf")}}} {count}')
+        lines.append(f'kaffero_http_request_duration_seconds_sum{{{_labels(view=view)}}} {totals["latency_sum"][view]:.6f}')
+        lines.append(f'kaffero_http_request_duration_seconds_count{{{_labels(view=view)}}} {count}')
+
+    counters = [
+        ('kaffero_http_response_size_bytes_total', 'Response body bytes by view.', 'response_bytes', '{}'),
+        ('kaffero_db_queries_total', 'Database queries by view.', 'db_queries', '{}'),
+        ('kaffero_db_query_duration_seconds_total', 'Time spent in database queries by view.', 'db_time', '{:.6f}'),
+        ('kaffero_template_render_seconds_total', 'Time spent rendering templates by view.', 'template_time', '{:.6f}'),
+    ]
+    for name, help_text, key, fmt in counters:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for view, value in sorted(totals[key].items()):
+            lines.append(f'{name}{{{_labels(view=view)}}} {fmt.format(value)}')
+
+    lines += [
+        '# HELP kaffero_spam_checks_total Form submissions scored by the spam pre-filter, by result.',
+        '# TYPE kaffero_spam_checks_total counter',
+    ]
+    for (form, result), value in sorted(totals['spam_checks'].items()):
+        lines.append(f'kaffero_spam_checks_total{{{_labels(form=form, result=result)}}} {value}')
+    lines += [
+        '# HELP kaffero_spam_rule_hits_total Spam pre-filter rule matches by form and rule.',
+        '# TYPE kaffero_spam_rule_hits_total counter',
+    ]
+    for (form, rule), value in sorted(totals['spam_rules'].items()):
+        lines.append(f'kaffero_spam_rule_hits_total{{{_labels(form=form, rule=rule)}}} {value}')
+
+    return '\n'.join(lines) + '\n'
+
+
+class RequestMetricsMiddleware:
+    """Record latency, queries, template time and response size per view."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = RequestStats()
+        _local.stats = stats
+        start = time.perf_counter()
+
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(stats))
+                response = self.get_response(request)
+        finally:
+            _local.stats = None
+
+        duration = time.perf_counter() - start
+        match = request.resolver_match
+        view = match.view_name if match else '<unresolved>'
+        size = 0 if response.streaming else len(response.content)
+
+        registry.observe(view, request.method, response.status_code, duration, size, stats)
+        registry.flush()
+
+        if settings.METRICS_SERVER_TIMING:
+            response['Server-Timing'] = (
+                f'db;dur={stats.query_time * 1000:.2f};desc="{stats.query_count} queries", '
+                f'tpl;dur={stats.template_time * 1000:.2f}, '
+                f'total;dur={duration * 1000:.2f}'
+            )
+        return response
+
+
+class Template(django_backend.Template):
+    """Django template that adds its render time to the current request."""
+
+    def render(self, context=None, request=None):
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats = getattr(_local, 'stats', None)
+            if stats is not None:
+                stats.template_time += time.perf_counter() - start
+
+
+class InstrumentedDjangoTemplates(django_backend.DjangoTemplates):
+    """``DjangoTemplates`` backend whose templates report render time."""
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
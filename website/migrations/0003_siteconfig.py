@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0002_chatconversation_chatmessage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SiteConfig',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('site_name', models.CharField(max_length=100)),
+                ('site_tagline', models.CharField(blank=True, max_length=255)),
+                ('site_description', models.TextField(blank=True)),
+                ('company_name', models.CharField(max_length=200)),
+                ('company_email', models.EmailField(max_length=254)),
+                ('company_phone', models.CharField(max_length=20)),
+                ('company_whatsapp', models.CharField(blank=True, max_length=20)),
+                ('company_address', models.CharField(blank=True, max_length=255)),
+                ('social_linkedin', models.URLField(blank=True)),
+                ('social_instagram', models.URLField(blank=True)),
+                ('social_facebook', models.URLField(blank=True)),
+                ('social_youtube', models.URLField(blank=True)),
+                ('pricing', models.JSONField(blank=True, default=dict)),
+                ('renewal_fee_percent', models.PositiveIntegerField(default=20, help_text='Annual renewal fee as a percentage of the license price')),
+                ('version', models.PositiveIntegerField(default=0, editable=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Site Configuration',
+                'verbose_name_plural': 'Site Configuration',
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:54
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+def normalize_emails(apps, schema_editor):
+    """Lowercase stored emails, keeping one row per address."""
+    NewsletterSubscriber = apps.get_model('website', 'NewsletterSubscriber')
+    kept = {}
+    # Prefer active rows, then the earliest subscription
+    for subscriber in NewsletterSubscriber.objects.order_by('-is_active', 'subscribed_at', 'pk'):
+        email = subscriber.email.strip().lower()
+        if email in kept:
+            subscriber.delete()
+            continue
+        kept[email] = subscriber.pk
+        if subscriber.email != email:
+            NewsletterSubscriber.objects.filter(pk=subscriber.pk).update(email=email)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0003_siteconfig'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_emails, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='newslettersubscriber',
+            name='email',
+            field=models.EmailField(max_length=254),
+        ),
+        migrations.AddConstraint(
+            model_name='newslettersubscriber',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), name='newsletter_email_lower_unique'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0004_newsletter_email_lower_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Campaign',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=200)),
+                ('preheader', models.CharField(blank=True, help_text='Preview text shown by mail clients', max_length=200)),
+                ('body', models.TextField(help_text='HTML content inserted into the email layout')),
+                ('status', models.CharField(choices=[('draft', 'Draft'), ('sending', 'Sending'), ('paused', 'Paused'), ('sent', 'Sent')], default='draft', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Campaign',
+                'verbose_name_plural': 'Campaigns',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CampaignRecipient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.EmailField(max_length=254)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('sending', 'Sending'), ('sent', 'Sent'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('error', models.TextField(blank=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('campaign', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recipients', to='website.campaign')),
+                ('subscriber', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='website.newslettersubscriber')),
+            ],
+            options={
+                'verbose_name': 'Campaign Recipient',
+                'verbose_name_plural': 'Campaign Recipients',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['campaign', 'status', 'id'], name='campaign_recipient_queue'), models.Index(fields=['sent_at'], name='campaign_recipient_sent_at')],
+                'constraints': [models.UniqueConstraint(fields=('campaign', 'email'), name='campaign_recipient_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0005_campaign'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatArchive',
+            fields=[
+                ('conversation', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='archive', serialize=False, to='website.chatconversation')),
+                ('transcript', models.BinaryField()),
+                ('message_count', models.PositiveIntegerField(default=0)),
+                ('raw_size', models.PositiveIntegerField(default=0, help_text='Uncompressed transcript size in bytes')),
+                ('archived_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Chat Archive',
+                'verbose_name_plural': 'Chat Archives',
+            },
+        ),
+    ]
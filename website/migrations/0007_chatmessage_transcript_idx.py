@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0006_chatarchive'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['conversation', 'created_at', 'id'], name='chat_message_transcript'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0007_chatmessage_transcript_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatconversation',
+            name='contacts',
+            field=models.JSONField(blank=True, default=list, help_text='Every email and phone number the visitor shared'),
+        ),
+    ]
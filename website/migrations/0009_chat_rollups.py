@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0008_chatconversation_contacts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('conversations', models.PositiveIntegerField(default=0)),
+                ('messages', models.PositiveIntegerField(default=0)),
+                ('visitor_messages', models.PositiveIntegerField(default=0)),
+                ('leads', models.PositiveIntegerField(default=0, help_text='Conversations started this day that became leads')),
+            ],
+            options={
+                'verbose_name': 'Chat Daily Stats',
+                'verbose_name_plural': 'Chat Daily Stats',
+                'ordering': ['day'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ChatIntentDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('intent', models.CharField(max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Chat Intent Daily',
+                'verbose_name_plural': 'Chat Intents Daily',
+                'ordering': ['day', 'intent'],
+                'constraints': [models.UniqueConstraint(fields=('day', 'intent'), name='chat_intent_daily_day_intent')],
+            },
+        ),
+    ]
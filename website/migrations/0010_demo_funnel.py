@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:25
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0009_chat_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='demorequest',
+            name='status_changed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='DemoFunnelDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('source', models.CharField(choices=[('google', 'Google Search'), ('social_media', 'Social Media'), ('referral', 'Referral'), ('just_dial', 'Just Dial'), ('word_of_mouth', 'Word of Mouth'), ('other', 'Other')], max_length=20)),
+                ('city', models.CharField(max_length=100)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('demo_created', 'Demo Created'), ('contacted', 'Contacted'), ('converted', 'Converted'), ('declined', 'Declined')], max_length=20)),
+                ('entered', models.PositiveIntegerField(default=0)),
+                ('exited', models.PositiveIntegerField(default=0)),
+                ('seconds_in_stage', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Demo Funnel Daily',
+                'verbose_name_plural': 'Demo Funnel Daily',
+                'ordering': ['day', 'source', 'city', 'status'],
+                'constraints': [models.UniqueConstraint(fields=('day', 'source', 'city', 'status'), name='demo_funnel_daily_key')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DemoStatusChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_status', models.CharField(blank=True, choices=[('pending', 'Pending'), ('processing', 'Processing'), ('demo_created', 'Demo Created'), ('contacted', 'Contacted'), ('converted', 'Converted'), ('declined', 'Declined')], max_length=20)),
+                ('to_status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('demo_created', 'Demo Created'), ('contacted', 'Contacted'), ('converted', 'Converted'), ('declined', 'Declined')], max_length=20)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('changed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('demo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_changes', to='website.demorequest')),
+            ],
+            options={
+                'verbose_name': 'Demo Status Change',
+                'verbose_name_plural': 'Demo Status Changes',
+                'ordering': ['changed_at', 'id'],
+                'indexes': [models.Index(fields=['demo', 'changed_at'], name='demo_status_change_demo')],
+            },
+        ),
+    ]
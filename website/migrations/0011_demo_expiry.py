@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0010_demo_funnel'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='demorequest',
+            name='expiry_notice',
+            field=models.CharField(blank=True, choices=[('', 'None'), ('queued', 'Queued'), ('sending', 'Sending'), ('sent', 'Sent'), ('failed', 'Failed')], editable=False, max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='demofunneldaily',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('demo_created', 'Demo Created'), ('contacted', 'Contacted'), ('converted', 'Converted'), ('declined', 'Declined'), ('expired', 'Demo Expired')], max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='demorequest',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('demo_created', 'Demo Created'), ('contacted', 'Contacted'), ('converted', 'Converted'), ('declined', 'Declined'), ('expired', 'Demo Expired')], default='pending', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='demostatuschange',
+            name='from_status',
+            field=models.CharField(blank=True, choices=[('pending', 'Pending'), ('processing', 'Processing'), ('demo_created', 'Demo Created'), ('contacted', 'Contacted'), ('converted', 'Converted'), ('declined', 'Declined'), ('expired', 'Demo Expired')], max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='demostatuschange',
+            name='to_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('demo_created', 'Demo Created'), ('contacted', 'Contacted'), ('converted', 'Converted'), ('declined', 'Declined'), ('expired', 'Demo Expired')], max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='demorequest',
+            index=models.Index(fields=['demo_expires_at'], name='demo_request_expires'),
+        ),
+        migrations.AddIndex(
+            model_name='demorequest',
+            index=models.Index(condition=models.Q(('expiry_notice__in', ['queued', 'sending'])), fields=['id'], name='demo_request_notice_queue'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0012_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RateLimitCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cache_key', models.CharField(max_length=255, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+                ('expires', models.DateTimeField(blank=True, db_index=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Rate Limit Counter',
+                'verbose_name_plural': 'Rate Limit Counters',
+            },
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:02
+
+import json
+import zlib
+
+from django.db import migrations, models
+
+CHUNK_SIZE = 100
+
+
+def dumps(entries):
+    return json.dumps(entries, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def split_transcripts(apps, schema_editor):
+    """Re-encode each single-stream transcript as chunks of CHUNK_SIZE messages."""
+    ChatArchive = apps.get_model('website', 'ChatArchive')
+    for archive in ChatArchive.objects.iterator(chunk_size=100):
+        entries = json.loads(zlib.decompress(bytes(archive.transcript)))
+        chunks, offsets, position = [], [], 0
+        for start in range(0, len(entries), CHUNK_SIZE):
+            chunk = zlib.compress(dumps(entries[start:start + CHUNK_SIZE]), 9)
+            chunks.append(chunk)
+            offsets.append(position)
+            position += len(chunk)
+        ChatArchive.objects.filter(pk=archive.pk).update(
+            transcript=b''.join(chunks), chunk_offsets=offsets, chunk_size=CHUNK_SIZE,
+        )
+
+
+def join_transcripts(apps, schema_editor):
+    """Back to one compressed stream per transcript."""
+    ChatArchive = apps.get_model('website', 'ChatArchive')
+    for archive in ChatArchive.objects.iterator(chunk_size=100):
+        data, entries = bytes(archive.transcript), []
+        while data:
+            stream = zlib.decompressobj()
+            entries.extend(json.loads(stream.decompress(data)))
+            data = stream.unused_data
+        ChatArchive.objects.filter(pk=archive.pk).update(transcript=zlib.compress(dumps(entries), 9))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0013_ratelimit_counter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatarchive',
+            name='chunk_offsets',
+            field=models.JSONField(default=list),
+        ),
+        migrations.AddField(
+            model_name='chatarchive',
+            name='chunk_size',
+            field=models.PositiveIntegerField(default=100),
+        ),
+        migrations.RunPython(split_transcripts, join_transcripts),
+    ]
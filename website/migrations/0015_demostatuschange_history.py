@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_history(apps, schema_editor):
+    """Copy each request's source and city onto its changes, with the time spent in each stage."""
+    DemoStatusChange = apps.get_model('website', 'DemoStatusChange')
+    rows = DemoStatusChange.objects.order_by('demo_id', 'changed_at', 'id').values_list(
+        'pk', 'demo_id', 'changed_at', 'demo__source', 'demo__city', 'demo__created_at',
+    )
+    batch, previous_demo, entered_at = [], None, None
+    for pk, demo_id, changed_at, source, city, created_at in rows.iterator(chunk_size=2000):
+        if demo_id != previous_demo:
+            previous_demo, entered_at = demo_id, created_at
+        seconds = max(int((changed_at - entered_at).total_seconds()), 0)
+        entered_at = changed_at
+        batch.append(DemoStatusChange(
+            pk=pk, source=source, city=' '.join(city.split()).title()[:100], seconds_in_stage=seconds,
+        ))
+        if len(batch) == 500:
+            DemoStatusChange.objects.bulk_update(batch, ['source', 'city', 'seconds_in_stage'])
+            batch = []
+    DemoStatusChange.objects.bulk_update(batch, ['source', 'city', 'seconds_in_stage'])
+
+
+def drop_orphans(apps, schema_editor):
+    """The old foreign key cannot be null: forget the changes of deleted requests."""
+    apps.get_model('website', 'DemoStatusChange').objects.filter(demo=None).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0014_chatarchive_chunks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='demostatuschange',
+            name='city',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='demostatuschange',
+            name='seconds_in_stage',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='demostatuschange',
+            name='source',
+            field=models.CharField(blank=True, choices=[('google', 'Google Search'), ('social_media', 'Social Media'), ('referral', 'Referral'), ('just_dial', 'Just Dial'), ('word_of_mouth', 'Word of Mouth'), ('other', 'Other')], max_length=20),
+        ),
+        migrations.RunPython(fill_history, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='demostatuschange',
+            name='demo',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='status_changes', to='website.demorequest'),
+        ),
+        migrations.RunPython(migrations.RunPython.noop, drop_orphans),
+    ]
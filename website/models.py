@@ -2,7 +2,12 @@
 Models for Kaffero showcase website.
 """
 
+import math
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models.functions import Lower
 from django.utils import timezone
 
 
@@ -16,6 +21,14 @@ class DemoRequest(models.Model):
         CONTACTED = 'contacted', 'Contacted'
         CONVERTED = 'converted', 'Converted'
         DECLINED = 'declined', 'Declined'
+        EXPIRED = 'expired', 'Demo Expired'
+
+    class ExpiryNotice(models.TextChoices):
+        NONE = '', 'None'
+        QUEUED = 'queued', 'Queued'
+        SENDING = 'sending', 'Sending'
+        SENT = 'sent', 'Sent'
+        FAILED = 'failed', 'Failed'
 
     class Source(models.TextChoices):
         GOOGLE = 'google', 'Google Search'
@@ -73,8 +86,20 @@ class DemoRequest(models.Model):
     credentials_sent_at = models.DateTimeField(null=True, blank=True)
     last_contacted_at = models.DateTimeField(null=True, blank=True)
 
+    # When the request entered its current status; None means at creation
+    status_changed_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # Follow-up email sent by `manage.py expire_demos` once the demo has expired
+    expiry_notice = models.CharField(max_length=10, choices=ExpiryNotice.choices, blank=True, editable=False)
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['demo_expires_at'], name='demo_request_expires'),
+            models.Index(
+                fields=['id'], name='demo_request_notice_queue',
+                condition=models.Q(expiry_notice__in=['queued', 'sending']),
+            ),
+        ]
         verbose_name = 'Demo Request'
         verbose_name_plural = 'Demo Requests'
 
@@ -130,7 +155,7 @@ class ContactMessage(models.Model):
 class NewsletterSubscriber(models.Model):
     """Model for newsletter subscriptions."""
 
-    email = models.EmailField(unique=True)
+    email = models.EmailField()
     is_active = models.BooleanField(default=True)
     subscribed_at = models.DateTimeField(auto_now_add=True)
     unsubscribed_at = models.DateTimeField(null=True, blank=True)
@@ -139,10 +164,82 @@ class NewsletterSubscriber(models.Model):
         ordering = ['-subscribed_at']
         verbose_name = 'Newsletter Subscriber'
         verbose_name_plural = 'Newsletter Subscribers'
+        constraints = [
+            # Conflict target of the upserts in website/newsletter.py
+            models.UniqueConstraint(Lower('email'), name='newsletter_email_lower_unique'),
+        ]
 
     def __str__(self):
         return self.email
 
+    def save(self, *args, **kwargs):
+        self.email = self.email.strip().lower()
+        super().save(*args, **kwargs)
+
+
+class Campaign(models.Model):
+    """Model for newsletter campaigns sent to active subscribers."""
+
+    class Status(models.TextChoices):
+        DRAFT = 'draft', 'Draft'
+        SENDING = 'sending', 'Sending'
+        PAUSED = 'paused', 'Paused'
+        SENT = 'sent', 'Sent'
+
+    subject = models.CharField(max_length=200)
+    preheader = models.CharField(max_length=200, blank=True, help_text='Preview text shown by mail clients')
+    body = models.TextField(help_text='HTML content inserted into the email layout')
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.DRAFT)
+
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Campaign'
+        verbose_name_plural = 'Campaigns'
+
+    def __str__(self):
+        return self.subject
+
+
+class CampaignRecipient(models.Model):
+    """Delivery status of one campaign email."""
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        SENDING = 'sending', 'Sending'
+        SENT = 'sent', 'Sent'
+        FAILED = 'failed', 'Failed'
+        SKIPPED = 'skipped', 'Skipped'
+
+    campaign = models.ForeignKey(Campaign, on_delete=models.CASCADE, related_name='recipients')
+    subscriber = models.ForeignKey(
+        NewsletterSubscriber, on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    email = models.EmailField()
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+    error = models.TextField(blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+        verbose_name = 'Campaign Recipient'
+        verbose_name_plural = 'Campaign Recipients'
+        constraints = [
+            models.UniqueConstraint(fields=['campaign', 'email'], name='campaign_recipient_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['campaign', 'status', 'id'], name='campaign_recipient_queue'),
+            models.Index(fields=['sent_at'], name='campaign_recipient_sent_at'),
+        ]
+
+    def __str__(self):
+        return f'{self.email} ({self.status})'
+
 
 class Testimonial(models.Model):
     """Model for customer testimonials."""
@@ -294,6 +391,7 @@ class ChatConversation(models.Model):
     visitor_name = models.CharField(max_length=200, blank=True)
     visitor_email = models.EmailField(blank=True)
     visitor_phone = models.CharField(max_length=20, blank=True)
+    contacts = models.JSONField(default=list, blank=True, help_text='Every email and phone number the visitor shared')
 
     # Tracking
     page_url = models.URLField(blank=True)
@@ -322,7 +420,12 @@ class ChatConversation(models.Model):
 
     @property
     def message_count(self):
-        return self.messages.count()
+        count = self.messages.count()
+        try:
+            count += self.archive.message_count
+        except ChatArchive.DoesNotExist:
+            pass
+        return count
 
 
 class ChatMessage(models.Model):
@@ -343,8 +446,307 @@ class ChatMessage(models.Model):
 
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            # Transcript paging walks back by (created_at, id)
+            models.Index(fields=['conversation', 'created_at', 'id'], name='chat_message_transcript'),
+        ]
         verbose_name = 'Chat Message'
         verbose_name_plural = 'Chat Messages'
 
     def __str__(self):
         return f"{self.role}: {self.content[:50]}..."
+
+
+class ChatArchive(models.Model):
+    """Compressed transcript of a compacted chat conversation.
+
+    ``website.chat_archive`` folds the messages of old resolved conversations
+    into one row here and deletes their ``ChatMessage`` rows.
+    """
+
+    conversation = models.OneToOneField(
+        ChatConversation,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='archive'
+    )
+    # Chunks of chunk_size [role, content, created_at] entries, each a
+    # zlib-compressed JSON list, end to end from the byte offsets in chunk_offsets
+    transcript = models.BinaryField()
+    chunk_offsets = models.JSONField(default=list)
+    chunk_size = models.PositiveIntegerField(default=100)
+    message_count = models.PositiveIntegerField(default=0)
+    raw_size = models.PositiveIntegerField(default=0, help_text='Uncompressed transcript size in bytes')
+    archived_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Chat Archive'
+        verbose_name_plural = 'Chat Archives'
+
+    def __str__(self):
+        return f"Archive of chat #{self.conversation_id} ({self.message_count} messages)"
+
+
+def validate_pricing(pricing):
+    """Check that ``pricing`` maps plan keys to plans with a numeric ``price`` and a list of ``features``."""
+    if not isinstance(pricing, dict):
+        raise ValidationError('Pricing must be a JSON object of plans.')
+    for key, plan in pricing.items():
+        if not isinstance(plan, dict):
+            raise ValidationError(f'Plan "{key}" must be a JSON object.')
+        price = plan.get('price')
+        if isinstance(price, bool) or not isinstance(price, (int, float)) or not math.isfinite(price) or price < 0:
+            raise ValidationError(f'Plan "{key}" needs a numeric price.')
+        if not isinstance(plan.get('features'), list):
+            raise ValidationError(f'Plan "{key}" needs a list of features.')
+
+
+class SiteConfig(models.Model):
+    """Singleton holding site-wide settings editable from the dashboard.
+
+    Values are seeded from ``config/settings.py`` the first time the row is
+    created. Templates read them through the snapshot in ``website.site_config``
+    rather than from this model directly.
+    """
+
+    # Branding
+    site_name = models.CharField(max_length=100)
+    site_tagline = models.CharField(max_length=255, blank=True)
+    site_description = models.TextField(blank=True)
+
+    # Company Info
+    company_name = models.CharField(max_length=200)
+    company_email = models.EmailField()
+    company_phone = models.CharField(max_length=20)
+    company_whatsapp = models.CharField(max_length=20, blank=True)
+    company_address = models.CharField(max_length=255, blank=True)
+
+    # Social Media
+    social_linkedin = models.URLField(blank=True)
+    social_instagram = models.URLField(blank=True)
+    social_facebook = models.URLField(blank=True)
+    social_youtube = models.URLField(blank=True)
+
+    # Pricing
+    pricing = models.JSONField(default=dict, blank=True)
+    renewal_fee_percent = models.PositiveIntegerField(
+        default=20,
+        help_text='Annual renewal fee as a percentage of the license price'
+    )
+
+    # Bumped on every save so other workers know to reload their snapshot
+    version = models.PositiveIntegerField(default=0, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Site Configuration'
+        verbose_name_plural = 'Site Configuration'
+
+    def __str__(self):
+        return f"{self.site_name} configuration"
+
+    def clean(self):
+        try:
+            validate_pricing(self.pricing)
+        except ValidationError as exc:
+            raise ValidationError({'pricing': exc.messages})
+
+    def save(self, *args, **kwargs):
+        self.pk = 1
+        self.version = (self.version or 0) + 1
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def defaults(cls):
+        """Initial values taken from the Django settings module."""
+        return {
+            'site_name': settings.SITE_NAME,
+            'site_tagline': settings.SITE_TAGLINE,
+            'site_description': settings.SITE_DESCRIPTION,
+            'company_name': settings.COMPANY_NAME,
+            'company_email': settings.COMPANY_EMAIL,
+            'company_phone': settings.COMPANY_PHONE,
+            'company_whatsapp': settings.COMPANY_WHATSAPP,
+            'company_address': settings.COMPANY_ADDRESS,
+            'social_linkedin': settings.SOCIAL_LINKEDIN,
+            'social_instagram': settings.SOCIAL_INSTAGRAM,
+            'social_facebook': settings.SOCIAL_FACEBOOK,
+            'social_youtube': settings.SOCIAL_YOUTUBE,
+            'pricing': settings.PRICING,
+            'renewal_fee_percent': settings.RENEWAL_FEE_PERCENT,
+        }
+
+    @classmethod
+    def load(cls):
+        """Return the configuration row, creating it from settings if missing."""
+        config, created = cls.objects.get_or_create(pk=1, defaults=cls.defaults())
+        return config
+
+
+class ChatDailyStats(models.Model):
+    """Chat totals for one day, maintained by ``website.chat_analytics``."""
+
+    day = models.DateField(unique=True)
+    conversations = models.PositiveIntegerField(default=0)
+    messages = models.PositiveIntegerField(default=0)
+    visitor_messages = models.PositiveIntegerField(default=0)
+    leads = models.PositiveIntegerField(default=0, help_text='Conversations started this day that became leads')
+
+    class Meta:
+        ordering = ['day']
+        verbose_name = 'Chat Daily Stats'
+        verbose_name_plural = 'Chat Daily Stats'
+
+    def __str__(self):
+        return f"{self.day}: {self.conversations} conversations"
+
+
+class ChatIntentDaily(models.Model):
+    """Visitor messages per intent for one day, maintained by ``website.chat_analytics``."""
+
+    day = models.DateField()
+    intent = models.CharField(max_length=20)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['day', 'intent']
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'intent'], name='chat_intent_daily_day_intent'),
+        ]
+        verbose_name = 'Chat Intent Daily'
+        verbose_name_plural = 'Chat Intents Daily'
+
+    def __str__(self):
+        return f"{self.day} {self.intent}: {self.count}"
+
+
+class DemoStatusChange(models.Model):
+    """One status transition of a demo request; rows are only ever added.
+
+    Written by ``website.funnel`` in the transaction that saves the new status.
+    The first row of each request has a blank ``from_status``. Each row
+    carries the request's source and city and the time it spent in
+    ``from_status``, and outlives the request (``demo`` becomes null), so
+    ``DemoFunnelDaily`` can always be rebuilt from this table alone.
+    """
+
+    demo = models.ForeignKey(
+        DemoRequest, on_delete=models.SET_NULL, null=True, blank=True, related_name='status_changes'
+    )
+    source = models.CharField(max_length=20, choices=DemoRequest.Source.choices, blank=True)
+    city = models.CharField(max_length=100, blank=True)
+    from_status = models.CharField(max_length=20, choices=DemoRequest.Status.choices, blank=True)
+    to_status = models.CharField(max_length=20, choices=DemoRequest.Status.choices)
+    seconds_in_stage = models.PositiveBigIntegerField(default=0)
+    changed_at = models.DateTimeField(default=timezone.now)
+    changed_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL,
+        null=True, blank=True, related_name='+'
+    )
+
+    class Meta:
+        ordering = ['changed_at', 'id']
+        indexes = [
+            models.Index(fields=['demo', 'changed_at'], name='demo_status_change_demo'),
+        ]
+        verbose_name = 'Demo Status Change'
+        verbose_name_plural = 'Demo Status Changes'
+
+    def __str__(self):
+        return f"{self.demo_id}: {self.from_status or 'new'} -> {self.to_status}"
+
+
+class DemoFunnelDaily(models.Model):
+    """Demo requests entering and leaving a status on one day, per source and city.
+
+    Maintained by ``website.funnel``. ``seconds_in_stage`` is the total time
+    the requests that left the status that day had spent in it.
+    """
+
+    day = models.DateField()
+    source = models.CharField(max_length=20, choices=DemoRequest.Source.choices)
+    city = models.CharField(max_length=100)
+    status = models.CharField(max_length=20, choices=DemoRequest.Status.choices)
+    entered = models.PositiveIntegerField(default=0)
+    exited = models.PositiveIntegerField(default=0)
+    seconds_in_stage = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        ordering = ['day', 'source', 'city', 'status']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'source', 'city', 'status'], name='demo_funnel_daily_key'
+            ),
+        ]
+        verbose_name = 'Demo Funnel Daily'
+        verbose_name_plural = 'Demo Funnel Daily'
+
+    def __str__(self):
+        return f"{self.day} {self.source} {self.city} {self.status}: +{self.entered} -{self.exited}"
+
+
+class Job(models.Model):
+    """A unit of background work, run by ``manage.py runworkers`` (see ``website.jobs``)."""
+
+    class Status(models.TextChoices):
+        QUEUED = 'queued', 'Queued'
+        RUNNING = 'running', 'Running'
+        DONE = 'done', 'Done'
+        FAILED = 'failed', 'Failed'
+
+    task = models.CharField(max_length=100)
+    kwargs = models.JSONField(default=dict, blank=True)
+    priority = models.SmallIntegerField(default=0, help_text='Higher runs first')
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.QUEUED)
+    run_at = models.DateTimeField(default=timezone.now)
+    unique_key = models.CharField(
+        max_length=200, blank=True, help_text='At most one queued or running job per key'
+    )
+
+    # Attempts and the current lease
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['unique_key'], name='job_unique_key',
+                condition=models.Q(status__in=['queued', 'running']) & ~models.Q(unique_key=''),
+            ),
+        ]
+        indexes = [
+            # Claim order of the queue, and expired leases to recover
+            models.Index(
+                fields=['-priority', 'run_at', 'id'], name='job_ready',
+                condition=models.Q(status='queued'),
+            ),
+            models.Index(fields=['locked_until'], name='job_lease', condition=models.Q(status='running')),
+        ]
+        verbose_name = 'Job'
+        verbose_name_plural = 'Jobs'
+
+    def __str__(self):
+        return f'{self.task} ({self.status})'
+
+
+class RateLimitCounter(models.Model):
+    """A rate limit counter, stored by ``website.ratelimit.CounterCache``."""
+
+    cache_key = models.CharField(max_length=255, unique=True)
+    value = models.BigIntegerField(default=0)
+    expires = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    class Meta:
+        verbose_name = 'Rate Limit Counter'
+        verbose_name_plural = 'Rate Limit Counters'
+
+    def __str__(self):
+        return f'{self.cache_key} = {self.value}'
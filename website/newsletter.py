@@ -0,0 +1,159 @@
+"""
+Newsletter subscriptions for Kaffero website.
+
+Every write is a single ``INSERT ... ON CONFLICT (lower(email))`` statement
+against the case-insensitive unique index on ``NewsletterSubscriber``, so a
+signup never needs a uniqueness check first and concurrent signups for the
+same address cannot race. Supported on PostgreSQL and SQLite 3.35+.
+"""
+
+import csv
+
+from django.core import signing
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import NewsletterSubscriber
+
+# Results of subscribe()
+CREATED = 'created'
+REACTIVATED = 'reactivated'
+ALREADY_ACTIVE = 'already_active'
+
+IMPORT_BATCH_SIZE = 1000
+
+UNSUBSCRIBE_SALT = 'website.newsletter.unsubscribe'
+
+TABLE = NewsletterSubscriber._meta.db_table
+
+
+def normalize_email(email):
+    return email.strip().lower()
+
+
+def _upsert_sql(rows, reactivate, returning='id'):
+    values = ', '.join(['(%s, %s, %s)'] * rows)
+    sql = (
+        f'INSERT INTO {TABLE} (email, is_active, subscribed_at) VALUES {values} '
+        f'ON CONFLICT (lower(email)) '
+    )
+    if reactivate:
+        # Only touches rows that were unsubscribed; active ones return nothing
+        sql += (
+            f'DO UPDATE SET is_active = %s, unsubscribed_at = NULL '
+            f'WHERE NOT {TABLE}.is_active '
+        )
+    else:
+        sql += 'DO NOTHING '
+    return f'{sql}RETURNING {returning}'
+
+
+def subscribe(email):
+    """Subscribe ``email``, reactivating it if it had unsubscribed.
+
+    Returns ``CREATED``, ``REACTIVATED`` or ``ALREADY_ACTIVE``.
+    """
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    # A reactivated row keeps its original subscribed_at
+    sql = _upsert_sql(1, reactivate=True, returning='subscribed_at = %s')
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [normalize_email(email), True, now, True, now])
+        row = cursor.fetchone()
+
+    if row is None:
+        return ALREADY_ACTIVE
+    return CREATED if row[0] else REACTIVATED
+
+
+def import_emails(emails, reactivate=False, batch_size=IMPORT_BATCH_SIZE):
+    """Insert ``emails`` in batches, skipping invalid and duplicate addresses.
+
+    Addresses that already exist are left alone unless ``reactivate`` is set,
+    in which case unsubscribed ones are subscribed again. Returns a dict of
+    counts: ``added`` (new or reactivated), ``existing``, ``invalid``.
+    """
+    # Keep each statement under the backend's bound parameter limit
+    max_params = connection.features.max_query_params
+    if max_params:
+        batch_size = min(batch_size, (max_params - 1) // 3)
+
+    counts = {'added': 0, 'existing': 0, 'invalid': 0}
+    seen = set()
+    batch = []
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+
+    def flush():
+        params = []
+        for email in batch:
+            params += [email, True, now]
+        if reactivate:
+            params.append(True)
+        with connection.cursor() as cursor:
+            cursor.execute(_upsert_sql(len(batch), reactivate), params)
+            added = len(cursor.fetchall())
+        counts['added'] += added
+        counts['existing'] += len(batch) - added
+        batch.clear()
+
+    with transaction.atomic():
+        for email in emails:
+            email = normalize_email(email)
+            if email in seen:
+                continue
+            seen.add(email)
+            try:
+                validate_email(email)
+            except ValidationError:
+                counts['invalid'] += 1
+                continue
+            batch.append(email)
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+    return counts
+
+
+def read_csv_emails(lines, column='email'):
+    """Yield addresses from CSV ``lines``.
+
+    Uses the ``column`` header when present, otherwise the first column of
+    every row (so plain one-address-per-line files work too).
+    """
+    reader = csv.reader(lines)
+    index = 0
+    for row in reader:
+        if not row:
+            continue
+        header = [cell.strip().lower() for cell in row]
+        if column.lower() in header:
+            index = header.index(column.lower())
+        elif index < len(row):
+            yield row[index]
+        break
+    for row in reader:
+        if index < len(row):
+            yield row[index]
+
+
+def unsubscribe_token(subscriber_id):
+    """Signed token identifying a subscriber in unsubscribe links."""
+    return signing.Signer(salt=UNSUBSCRIBE_SALT).sign(str(subscriber_id))
+
+
+def subscriber_for_token(token):
+    """Return the subscriber an unsubscribe token was issued for, or None."""
+    try:
+        subscriber_id = signing.Signer(salt=UNSUBSCRIBE_SALT).unsign(token)
+    except signing.BadSignature:
+        return None
+    return NewsletterSubscriber.objects.filter(pk=subscriber_id).first()
+
+
+def unsubscribe(subscriber):
+    """Deactivate ``subscriber`` if still active."""
+    NewsletterSubscriber.objects.filter(pk=subscriber.pk, is_active=True).update(
+        is_active=False, unsubscribed_at=timezone.now(),
+    )
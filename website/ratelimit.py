@@ -0,0 +1,231 @@
+"""
+Rate limiting for Kaffero website's public write endpoints.
+
+Each policy in ``settings.RATE_LIMITS`` maps a scope to a rate such as
+``'30/m'``::
+
+    'chat': {'ip': '30/m', 'session': '20/m'}
+
+``ip`` counts requests per client address (``get_client_ip``) and
+``session`` per browser (the Django session, or the CSRF cookie for
+visitors without one). Limits use a sliding window counter: the count of
+the current fixed window plus the previous window's count weighted by how
+much of it still overlaps the last ``window`` seconds. That needs two cache
+keys per scope and one ``incr`` per request.
+
+``@rate_limit('chat')`` checks the policy before the view runs, so a
+rejected request never reaches the view's queries, Turnstile or the mail
+server; it gets a 429 with ``Retry-After``.
+
+Counters live in the ``RATE_LIMIT_CACHE`` alias, which must increment
+atomically across workers: Redis when ``REDIS_URL`` is set, otherwise
+``CounterCache``, a table in the database (three small queries per scope).
+The file cache is not suitable: its ``incr`` is a read and a rewrite, and
+one key per client address would soon have it culling other entries.
+"""
+
+import math
+import time
+from datetime import datetime, timezone as dt_timezone
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.db import connection
+from django.http import JsonResponse
+from django.shortcuts import render
+from django.utils import timezone
+
+from .models import RateLimitCounter
+
+UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def get_client_ip(request):
+    """Get client IP address from request."""
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if x_forwarded_for:
+        addresses = [address.strip() for address in x_forwarded_for.split(',')]
+        # Behind N proxies the Nth address from the right was added by our
+        # own proxy; anything further left is client-supplied
+        hops = settings.TRUSTED_PROXY_HOPS
+        ip = addresses[max(len(addresses) - hops, 0)] if hops else addresses[0]
+    else:
+        ip = request.META.get('REMOTE_ADDR')
+    return ip
+
+
+def parse_rate(rate):
+    """``'30/m'`` -> ``(30, 60)``; also accepts ``'100/10m'``."""
+    count, _, period = rate.partition('/')
+    multiplier = int(period[:-1]) if period[:-1] else 1
+    return int(count), multiplier * UNITS[period[-1]]
+
+
+def session_key(request):
+    session = getattr(request, 'session', None)
+    key = session.session_key if session is not None else None
+    return key or request.COOKIES.get(settings.CSRF_COOKIE_NAME)
+
+
+SCOPES = {
+    'ip': get_client_ip,
+    'session': session_key,
+}
+
+
+class CounterCache(BaseCache):
+    """Cache backend keeping integer counters in the ``RateLimitCounter`` table.
+
+    ``incr`` is a single ``UPDATE ... SET value = value + 1``, so concurrent
+    requests in any number of workers never lose a count, and ``add`` is an
+    ``INSERT ... ON CONFLICT`` that only replaces an expired counter. Only
+    integers can be stored. Expired rows are deleted by ``add`` at most every
+    ``CULL_INTERVAL`` seconds (an ``OPTIONS`` entry, default 300).
+    """
+
+    table = RateLimitCounter._meta.db_table
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.cull_interval = params.get('OPTIONS', {}).get('CULL_INTERVAL', 300)
+        self._culled_at = 0.0
+
+    def _now(self):
+        return connection.ops.adapt_datetimefield_value(timezone.now())
+
+    def _expires(self, timeout):
+        expires = self.get_backend_timeout(timeout)
+        if expires is None:
+            return None
+        return connection.ops.adapt_datetimefield_value(datetime.fromtimestamp(expires, tz=dt_timezone.utc))
+
+    def _execute(self, sql, params, fetch=False):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchone() if fetch else cursor.rowcount
+
+    def _upsert(self, key, value, timeout, only_expired):
+        sql = (
+            f'INSERT INTO {self.table} (cache_key, value, expires) VALUES (%s, %s, %s) '
+            f'ON CONFLICT (cache_key) DO UPDATE SET value = excluded.value, expires = excluded.expires'
+        )
+        params = [key, int(value), self._expires(timeout)]
+        if only_expired:
+            sql += f' WHERE {self.table}.expires <= %s'
+            params.append(self._now())
+        return self._execute(sql, params) > 0
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        if time.monotonic() - self._culled_at >= self.cull_interval:
+            self._culled_at = time.monotonic()
+            self._execute(f'DELETE FROM {self.table} WHERE expires <= %s', [self._now()])
+        return self._upsert(key, value, timeout, only_expired=True)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._upsert(self.make_and_validate_key(key, version=version), value, timeout, only_expired=False)
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._execute(
+            f'SELECT value FROM {self.table} WHERE cache_key = %s AND (expires IS NULL OR expires > %s)',
+            [key, self._now()], fetch=True,
+        )
+        return default if row is None else row[0]
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._execute(
+            f'UPDATE {self.table} SET value = value + %s '
+            f'WHERE cache_key = %s AND (expires IS NULL OR expires > %s) RETURNING value',
+            [delta, key, self._now()], fetch=True,
+        )
+        if row is None:
+            raise ValueError(f"Key '{key}' not found.")
+        return row[0]
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._execute(
+            f'UPDATE {self.table} SET expires = %s WHERE cache_key = %s AND (expires IS NULL OR expires > %s)',
+            [self._expires(timeout), key, self._now()],
+        ) > 0
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._execute(f'DELETE FROM {self.table} WHERE cache_key = %s', [key]) > 0
+
+    def clear(self):
+        self._execute(f'DELETE FROM {self.table}', [])
+
+
+def hit(key, limit, window, now=None):
+    """Count one request against ``key``.
+
+    Returns 0 when it is within ``limit`` requests per ``window`` seconds,
+    otherwise the seconds until the next request would be allowed.
+    """
+    cache = caches[settings.RATE_LIMIT_CACHE]
+    now = time.time() if now is None else now
+    index, elapsed = divmod(now, window)
+    current_key = f'ratelimit:{key}:{window}:{int(index)}'
+    previous_key = f'ratelimit:{key}:{window}:{int(index) - 1}'
+
+    cache.add(current_key, 0, timeout=window * 2)
+    try:
+        current = cache.incr(current_key)
+    except ValueError:
+        # Expired between add() and incr()
+        cache.set(current_key, 1, timeout=window * 2)
+        current = 1
+    previous = cache.get(previous_key, 0)
+
+    if previous * (1 - elapsed / window) + current <= limit:
+        return 0
+
+    # When will one more request fit? Within this window the previous
+    # window's weight has to shrink; if this window alone is over the limit,
+    # it becomes the "previous" window that has to shrink next.
+    if current < limit and previous:
+        wait = window * (1 - (limit - current - 1) / previous) - elapsed
+    else:
+        wait = (window - elapsed) + window * (1 - (limit - 1) / current)
+    return max(1, math.ceil(wait))
+
+
+def check(request, policy):
+    """Count ``request`` against every scope of ``policy``; returns Retry-After or 0."""
+    retry_after = 0
+    for scope, rate in settings.RATE_LIMITS.get(policy, {}).items():
+        identity = SCOPES[scope](request)
+        if not identity:
+            continue
+        limit, window = parse_rate(rate)
+        retry_after = max(retry_after, hit(f'{policy}:{scope}:{identity}', limit, window))
+    return retry_after
+
+
+def too_many_requests(request, retry_after):
+    message = f'Too many requests. Please try again in {retry_after} seconds.'
+    if request.content_type == 'application/json' or request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        response = JsonResponse({'success': False, 'error': message}, status=429)
+    else:
+        response = render(request, 'website/rate_limited.html', {'retry_after': retry_after}, status=429)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def rate_limit(policy, methods=('POST',)):
+    """Reject ``methods`` requests over the ``policy`` limits with a 429."""
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if settings.RATE_LIMIT_ENABLED and request.method in methods:
+                retry_after = check(request, policy)
+                if retry_after:
+                    return too_many_requests(request, retry_after)
+            return view(request, *args, **kwargs)
+        return wrapped
+    return decorator
@@ -0,0 +1,67 @@
+"""
+Counter tables for Kaffero website's precomputed reports.
+
+The chat analytics and demo funnel pages read small per-day tables instead
+of scanning the rows they summarize; both are kept current with
+``increment()`` (or ``increment_many()`` for bulk changes) as the rows are
+written.
+"""
+
+from django.db import connection
+
+
+def increment(model, keys, counts):
+    """Add ``counts`` to the ``model`` row identified by ``keys``, creating it if needed.
+
+    One ``INSERT ... ON CONFLICT DO UPDATE`` (SQLite 3.24+ and Postgres), so
+    concurrent writers never lose an update. ``keys`` must be the fields of
+    a unique constraint; every other column is a counter starting at 0.
+    """
+    counts = {field: value for field, value in counts.items() if value}
+    if not counts:
+        return
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    counters = [
+        field.column for field in model._meta.concrete_fields
+        if not field.primary_key and field.column not in keys
+    ]
+    values = {**keys, **{column: counts.get(column, 0) for column in counters}}
+    updates = ', '.join(f'{quote(field)} = {table}.{quote(field)} + EXCLUDED.{quote(field)}' for field in counts)
+    sql = (
+        f'INSERT INTO {table} ({", ".join(quote(column) for column in values)}) '
+        f'VALUES ({", ".join(["%s"] * len(values))}) '
+        f'ON CONFLICT ({", ".join(quote(key) for key in keys)}) DO UPDATE SET {updates}'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, list(values.values()))
+
+
+def increment_many(model, key_fields, rows):
+    """``increment()`` for many rows: ``rows`` maps key value tuples to ``{counter: value}``.
+
+    Rows go in as few multi-row upserts as the database's parameter limit
+    allows, so the statement count does not grow with the number of rows.
+    """
+    if not rows:
+        return
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    counters = [
+        field.column for field in model._meta.concrete_fields
+        if not field.primary_key and field.column not in key_fields
+    ]
+    columns = list(key_fields) + counters
+    updates = ', '.join(f'{quote(field)} = {table}.{quote(field)} + EXCLUDED.{quote(field)}' for field in counters)
+    values = [list(key) + [counts.get(column, 0) for column in counters] for key, counts in rows.items()]
+    per_statement = (connection.features.max_query_params or 10000) // len(columns)
+    placeholders = f'({", ".join(["%s"] * len(columns))})'
+    with connection.cursor() as cursor:
+        for start in range(0, len(values), per_statement):
+            chunk = values[start:start + per_statement]
+            cursor.execute(
+                f'INSERT INTO {table} ({", ".join(quote(column) for column in columns)}) '
+                f'VALUES {", ".join([placeholders] * len(chunk))} '
+                f'ON CONFLICT ({", ".join(quote(key) for key in key_fields)}) DO UPDATE SET {updates}',
+                [value for row in chunk for value in row],
+            )
@@ -0,0 +1,54 @@
+"""
+Signal handlers for Kaffero website.
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import catalog, funnel, live, site_config
+from .models import ChatMessage, ContactMessage, DemoRequest, SiteConfig
+
+
+@receiver(post_save, sender=SiteConfig)
+def site_config_saved(sender, instance, **kwargs):
+    """Publish the new configuration version to every worker."""
+    site_config.invalidate(instance.version)
+
+
+@receiver(post_delete, sender=SiteConfig)
+def site_config_deleted(sender, instance, **kwargs):
+    """Fall back to the settings defaults everywhere."""
+    site_config.invalidate()
+
+
+def catalog_changed(sender, instance, **kwargs):
+    """Have every worker reload the catalog once the change is committed."""
+    transaction.on_commit(catalog.invalidate)
+
+
+for model in catalog.MODELS:
+    post_save.connect(catalog_changed, sender=model, dispatch_uid=f'catalog_saved_{model._meta.model_name}')
+    post_delete.connect(catalog_changed, sender=model, dispatch_uid=f'catalog_deleted_{model._meta.model_name}')
+
+
+@receiver(post_save, sender=DemoRequest)
+def demo_request_created(sender, instance, created, **kwargs):
+    """Start new demo requests in the funnel and push them to open dashboards."""
+    if created:
+        funnel.record(instance, '', instance.status, at=instance.created_at)
+        live.publish('demo', instance)
+
+
+@receiver(post_save, sender=ContactMessage)
+def contact_message_created(sender, instance, created, **kwargs):
+    """Push new contact messages to open dashboards."""
+    if created:
+        live.publish('contact', instance)
+
+
+@receiver(post_save, sender=ChatMessage)
+def chat_message_created(sender, instance, created, **kwargs):
+    """Push visitor chat messages (not bot replies) to open dashboards."""
+    if created and instance.role == ChatMessage.Role.USER:
+        live.publish('chat', instance)
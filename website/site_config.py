@@ -0,0 +1,134 @@
+"""
+Process-local snapshot of the site configuration.
+
+Every template render needs the site settings, so each worker keeps an
+immutable, fully derived copy of the ``SiteConfig`` row in memory. A version
+number stored in the shared cache tells workers when another process has
+saved a new configuration; the cache is consulted at most once every
+``SITE_CONFIG_CHECK_INTERVAL`` seconds.
+
+Stored pricing that does not validate (saved before validation existed, or
+edited outside the dashboard) is replaced by ``settings.PRICING`` in the
+snapshot, so it cannot break every page.
+"""
+
+import logging
+import re
+import time
+from types import MappingProxyType
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError
+
+from .models import SiteConfig, validate_pricing
+
+logger = logging.getLogger(__name__)
+
+VERSION_CACHE_KEY = 'site_config:version'
+
+_snapshot = None
+_version = None
+_checked_at = 0.0
+
+
+def format_inr(amount):
+    """Format a number with Indian digit grouping, e.g. 125000 -> 1,25,000."""
+    amount = int(round(amount))
+    digits = str(abs(amount))
+    if len(digits) > 3:
+        head, tail = digits[:-3], digits[-3:]
+        groups = []
+        while len(head) > 2:
+            groups.insert(0, head[-2:])
+            head = head[:-2]
+        groups.insert(0, head)
+        digits = ','.join(groups) + ',' + tail
+    return f"-{digits}" if amount < 0 else digits
+
+
+def _build_pricing(pricing, renewal_percent):
+    """Freeze pricing plans, adding display and renewal values to each."""
+    plans = {}
+    for key, plan in pricing.items():
+        plan = dict(plan)
+        price = plan['price']
+        renewal_price = price * renewal_percent / 100
+        plan['price_display'] = format_inr(price)
+        plan['renewal_price'] = renewal_price
+        plan['renewal_price_display'] = format_inr(renewal_price)
+        plan['features'] = tuple(plan.get('features', ()))
+        plans[key] = MappingProxyType(plan)
+    return MappingProxyType(plans)
+
+
+def build_snapshot(config):
+    """Build the immutable template context for a ``SiteConfig`` instance."""
+    pricing = config.pricing
+    try:
+        validate_pricing(pricing)
+    except ValidationError:
+        logger.exception('Invalid pricing in the site configuration; using the default plans')
+        pricing = settings.PRICING
+    return MappingProxyType({
+        'site_name': config.site_name,
+        'site_tagline': config.site_tagline,
+        'site_description': config.site_description,
+        'company_name': config.company_name,
+        'company_email': config.company_email,
+        'company_phone': config.company_phone,
+        'company_whatsapp': config.company_whatsapp,
+        # Clean version for wa.me links (remove +, spaces, dashes)
+        'company_whatsapp_url': re.sub(r'[^\d]', '', config.company_whatsapp),
+        'company_address': config.company_address,
+        'social_linkedin': config.social_linkedin,
+        'social_instagram': config.social_instagram,
+        'social_facebook': config.social_facebook,
+        'social_youtube': config.social_youtube,
+        'pricing': _build_pricing(pricing, config.renewal_fee_percent),
+        'renewal_fee_percent': config.renewal_fee_percent,
+        'turnstile_site_key': settings.TURNSTILE_SITE_KEY,
+    })
+
+
+def _load():
+    """Read the configuration row, falling back to settings if unavailable."""
+    try:
+        config = SiteConfig.objects.filter(pk=1).first()
+    except DatabaseError:
+        # Table not migrated yet; serve the settings defaults.
+        config = None
+    if config is None:
+        config = SiteConfig(**SiteConfig.defaults())
+    return config
+
+
+def get_site_config():
+    """Return the current configuration snapshot for this process."""
+    global _snapshot, _version, _checked_at
+
+    now = time.monotonic()
+    if _snapshot is not None and now - _checked_at < settings.SITE_CONFIG_CHECK_INTERVAL:
+        return _snapshot
+
+    shared_version = cache.get(VERSION_CACHE_KEY)
+    if _snapshot is None or shared_version != _version:
+        config = _load()
+        _snapshot = build_snapshot(config)
+        _version = config.version
+        if shared_version is None:
+            cache.add(VERSION_CACHE_KEY, _version, timeout=None)
+    _checked_at = now
+    return _snapshot
+
+
+def invalidate(version=None):
+    """Drop this process's snapshot and publish ``version`` to other workers."""
+    global _snapshot, _version
+    _snapshot = None
+    _version = None
+    if version is not None:
+        cache.set(VERSION_CACHE_KEY, version, timeout=None)
+    else:
+        cache.delete(VERSION_CACHE_KEY)
@@ -0,0 +1,124 @@
+"""
+Local spam scoring for the demo and contact forms.
+
+``check()`` runs before ``verify_turnstile`` so obvious junk is turned away
+without the Turnstile round-trip (and without a database write or email).
+Each rule is a function registered with ``@rule(weight)`` that looks at the
+submitted data; a submission whose rule weights add up to
+``SPAM_REJECT_SCORE`` is rejected. Everything else still goes through
+Turnstile as before.
+
+Two form fields feed the rules:
+
+- ``website``, a honeypot hidden from people but not from form-filling bots
+- ``rendered_at``, a signed timestamp set when the form was rendered, so
+  submissions made faster than a person could type are caught
+
+Outcomes and rule hits are counted in the request metrics
+(``kaffero_spam_checks_total`` / ``kaffero_spam_rule_hits_total``).
+"""
+
+import re
+import time
+
+from django.conf import settings
+from django.core import signing
+
+from .metrics import registry
+
+HONEYPOT_FIELD = 'website'
+TIMESTAMP_FIELD = 'rendered_at'
+TIMESTAMP_SALT = 'website.spam.rendered_at'
+
+# Fields holding free text, and fields that should never contain a link
+TEXT_FIELDS = ('message',)
+NAME_FIELDS = ('name', 'contact_name', 'cafe_name', 'city')
+
+URL_RE = re.compile(r'(?:https?://|www\.)\S+', re.I)
+MARKUP_LINK_RE = re.compile(r'<a\s[^>]*href|\[url[=\]]', re.I)
+# Digits with optional +, spaces, dashes, dots and parentheses
+PHONE_RE = re.compile(r'^\+?[\d\s().-]{7,20}$')
+
+RULES = []
+
+
+def rule(weight):
+    """Register ``func(form_name, data, now)`` as a rule worth ``weight``."""
+    def register(func):
+        RULES.append((func.__name__, weight, func))
+        return func
+    return register
+
+
+def form_token(form_name):
+    """Signed render timestamp for ``form_name``'s ``rendered_at`` field."""
+    return signing.Signer(salt=TIMESTAMP_SALT).sign(f'{form_name}:{int(time.time())}')
+
+
+def form_age(form_name, token, now=None):
+    """Seconds since ``token`` was issued for ``form_name``, or None if invalid."""
+    try:
+        value = signing.Signer(salt=TIMESTAMP_SALT).unsign(token or '')
+    except signing.BadSignature:
+        return None
+    name, _, issued = value.rpartition(':')
+    if name != form_name or not issued.isdigit():
+        return None
+    return (time.time() if now is None else now) - int(issued)
+
+
+@rule(weight=10)
+def honeypot(form_name, data, now):
+    return bool(data.get(HONEYPOT_FIELD))
+
+
+@rule(weight=2)
+def missing_timestamp(form_name, data, now):
+    return form_age(form_name, data.get(TIMESTAMP_FIELD), now) is None
+
+
+@rule(weight=5)
+def too_fast(form_name, data, now):
+    age = form_age(form_name, data.get(TIMESTAMP_FIELD), now)
+    return age is not None and age < settings.SPAM_MIN_SUBMIT_SECONDS
+
+
+@rule(weight=5)
+def link_stuffing(form_name, data, now):
+    return sum(len(URL_RE.findall(data.get(field, ''))) for field in TEXT_FIELDS) >= 3
+
+
+@rule(weight=2)
+def has_link(form_name, data, now):
+    return any(URL_RE.search(data.get(field, '')) for field in TEXT_FIELDS)
+
+
+@rule(weight=5)
+def link_in_name(form_name, data, now):
+    return any(URL_RE.search(data.get(field, '')) for field in NAME_FIELDS)
+
+
+@rule(weight=5)
+def markup_link(form_name, data, now):
+    return any(MARKUP_LINK_RE.search(data.get(field, '')) for field in TEXT_FIELDS + NAME_FIELDS)
+
+
+@rule(weight=3)
+def invalid_phone(form_name, data, now):
+    phone = data.get('phone', '').strip()
+    return bool(phone) and not PHONE_RE.match(phone)
+
+
+def score(form_name, data):
+    """Return ``(score, names of the rules that matched)``."""
+    now = time.time()
+    hits = [(name, weight) for name, weight, func in RULES if func(form_name, data, now)]
+    return sum(weight for name, weight in hits), [name for name, weight in hits]
+
+
+def check(form_name, data):
+    """Score a submission and count the outcome; True if it should be rejected."""
+    total, hits = score(form_name, data)
+    rejected = total >= settings.SPAM_REJECT_SCORE
+    registry.count_spam_check(form_name, 'rejected' if rejected else 'passed', hits)
+    return rejected
@@ -0,0 +1,81 @@
+"""
+Background tasks for Kaffero website, run by ``manage.py runworkers``.
+
+Each email is its own job, so a retry after a failure never sends the
+others twice.
+"""
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+
+from . import demo_expiry
+from .emails import render_email
+from .jobs import periodic, task
+from .models import ContactMessage, DemoRequest
+
+
+def send_html_email(subject, template_name, context, to_email, from_email=None):
+    """Send an HTML email with its plain text part; raises if sending fails."""
+    # Static chrome and its text version are prepared once per template
+    html_content, text_content = render_email(template_name, context)
+    email = EmailMultiAlternatives(
+        subject=subject,
+        body=text_content,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=[to_email] if isinstance(to_email, str) else to_email,
+    )
+    email.attach_alternative(html_content, 'text/html')
+    email.send(fail_silently=False)
+
+
+@task
+def send_demo_email(demo_id, recipient):
+    """Email the team (``recipient='admin'``) or the requester about a demo request."""
+    demo_request = DemoRequest.objects.filter(pk=demo_id).first()
+    if demo_request is None:
+        return
+    context = {'demo_request': demo_request}
+    if recipient == 'admin':
+        send_html_email(
+            subject=f'New Demo Request: {demo_request.cafe_name}',
+            template_name='emails/admin_demo_notification.html',
+            context=context,
+            to_email=settings.ADMIN_EMAIL,
+        )
+    elif demo_request.email:
+        send_html_email(
+            subject=f'Demo Request Confirmed - {demo_request.cafe_name}',
+            template_name='emails/demo_confirmation.html',
+            context=context,
+            to_email=demo_request.email,
+        )
+
+
+@task
+def send_contact_email(message_id, recipient):
+    """Email the team (``recipient='admin'``) or the sender about a contact message."""
+    contact_message = ContactMessage.objects.filter(pk=message_id).first()
+    if contact_message is None:
+        return
+    context = {'contact': contact_message}
+    if recipient == 'admin':
+        send_html_email(
+            subject=f'Contact Form: {contact_message.get_subject_display()}',
+            template_name='emails/admin_contact_notification.html',
+            context=context,
+            to_email=settings.ADMIN_EMAIL,
+        )
+    else:
+        send_html_email(
+            subject='We received your message - Kaffero',
+            template_name='emails/contact_confirmation.html',
+            context=context,
+            to_email=contact_message.email,
+        )
+
+
+@periodic(settings.DEMO_EXPIRY_INTERVAL)
+def expire_demos():
+    """Expire the demos that have ended and send their follow-ups (as ``manage.py expire_demos``)."""
+    demo_expiry.sweep()
+    demo_expiry.send_notices()
@@ -1,3 +1,1627 @@
-from django.test import TestCase
+"""
+Tests for Kaffero website.
+"""
 
-# Create your tests here.
+import csv
+import gc
+import importlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail, signing
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, connection, router
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import (
+    DemoRequest, ContactMessage, NewsletterSubscriber,
+    Testimonial, FAQ, Feature, Screenshot, BlogPost,
+    ChatArchive, ChatConversation, ChatMessage, SiteConfig, Campaign, CampaignRecipient,
+    ChatDailyStats, ChatIntentDaily, DemoFunnelDaily, DemoStatusChange, Job
+)
+from . import (
+    bulk, campaigns, catalog, chat_analytics, chat_archive, db_routing, demo_expiry, emails, exports, faq_search,
+    funnel, jobs, leads, live, newsletter, ratelimit, site_config, spam, tasks,
+)
+from . import metrics as request_metrics
+from .management.commands import prestart
+from .newsletter import unsubscribe_token
+from .site_config import get_site_config
+from .views import get_chatbot_response
+
+
+# Maximum queries per view. Every view is measured at each of
+# QUERY_BUDGET_SCALES and must issue the same number of queries at all of
+# them, so a budget can only be met by a view whose cost does not grow
+# with the number of rows.
+PUBLIC_BUDGETS = {
+    'home': 0,
+    'features': 0,
+    'feature_detail': 0,
+    'pricing': 0,
+    'demo': 0,
+    'demo_thank_you': 1,
+    'about': 0,
+    'contact': 0,
+    'faq': 0,
+    'blog_list': 1,
+    'blog_detail': 1,
+    'privacy': 0,
+    'terms': 0,
+    'robots_txt': 0,
+    'sitemap_xml': 1,
+    'newsletter_unsubscribe': 1,
+}
+
+# Authenticated views pay two extra queries for the session and user.
+DASHBOARD_BUDGETS = {
+    'dashboard:login': 2,
+    'dashboard:home': 12,
+    'dashboard:demo_list': 4,
+    'dashboard:demo_export': 3,
+    'dashboard:demo_detail': 3,
+    'dashboard:demo_funnel': 6,
+    'dashboard:message_list': 4,
+    'dashboard:message_export': 3,
+    'dashboard:message_detail': 3,
+    'dashboard:blog_list': 4,
+    'dashboard:blog_create': 2,
+    'dashboard:blog_edit': 3,
+    'dashboard:feature_list': 3,
+    'dashboard:feature_create': 2,
+    'dashboard:feature_edit': 3,
+    'dashboard:screenshot_list': 3,
+    'dashboard:screenshot_create': 2,
+    'dashboard:screenshot_edit': 3,
+    'dashboard:testimonial_list': 3,
+    'dashboard:testimonial_create': 2,
+    'dashboard:testimonial_edit': 3,
+    'dashboard:faq_list': 3,
+    'dashboard:faq_create': 2,
+    'dashboard:faq_edit': 3,
+    'dashboard:subscriber_list': 4,
+    'dashboard:subscriber_export': 3,
+    'dashboard:campaign_list': 3,
+    'dashboard:campaign_create': 2,
+    'dashboard:campaign_detail': 5,
+    'dashboard:campaign_edit': 3,
+    'dashboard:chat_list': 4,
+    'dashboard:chat_export': 5,
+    'dashboard:chat_detail': 4,
+    'dashboard:chat_messages': 4,
+    'dashboard:chat_analytics': 4,
+    'dashboard:site_settings': 3,
+    'dashboard:metrics': 2,
+}
+
+# Form submissions and other writes
+WRITE_BUDGETS = {
+    'demo [POST]': 7,
+    'contact [POST]': 5,
+    'newsletter_subscribe [POST]': 1,
+    'chatbot_message [POST]': 6,
+    'dashboard:demo_detail [POST]': 9,
+    'dashboard:message_detail [POST]': 4,
+    'dashboard:chat_detail [POST]': 5,
+    'dashboard:demo_bulk [POST]': 9,
+    'dashboard:message_bulk [POST]': 6,
+    'dashboard:subscriber_bulk [POST]': 6,
+    'dashboard:chat_bulk [POST]': 9,
+}
+
+QUERY_BUDGET_SCALES = (1, 40)
+
+
+@override_settings(SITE_CONFIG_CHECK_INTERVAL=3600)
+class SiteConfigTests(TestCase):
+    """The snapshot is derived once and replaced when the row is saved."""
+
+    def setUp(self):
+        site_config.invalidate()
+
+    def test_build_snapshot(self):
+        config = SiteConfig(**SiteConfig.defaults())
+        config.company_whatsapp = '+91 98956-63498'
+        config.pricing = {'basic': {'name': 'Basic', 'price': 125000, 'features': ['Orders']}}
+        config.renewal_fee_percent = 20
+        snapshot = site_config.build_snapshot(config)
+
+        self.assertEqual(snapshot['company_whatsapp_url'], '919895663498')
+        plan = snapshot['pricing']['basic']
+        self.assertEqual(plan['price_display'], '1,25,000')
+        self.assertEqual(plan['renewal_price'], 25000)
+        self.assertEqual(plan['renewal_price_display'], '25,000')
+        self.assertEqual(plan['features'], ('Orders',))
+        with self.assertRaises(TypeError):
+            snapshot['site_name'] = 'Changed'
+
+    def test_save_invalidates_snapshot(self):
+        config = SiteConfig.load()
+        before = get_site_config()
+        with self.assertNumQueries(0):
+            self.assertIs(get_site_config(), before)
+
+        config.site_name = 'Kaffero Cloud'
+        config.save()
+        self.assertEqual(get_site_config()['site_name'], 'Kaffero Cloud')
+
+        # A worker still holding the old snapshot reloads on its next check
+        site_config._snapshot, site_config._version, site_config._checked_at = before, config.version - 1, 0.0
+        self.assertEqual(get_site_config()['site_name'], 'Kaffero Cloud')
+
+
+    def post_settings(self, pricing):
+        user, created = User.objects.get_or_create(username='staff', defaults={'is_staff': True})
+        self.client.force_login(user)
+        data = {field: value for field, value in SiteConfig.defaults().items() if isinstance(value, str)}
+        return self.client.post(reverse('dashboard:site_settings'), {
+            **data, 'pricing': json.dumps(pricing), 'renewal_fee_percent': 25,
+        }, follow=True)
+
+    def test_invalid_pricing_is_rejected(self):
+        bad = {
+            'not a dict': [1, 2],
+            'plan not a dict': {'starter': 'cheap'},
+            'non-numeric price': {'starter': {'price': 'a lot', 'features': []}},
+            'features not a list': {'starter': {'price': 100, 'features': 'Orders'}},
+        }
+        for case, pricing in bad.items():
+            with self.subTest(case):
+                response = self.post_settings(pricing)
+                self.assertEqual(response.redirect_chain, [])
+                self.assertContains(response, 'Pricing: ')
+        self.assertEqual(SiteConfig.load().pricing, settings.PRICING)
+        self.assertEqual(self.client.get(reverse('home')).status_code, 200)
+
+    def test_edited_pricing_reaches_chatbot(self):
+        pricing = {'solo': {'name': 'Solo', 'price': 45000, 'outlets': 1, 'support': '1 year', 'features': []}}
+        self.assertRedirects(self.post_settings(pricing), reverse('dashboard:site_settings'))
+        reply = get_chatbot_response('How much does it cost?', None)
+        self.assertIn('**Solo**: ₹45,000 (1 outlet)', reply)
+        self.assertIn('renewal is 25% of license', reply)
+
+    def test_bad_stored_pricing_falls_back_to_defaults(self):
+        SiteConfig.load()
+        SiteConfig.objects.filter(pk=1).update(pricing=[1, 2], version=99)
+        with self.assertLogs('website.site_config', 'ERROR'):
+            self.assertEqual(set(get_site_config()['pricing']), set(settings.PRICING))
+        self.assertEqual(self.client.get(reverse('home')).status_code, 200)
+
+
+@override_settings(
+    TURNSTILE_SECRET_KEY='',
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    SITE_CONFIG_CHECK_INTERVAL=3600,
+    CATALOG_CHECK_INTERVAL=3600,
+)
+class QueryBudgetTests(TestCase):
+    """Per-view query budgets that must hold at every data scale."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('staff', password='password', is_staff=True)
+        SiteConfig.load()
+        for i in range(3):
+            Feature.objects.create(
+                name=f'Feature {i}', slug=f'feature-{i}', short_description='Short',
+                full_description='Full', icon='✨', order=i, is_highlighted=True,
+            )
+            FAQ.objects.create(question=f'Question {i}?', answer='Answer', category=FAQ.Category.values[i])
+            Screenshot.objects.create(title=f'Screenshot {i}', image=f'screenshots/{i}.png', order=i)
+            Testimonial.objects.create(
+                name=f'Owner {i}', role='Owner', cafe_name=f'Cafe {i}', city='Kochi',
+                content='Great', is_featured=True,
+            )
+        BlogPost.objects.create(
+            title='Post', slug='post', excerpt='Excerpt', content='Content',
+            status=BlogPost.Status.PUBLISHED,
+        )
+        Campaign.objects.create(subject='Campaign', body='<p>Hello</p>')
+
+    def setUp(self):
+        # Load the site settings, catalog and FAQ index outside of any measured request
+        get_site_config()
+        catalog.invalidate()
+        faq_search.get_index()
+
+    def grow(self, scale):
+        """Bring each lead and chat table to roughly ``scale`` rows."""
+        # Measure cached pages cold at every scale
+        cache.clear()
+        missing = scale - DemoRequest.objects.count()
+        if missing > 0:
+            call_command(
+                'generate_scale_data', demos=missing, messages=missing, subscribers=missing,
+                chats=missing, chat_turns=3, seed=scale, verbosity=0,
+            )
+        for i in range(BlogPost.objects.count(), scale):
+            BlogPost.objects.create(
+                title=f'Post {i}', slug=f'post-{i}', excerpt='Excerpt', content='Content',
+                status=BlogPost.Status.PUBLISHED,
+            )
+
+    def url_kwargs(self, name):
+        kwargs = {
+            'feature_detail': {'slug': 'feature-0'},
+            'blog_detail': {'slug': 'post'},
+            'demo_thank_you': {'pk': DemoRequest.objects.values_list('pk', flat=True).first()},
+            'dashboard:demo_detail': {'pk': DemoRequest.objects.values_list('pk', flat=True).first()},
+            'dashboard:message_detail': {'pk': ContactMessage.objects.values_list('pk', flat=True).first()},
+            'dashboard:blog_edit': {'pk': BlogPost.objects.values_list('pk', flat=True).first()},
+            'dashboard:feature_edit': {'pk': Feature.objects.values_list('pk', flat=True).first()},
+            'dashboard:screenshot_edit': {'pk': Screenshot.objects.values_list('pk', flat=True).first()},
+            'dashboard:testimonial_edit': {'pk': Testimonial.objects.values_list('pk', flat=True).first()},
+            'dashboard:faq_edit': {'pk': FAQ.objects.values_list('pk', flat=True).first()},
+            'dashboard:chat_detail': {'pk': ChatConversation.objects.values_list('pk', flat=True).first()},
+            'dashboard:chat_messages': {'pk': ChatConversation.objects.values_list('pk', flat=True).first()},
+            'dashboard:campaign_detail': {'pk': Campaign.objects.values_list('pk', flat=True).first()},
+            'dashboard:campaign_edit': {'pk': Campaign.objects.values_list('pk', flat=True).first()},
+            'newsletter_unsubscribe': {
+                'token': unsubscribe_token(NewsletterSubscriber.objects.values_list('pk', flat=True).first()),
+            },
+        }
+        return kwargs.get(name, {})
+
+    def write_requests(self):
+        """Return ``{label: callable}`` performing one write request each."""
+        demo_pk = DemoRequest.objects.values_list('pk', flat=True).first()
+        # Every run changes the status, so every run logs a transition
+        DemoRequest.objects.filter(pk=demo_pk).update(status=DemoRequest.Status.PENDING)
+        message = ContactMessage.objects.first()
+        message.is_read = False
+        message.save()
+        chat = ChatConversation.objects.first()
+        self.session_counter = getattr(self, 'session_counter', 0) + 1
+        session_id = f'budget-{self.session_counter}'
+        ChatConversation.objects.create(session_id=session_id)
+
+        # Bulk actions over a few rows of each list; the rows are reset so
+        # every run changes them
+        demo_ids = list(DemoRequest.objects.values_list('pk', flat=True)[:5])
+        DemoRequest.objects.filter(pk__in=demo_ids).update(status=DemoRequest.Status.PENDING)
+        message_ids = list(ContactMessage.objects.values_list('pk', flat=True)[:5])
+        ContactMessage.objects.filter(pk__in=message_ids).update(is_read=False)
+        subscriber_ids = list(NewsletterSubscriber.objects.values_list('pk', flat=True)[:5])
+        NewsletterSubscriber.objects.filter(pk__in=subscriber_ids).update(is_active=True)
+        spam_ids = []
+        for i in range(3):
+            spam = ChatConversation.objects.create(session_id=f'{session_id}-spam-{i}')
+            ChatMessage.objects.create(conversation=spam, role=ChatMessage.Role.USER, content='buy now')
+            spam_ids.append(spam.pk)
+
+        return {
+            'demo [POST]': lambda: self.client.post(reverse('demo'), {
+                'cafe_name': 'Budget Cafe', 'city': 'Kochi', 'contact_name': 'Tester',
+                'phone': '+91 98765 43210', 'email': 'budget@example.com', 'source': 'google',
+                'privacy_agreed': 'on', 'cf-turnstile-response': 'token',
+            }),
+            'contact [POST]': lambda: self.client.post(reverse('contact'), {
+                'name': 'Tester', 'email': 'budget@example.com', 'subject': 'general',
+                'message': 'Hello', 'cf-turnstile-response': 'token',
+            }),
+            'newsletter_subscribe [POST]': lambda: self.client.post(reverse('newsletter_subscribe'), {
+                'email': f'budget{self.session_counter}@example.com',
+            }),
+            'chatbot_message [POST]': lambda: self.client.post(
+                reverse('chatbot_message'),
+                json.dumps({'message': 'call me on 9876543210 or a@b.com', 'session_id': session_id}),
+                content_type='application/json',
+            ),
+            'dashboard:demo_detail [POST]': lambda: self.client.post(
+                reverse('dashboard:demo_detail', kwargs={'pk': demo_pk}),
+                {'status': 'contacted', 'notes': 'Called'},
+            ),
+            'dashboard:message_detail [POST]': lambda: self.client.post(
+                reverse('dashboard:message_detail', kwargs={'pk': message.pk}),
+                {'mark_replied': '1'},
+            ),
+            'dashboard:chat_detail [POST]': lambda: self.client.post(
+                reverse('dashboard:chat_detail', kwargs={'pk': chat.pk}),
+                {'save_notes': '1', 'admin_notes': 'Follow up', 'visitor_name': 'Visitor'},
+            ),
+            'dashboard:demo_bulk [POST]': lambda: self.client.post(
+                reverse('dashboard:demo_bulk'), {'action': 'status:demo_created', 'ids': demo_ids},
+            ),
+            'dashboard:message_bulk [POST]': lambda: self.client.post(
+                reverse('dashboard:message_bulk'), {'action': 'read', 'ids': message_ids},
+            ),
+            'dashboard:subscriber_bulk [POST]': lambda: self.client.post(
+                reverse('dashboard:subscriber_bulk'), {'action': 'unsubscribe', 'ids': subscriber_ids},
+            ),
+            'dashboard:chat_bulk [POST]': lambda: self.client.post(
+                reverse('dashboard:chat_bulk'), {'action': 'delete', 'ids': spam_ids},
+            ),
+        }
+
+    def capture(self, func):
+        with CaptureQueriesContext(connection) as context:
+            response = func()
+            if response.streaming:
+                # Streamed responses run their queries while being consumed
+                b''.join(response.streaming_content)
+        self.assertLess(response.status_code, 400, f'{response.status_code} response')
+        return context.captured_queries
+
+    def format_queries(self, queries):
+        return '\n'.join(f"  {i}. {query['sql']}" for i, query in enumerate(queries, 1))
+
+    def check_budgets(self, requests_by_label, budgets):
+        """Run each request at every scale and compare against its budget."""
+        counts = {label: {} for label in budgets}
+        captured = {}
+        for scale in QUERY_BUDGET_SCALES:
+            self.grow(scale)
+            for label, func in requests_by_label().items():
+                queries = self.capture(func)
+                counts[label][scale] = len(queries)
+                captured[label, scale] = queries
+
+        for label, budget in budgets.items():
+            with self.subTest(view=label):
+                by_scale = counts[label]
+                worst = max(by_scale, key=by_scale.get)
+                queries = captured[label, worst]
+                self.assertLessEqual(
+                    by_scale[worst], budget,
+                    f'{label} ran {by_scale[worst]} queries at scale {worst} '
+                    f'(budget {budget}):\n{self.format_queries(queries)}',
+                )
+                self.assertEqual(
+                    len(set(by_scale.values())), 1,
+                    f'{label} query count grows with data {by_scale}; at scale {worst}:\n'
+                    f'{self.format_queries(queries)}',
+                )
+
+    def get_requests(self, names):
+        def build():
+            urls = {name: reverse(name, kwargs=self.url_kwargs(name)) for name in names}
+            return {name: (lambda url=url: self.client.get(url)) for name, url in urls.items()}
+        return build
+
+    def test_public_view_budgets(self):
+        self.check_budgets(self.get_requests(PUBLIC_BUDGETS), PUBLIC_BUDGETS)
+
+    def test_dashboard_view_budgets(self):
+        self.client.force_login(self.user)
+        self.check_budgets(self.get_requests(DASHBOARD_BUDGETS), DASHBOARD_BUDGETS)
+
+    def test_write_budgets(self):
+        self.client.force_login(self.user)
+        self.check_budgets(self.write_requests, WRITE_BUDGETS)
+
+
+@override_settings(
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    NEWSLETTER_SEND_RATE=0,
+    NEWSLETTER_DAILY_QUOTA=0,
+)
+class CampaignSendTests(TestCase):
+    """Each subscriber gets a campaign at most once, across reruns."""
+
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(5):
+            NewsletterSubscriber.objects.create(email=f'reader{i}@example.com')
+        NewsletterSubscriber.objects.create(email='gone@example.com', is_active=False)
+
+    def setUp(self):
+        self.campaign = Campaign.objects.create(subject='News', body='<p>Hello</p>')
+
+    def test_sends_once_per_active_subscriber(self):
+        counts = campaigns.send_campaign(self.campaign, batch_size=2)
+        self.assertEqual(counts['sent'], 5)
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), [f'reader{i}@example.com' for i in range(5)])
+        self.assertIn('/newsletter/unsubscribe/', mail.outbox[0].extra_headers['List-Unsubscribe'])
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.status, Campaign.Status.SENT)
+
+        # A rerun has nothing left to send
+        self.assertEqual(campaigns.send_campaign(self.campaign)['sent'], 0)
+        self.assertEqual(len(mail.outbox), 5)
+
+    def test_interrupted_recipients_are_not_resent(self):
+        campaigns.queue_recipients(self.campaign)
+        campaigns.claim_batch(self.campaign, 2)  # process died mid-batch
+        Campaign.objects.filter(pk=self.campaign.pk).update(status=Campaign.Status.SENDING)
+        self.campaign.refresh_from_db()
+
+        # Claimed moments ago: another sender's batch in flight, left alone
+        counts = campaigns.send_campaign(self.campaign)
+        self.assertEqual((counts['sent'], counts['interrupted']), (3, 0))
+        self.assertEqual(self.campaign.recipients.filter(status=CampaignRecipient.Status.SENDING).count(), 2)
+
+        self.campaign.recipients.filter(status=CampaignRecipient.Status.SENDING).update(
+            claimed_at=timezone.now() - timedelta(seconds=settings.NEWSLETTER_SEND_LEASE_SECONDS + 1),
+        )
+        counts = campaigns.send_campaign(self.campaign)
+        self.assertEqual((counts['sent'], counts['interrupted']), (0, 2))
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_daily_quota_pauses_campaign(self):
+        counts = campaigns.send_campaign(self.campaign, daily_quota=3)
+        self.assertEqual(counts['sent'], 3)
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.status, Campaign.Status.PAUSED)
+        self.assertEqual(
+            self.campaign.recipients.filter(status=CampaignRecipient.Status.PENDING).count(), 2,
+        )
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_unsubscribed_while_paused_are_skipped(self):
+        campaigns.send_campaign(self.campaign, daily_quota=3)
+        NewsletterSubscriber.objects.filter(email='reader4@example.com').update(is_active=False)
+        mail.outbox.clear()
+
+        counts = campaigns.send_campaign(self.campaign)
+        self.assertEqual(counts['sent'], 1)
+        self.assertEqual([m.to[0] for m in mail.outbox], ['reader3@example.com'])
+        self.assertEqual(self.campaign.recipients.get(email='reader4@example.com').status, 'skipped')
+
+    def test_form_requires_subject_and_body(self):
+        self.client.force_login(User.objects.create_user('staff', password='password', is_staff=True))
+        response = self.client.post(reverse('dashboard:campaign_create'), {'body': '<p>Hi</p>'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'This field cannot be blank.')
+        self.assertContains(response, '&lt;p&gt;Hi&lt;/p&gt;')
+
+        url = reverse('dashboard:campaign_edit', kwargs={'pk': self.campaign.pk})
+        self.assertEqual(self.client.post(url, {'subject': 'Update'}).status_code, 200)
+        self.campaign.refresh_from_db()
+        self.assertEqual((self.campaign.subject, Campaign.objects.count()), ('News', 1))
+
+    def test_unsubscribe_link(self):
+        subscriber = NewsletterSubscriber.objects.get(email='reader0@example.com')
+        url = reverse('newsletter_unsubscribe', kwargs={'token': unsubscribe_token(subscriber.pk)})
+        self.client.post(url)
+        subscriber.refresh_from_db()
+        self.assertFalse(subscriber.is_active)
+        self.assertEqual(self.client.get(url[:-3] + 'xx/').context['subscriber'], None)
+
+
+class NewsletterTests(TestCase):
+    """Signups and imports are single upserts on the case-insensitive email index."""
+
+    def test_subscribe(self):
+        self.assertEqual(newsletter.subscribe(' Anu@Example.com '), newsletter.CREATED)
+        subscriber = NewsletterSubscriber.objects.get()
+        self.assertEqual(subscriber.email, 'anu@example.com')
+        self.assertEqual(newsletter.subscribe('ANU@example.com'), newsletter.ALREADY_ACTIVE)
+
+        newsletter.unsubscribe(subscriber)
+        subscriber.refresh_from_db()
+        self.assertIsNotNone(subscriber.unsubscribed_at)
+        self.assertEqual(newsletter.subscribe('anu@example.com'), newsletter.REACTIVATED)
+        subscriber.refresh_from_db()
+        self.assertTrue(subscriber.is_active)
+        self.assertIsNone(subscriber.unsubscribed_at)
+        self.assertEqual(NewsletterSubscriber.objects.count(), 1)
+
+        # Rows stored before addresses were normalized still conflict
+        NewsletterSubscriber.objects.filter(pk=subscriber.pk).update(email='Anu@Example.com')
+        self.assertEqual(newsletter.subscribe('anu@example.com'), newsletter.ALREADY_ACTIVE)
+        self.assertEqual(NewsletterSubscriber.objects.count(), 1)
+
+    def test_import_in_batches(self):
+        NewsletterSubscriber.objects.create(email='old@example.com', is_active=False)
+        NewsletterSubscriber.objects.create(email='kept@example.com')
+        emails = [f'reader{i}@example.com' for i in range(7)]
+        emails += ['Old@Example.com', 'kept@example.com', 'READER0@example.com', 'not-an-email']
+
+        # Three addresses per statement fit in ten parameters
+        with mock.patch.object(connection.features, 'max_query_params', 10), \
+                CaptureQueriesContext(connection) as queries:
+            counts = newsletter.import_emails(emails)
+        self.assertEqual(counts, {'added': 7, 'existing': 2, 'invalid': 1})
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('INSERT')]), 3)
+        self.assertFalse(NewsletterSubscriber.objects.get(email='old@example.com').is_active)
+        self.assertEqual(NewsletterSubscriber.objects.count(), 9)
+
+        counts = newsletter.import_emails(['old@example.com', 'kept@example.com'], reactivate=True)
+        self.assertEqual(counts, {'added': 1, 'existing': 1, 'invalid': 0})
+        old = NewsletterSubscriber.objects.get(email='old@example.com')
+        self.assertTrue(old.is_active)
+        self.assertIsNone(old.unsubscribed_at)
+
+    def test_read_csv_emails(self):
+        with_header = ['name,Email\n', 'Anu,anu@example.com\n', '\n', 'Rahul,rahul@example.com\n', 'Short\n']
+        self.assertEqual(list(newsletter.read_csv_emails(with_header)), ['anu@example.com', 'rahul@example.com'])
+        plain = ['anu@example.com\n', 'rahul@example.com,ignored\n']
+        self.assertEqual(list(newsletter.read_csv_emails(plain)), ['anu@example.com', 'rahul@example.com'])
+
+
+class ExportTests(TestCase):
+    """Exports stream the rows the list filters select."""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('staff', password='password', is_staff=True))
+
+    def download(self, name, **params):
+        response = self.client.get(reverse(f'dashboard:{name}_export'), params)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_demo_csv(self):
+        demo = {'city': 'Kochi', 'num_tables': 5, 'contact_name': 'Anu', 'phone': '+919876543210'}
+        pending = DemoRequest.objects.create(cafe_name='Brew, "Co"', **demo)
+        DemoRequest.objects.create(cafe_name='Roast', status=DemoRequest.Status.CONTACTED, **demo)
+
+        response = self.client.get(reverse('dashboard:demo_export'), {'status': 'pending'})
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertRegex(response['Content-Disposition'], r'^attachment; filename="kaffero-demos-\d{8}\.csv"$')
+        # The header goes out on its own, before any rows are fetched
+        chunks = iter(response.streaming_content)
+        self.assertEqual(next(chunks).decode(), ','.join(exports.DEMO_FIELDS) + '\r\n')
+
+        rows = list(csv.reader(io.StringIO(b''.join(chunks).decode())))
+        self.assertEqual(len(rows), 1)
+        record = dict(zip(exports.DEMO_FIELDS, rows[0]))
+        self.assertEqual((record['id'], record['cafe_name'], record['status']), (str(pending.pk), 'Brew, "Co"', 'pending'))
+        self.assertEqual(datetime.fromisoformat(record['created_at']), pending.created_at)
+        self.assertEqual(record['demo_expires_at'], '')
+
+        response, text = self.download('demo', search='roast')
+        self.assertEqual([row[3] for row in csv.reader(io.StringIO(text))][1:], ['Roast'])
+
+    def test_csv_formulas_are_neutralized(self):
+        ContactMessage.objects.create(
+            name='=HYPERLINK("http://evil.example")', email='anu@example.com', subject='general', message='@SUM(A1)',
+        )
+        response, text = self.download('message')
+        record = dict(zip(exports.MESSAGE_FIELDS, list(csv.reader(io.StringIO(text)))[1]))
+        self.assertEqual((record['name'], record['message']), ('\'=HYPERLINK("http://evil.example")', "'@SUM(A1)"))
+        self.assertEqual(record['email'], 'anu@example.com')
+
+        response, text = self.download('message', format='jsonl')
+        self.assertEqual(json.loads(text)['name'], '=HYPERLINK("http://evil.example")')
+
+    def test_message_and_subscriber_jsonl(self):
+        ContactMessage.objects.create(name='Anu', email='anu@example.com', subject='general', message='Hi')
+        ContactMessage.objects.create(
+            name='Rahul', email='rahul@example.com', subject='general', message='Hello', is_read=True,
+        )
+        response, text = self.download('message', read='unread', format='jsonl')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        records = [json.loads(line) for line in text.splitlines()]
+        self.assertEqual([(record['name'], record['is_read']) for record in records], [('Anu', False)])
+        self.assertEqual(list(records[0]), exports.MESSAGE_FIELDS)
+
+        NewsletterSubscriber.objects.create(email='reader@example.com')
+        NewsletterSubscriber.objects.create(email='gone@example.com', is_active=False)
+        response, text = self.download('subscriber', status='inactive')
+        rows = list(csv.reader(io.StringIO(text)))
+        self.assertEqual(rows[0], exports.SUBSCRIBER_FIELDS)
+        self.assertEqual([row[1] for row in rows[1:]], ['gone@example.com'])
+
+
+class EmailRenderingTests(TestCase):
+    """Precompiled email templates match a normal render."""
+
+    def test_matches_render_to_string(self):
+        demo = DemoRequest(
+            cafe_name='Brew & Bean', city='Kochi', contact_name='Anu', phone='+91 98765 43210',
+            email='anu@example.com', source='google', created_at=timezone.now(),
+        )
+        context = {'demo_request': demo}
+        for name in ('emails/demo_confirmation.html', 'emails/admin_demo_notification.html'):
+            with self.subTest(template=name):
+                html, text = emails.render_email(name, context)
+                self.assertHTMLEqual(html, render_to_string(name, context))
+                self.assertIn('Brew & Bean', text)
+                self.assertNotIn('<', text)
+                self.assertNotIn('  ', text)
+
+    def test_inline_css(self):
+        html = emails.inline_css(
+            '<html><head><style>p { color: red } .note { margin: 0 } a:hover { color: blue }</style></head>'
+            '<body><p class="note" style="color: green">Hi</p></body></html>'
+        )
+        self.assertIn('<p class="note" style="color: red; margin: 0; color: green">', html)
+        self.assertIn('<style>a:hover { color: blue }</style>', html)
+
+
+@override_settings(
+    RATE_LIMIT_ENABLED=True,
+    RATE_LIMITS={'chat': {'ip': '3/m'}, 'newsletter': {'session': '2/h'}},
+)
+class RateLimitTests(TestCase):
+    """Rejected requests get a 429 before the view runs."""
+
+    def setUp(self):
+        cache.clear()
+
+    def chat(self, ip='203.0.113.5'):
+        return self.client.post(
+            reverse('chatbot_message'), json.dumps({'message': 'hi', 'session_id': 'rate'}),
+            content_type='application/json', REMOTE_ADDR=ip,
+        )
+
+    def test_chat_limited_per_ip(self):
+        for _ in range(3):
+            self.assertEqual(self.chat().status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.chat()
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+        self.assertFalse(response.json()['success'])
+        self.assertEqual(self.chat(ip='203.0.113.6').status_code, 200)
+
+    def test_form_limited_per_session(self):
+        self.client.cookies['csrftoken'] = 'b' * 32
+        for _ in range(2):
+            self.client.post(reverse('newsletter_subscribe'), {'email': 'a@example.com'})
+        response = self.client.post(reverse('newsletter_subscribe'), {'email': 'a@example.com'})
+        self.assertEqual(response.status_code, 429)
+        self.assertTemplateUsed(response, 'website/rate_limited.html')
+
+    def test_sliding_window(self):
+        # 10 requests late in one window still count early in the next
+        for _ in range(10):
+            self.assertEqual(ratelimit.hit('test', 10, 60, now=1000 * 60 + 50), 0)
+        # 10% of the previous window has slid out: room for one more
+        self.assertEqual(ratelimit.hit('test', 10, 60, now=1001 * 60 + 6), 0)
+        retry_after = ratelimit.hit('test', 10, 60, now=1001 * 60 + 6)
+        self.assertGreater(retry_after, 0)
+        # Once enough of the previous window has slid out, requests pass again
+        self.assertEqual(ratelimit.hit('test', 10, 60, now=1001 * 60 + 6 + retry_after), 0)
+
+    def test_counter_cache(self):
+        counters = ratelimit.CounterCache('', {})
+        self.assertTrue(counters.add('hits', 0, timeout=60))
+        self.assertFalse(counters.add('hits', 5, timeout=60))
+        with self.assertNumQueries(1):
+            self.assertEqual(counters.incr('hits'), 1)
+        self.assertEqual(counters.incr('hits', 2), 3)
+        self.assertEqual(counters.get('hits'), 3)
+
+        # Expired counters read as missing and can be added again
+        counters.set('old', 7, timeout=0)
+        self.assertIsNone(counters.get('old'))
+        with self.assertRaises(ValueError):
+            counters.incr('old')
+        self.assertTrue(counters.add('old', 0, timeout=60))
+        self.assertEqual(counters.incr('old'), 1)
+
+        with self.settings(CACHES={'ratelimit': {'BACKEND': 'website.ratelimit.CounterCache'}}):
+            self.assertEqual(ratelimit.hit('test', 1, 60), 0)
+            self.assertGreater(ratelimit.hit('test', 1, 60), 0)
+
+
+@override_settings(
+    TURNSTILE_SECRET_KEY='',
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    RATE_LIMIT_ENABLED=False,
+)
+class SpamFilterTests(TestCase):
+    """Junk is rejected locally, before Turnstile is asked."""
+
+    def data(self, **overrides):
+        # A form rendered a minute ago, as a person would submit it
+        issued = int(time.time()) - 60
+        token = signing.Signer(salt=spam.TIMESTAMP_SALT).sign(f'contact:{issued}')
+        return {
+            'name': 'Tester', 'email': 'tester@example.com', 'subject': 'general',
+            'message': 'Do you support two outlets?', 'rendered_at': token,
+            'cf-turnstile-response': 'token', **overrides,
+        }
+
+    def submit(self, **overrides):
+        """Post the contact form; returns whether Turnstile was consulted."""
+        with mock.patch('website.views.verify_turnstile', return_value=True) as verify:
+            self.client.post(reverse('contact'), self.data(**overrides))
+        return verify.called
+
+    def test_genuine_submission_passes(self):
+        self.assertTrue(self.submit())
+        self.assertEqual(ContactMessage.objects.count(), 1)
+
+    def test_junk_rejected_without_turnstile(self):
+        junk = {
+            'honeypot': {'website': 'http://spam.example.com'},
+            'too_fast': {'rendered_at': spam.form_token('contact')},
+            'link_stuffing': {'message': 'http://a.example http://b.example www.c.example'},
+            'invalid_phone': {'phone': 'call me', 'message': 'see http://a.example'},
+        }
+        for rule, data in junk.items():
+            with self.subTest(rule=rule):
+                self.assertIn(rule, spam.score('contact', self.data(**data))[1])
+                self.assertFalse(self.submit(**data))
+        self.assertEqual(ContactMessage.objects.count(), 0)
+        self.assertGreaterEqual(request_metrics.registry.spam_checks[('contact', 'rejected')], len(junk))
+
+    def test_render_token(self):
+        response = self.client.get(reverse('contact'))
+        token = response.context['form']['rendered_at'].value()
+        self.assertAlmostEqual(spam.form_age('contact', token), 0, delta=2)
+        self.assertIsNone(spam.form_age('demo', token))
+        self.assertContains(response, 'name="rendered_at"')
+        self.assertContains(response, 'name="website"')
+
+
+class MetricsTests(TestCase):
+    """Every worker's numbers are in the totals, including those of workers that exited."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.enterContext(override_settings(METRICS_DIR=self.directory))
+        # A registry of its own, without the requests of the other tests
+        self.enterContext(mock.patch.object(request_metrics, 'registry', request_metrics.MetricsRegistry()))
+
+    def observe(self, registry, count):
+        stats = request_metrics.RequestStats()
+        stats.query_count = 2
+        for _ in range(count):
+            registry.observe('home', 'GET', 200, 0.02, 100, stats)
+
+    def test_collect_and_render(self):
+        self.observe(request_metrics.registry, 1)
+        # A worker that was killed before it could retire
+        process = subprocess.Popen([sys.executable, '-c', ''])
+        process.wait()
+        dead = request_metrics.MetricsRegistry()
+        self.observe(dead, 3)
+        with open(os.path.join(self.directory, f'metrics_{process.pid}.json'), 'w') as f:
+            json.dump(dead.to_dict(), f)
+
+        for _ in range(2):
+            totals = request_metrics.collect()
+            self.assertEqual(totals['requests'][('home', 'GET', '200')], 4)
+            self.assertEqual(totals['db_queries']['home'], 8)
+        self.assertFalse(os.path.exists(os.path.join(self.directory, f'metrics_{process.pid}.json')))
+
+        text = request_metrics.render_prometheus(totals)
+        self.assertIn('kaffero_http_requests_total{view="home",method="GET",status="200"} 4\n', text)
+        self.assertIn('kaffero_http_request_duration_seconds_bucket{view="home",le="0.025"} 4\n', text)
+        self.assertIn('kaffero_http_request_duration_seconds_count{view="home"} 4\n', text)
+        self.assertIn('kaffero_db_queries_total{view="home"} 8\n', text)
+
+    def test_label_values_are_escaped(self):
+        totals = request_metrics._empty()
+        totals['spam_rules'][('contact', 'say "hi"\\\nnow')] = 1
+        text = request_metrics.render_prometheus(totals)
+        self.assertIn('kaffero_spam_rule_hits_total{form="contact",rule="say \\"hi\\"\\\\\\nnow"} 1\n', text)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token_access(self):
+        url = reverse('dashboard:metrics')
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
+
+    def test_retire(self):
+        self.observe(request_metrics.registry, 2)
+        request_metrics.registry.retire()
+        self.assertFalse(os.path.exists(request_metrics.registry.path()))
+        self.assertEqual(request_metrics.registry.requests, {})
+
+        self.observe(request_metrics.registry, 1)
+        self.assertEqual(request_metrics.collect()['requests'][('home', 'GET', '200')], 3)
+
+
+class GunicornHookTests(TestCase):
+    """The server hooks in config/gunicorn.py warm caches, recycle big workers and keep their metrics."""
+
+    def setUp(self):
+        # Importing the config disables the collector, for the master
+        with mock.patch('gc.disable'):
+            self.config = importlib.import_module('config.gunicorn')
+
+    def test_when_ready_warms_and_freezes(self):
+        server = mock.Mock()
+        self.addCleanup(gc.unfreeze)
+        self.addCleanup(gc.enable)
+        gc.disable()
+        with mock.patch.object(self.config, 'warm_caches') as warm:
+            self.config.when_ready(server)
+        warm.assert_called_once_with()
+        self.assertTrue(gc.isenabled())
+        self.assertGreater(gc.get_freeze_count(), 0)
+
+    def test_post_request_recycles_over_limit(self):
+        worker = SimpleNamespace(pid=1, alive=True, log=mock.Mock())
+        self.config.post_fork(None, worker)
+        with mock.patch.multiple(self.config, max_worker_memory_mb=100, memory_check_interval=3), \
+                mock.patch.object(self.config, 'unique_memory_mb', side_effect=[50, 150]) as measure:
+            for _ in range(5):
+                self.config.post_request(worker, None, {}, None)
+            self.assertEqual((measure.call_count, worker.alive), (1, True))
+            self.config.post_request(worker, None, {}, None)
+            self.assertEqual((measure.call_count, worker.alive), (2, False))
+
+        worker = SimpleNamespace(pid=2, alive=True, log=mock.Mock(), requests_handled=0)
+        with mock.patch.object(self.config, 'max_worker_memory_mb', 0), \
+                mock.patch.object(self.config, 'unique_memory_mb') as measure:
+            for _ in range(20):
+                self.config.post_request(worker, None, {}, None)
+        measure.assert_not_called()
+
+    def test_worker_exit_retires_metrics(self):
+        with mock.patch.object(request_metrics, 'registry') as registry:
+            self.config.worker_exit(None, SimpleNamespace(pid=1))
+        registry.retire.assert_called_once_with()
+
+
+class PrestartTests(TestCase):
+    """migrate and collectstatic only run when they have something to do."""
+
+    def setUp(self):
+        source, root = tempfile.TemporaryDirectory(), tempfile.TemporaryDirectory()
+        self.addCleanup(source.cleanup)
+        self.addCleanup(root.cleanup)
+        self.css = os.path.join(source.name, 'site.css')
+        with open(self.css, 'w') as f:
+            f.write('body { color: black; }')
+        self.enterContext(override_settings(
+            STATICFILES_DIRS=[source.name], STATIC_ROOT=root.name,
+            STORAGES={**settings.STORAGES, 'staticfiles': {
+                'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+            }},
+        ))
+        self.steps = []
+        self.enterContext(mock.patch.object(
+            prestart, 'call_command', side_effect=lambda name, **options: self.steps.append(name),
+        ))
+
+    def prestart(self, *args):
+        self.steps.clear()
+        call_command('prestart', *args, verbosity=0)
+        return list(self.steps)
+
+    def test_static_files_collected_when_changed(self):
+        self.assertEqual(self.prestart(), ['collectstatic'])
+        self.assertEqual(self.prestart(), [])
+        with open(self.css, 'w') as f:
+            f.write('body { color: white; }')
+        self.assertEqual(self.prestart(), ['collectstatic'])
+        self.assertEqual(self.prestart(), [])
+        self.assertEqual(self.prestart('--no-static'), [])
+
+    def test_migrate_only_with_pending_migrations(self):
+        self.prestart()
+        self.assertEqual(self.prestart('--no-static'), [])
+        with mock.patch.object(prestart, 'pending_migrations', return_value=['0099_new']):
+            self.assertEqual(self.prestart(), ['migrate'])
+        self.assertEqual(self.prestart('--force'), ['migrate', 'collectstatic'])
+
+
+class ChatArchiveTests(TestCase):
+    """Compacted conversations read the same as live ones."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('staff', password='password', is_staff=True)
+        self.client.force_login(self.user)
+        self.old = ChatConversation.objects.create(session_id='old', is_resolved=True)
+        self.open = ChatConversation.objects.create(session_id='open')
+        for chat in (self.old, self.open):
+            for i in range(3):
+                ChatMessage.objects.create(conversation=chat, role=ChatMessage.Role.USER, content=f'question {i}')
+                ChatMessage.objects.create(conversation=chat, role=ChatMessage.Role.BOT, content=f'answer {i}')
+        ChatConversation.objects.filter(pk=self.old.pk).update(updated_at=timezone.now() - timedelta(days=100))
+
+    def test_compact_and_view(self):
+        stats = chat_archive.compact(days=90)
+        self.assertEqual((stats['conversations'], stats['messages']), (1, 6))
+        self.assertFalse(self.old.messages.exists())
+        self.assertEqual(self.open.messages.count(), 6)
+        self.assertEqual(chat_archive.compact(days=90)['conversations'], 0)
+
+        # A visitor returning to an archived conversation
+        ChatMessage.objects.create(conversation=self.old, role=ChatMessage.Role.USER, content='back again')
+        contents = [message.content for message in chat_archive.transcript(self.old)]
+        self.assertEqual(contents[0], 'question 0')
+        self.assertEqual(contents[-1], 'back again')
+
+        response = self.client.get(reverse('dashboard:chat_detail', kwargs={'pk': self.old.pk}))
+        self.assertEqual(len(response.context['chat_messages']), 7)
+        self.assertContains(response, 'answer 2')
+
+        chats = {chat.pk: chat for chat in self.client.get(reverse('dashboard:chat_list')).context['chats']}
+        self.assertEqual(chats[self.old.pk].num_messages, 7)
+
+        export = self.client.get(reverse('dashboard:chat_export'), {'format': 'jsonl'})
+        records = [json.loads(line) for line in b''.join(export.streaming_content).decode().splitlines()]
+        archived = next(record for record in records if record['id'] == self.old.pk)
+        self.assertEqual(len(archived['messages']), 7)
+
+    def test_late_message_is_kept(self):
+        late_id = self.old.messages.order_by('id').values_list('id', flat=True)[1]
+        ChatMessage.objects.filter(pk=late_id).delete()
+        bulk_create = ChatArchive.objects.bulk_create
+
+        def commit_late_message(archives):
+            # A message whose id was allocated before the read commits after it
+            ChatMessage.objects.create(pk=late_id, conversation=self.old, role=ChatMessage.Role.BOT, content='late')
+            return bulk_create(archives)
+
+        with mock.patch.object(ChatArchive.objects, 'bulk_create', side_effect=commit_late_message):
+            self.assertEqual(chat_archive.compact(days=90)['messages'], 5)
+        self.assertEqual([message.content for message in self.old.messages.all()], ['late'])
+
+    @mock.patch('website.chat_archive.CHUNK_SIZE', 4)
+    def test_archive_pages_read_one_chunk(self):
+        chat_archive.compact(days=90)
+        for i in range(5):
+            ChatMessage.objects.create(conversation=self.old, role=ChatMessage.Role.USER, content=f'later {i}')
+        ChatConversation.objects.filter(pk=self.old.pk).update(updated_at=timezone.now() - timedelta(days=100))
+        chat_archive.compact(days=90)
+
+        # The partly filled chunk was rewritten and the rest appended
+        archive = ChatArchive.objects.get(pk=self.old.pk)
+        self.assertEqual((archive.message_count, len(archive.chunk_offsets)), (11, 3))
+        expected = [f'{kind} {i}' for i in range(3) for kind in ('question', 'answer')]
+        expected += [f'later {i}' for i in range(5)]
+        self.assertEqual([message.content for message in chat_archive.transcript(self.old)], expected)
+
+        chat = ChatConversation.objects.select_related('archive').defer('archive__transcript').get(pk=self.old.pk)
+        pages, before = [], None
+        while True:
+            # The live rows (none left), then one chunk's bytes
+            with self.assertNumQueries(1 if before else 2):
+                page, before = chat_archive.transcript_page(chat, before, limit=3)
+            pages.insert(0, [message.content for message in page])
+            if before is None:
+                break
+        self.assertEqual([len(page) for page in pages], [1, 3, 1, 3, 3])
+        self.assertEqual(sum(pages, []), expected)
+
+    def test_transcript_pages(self):
+        chat_archive.compact(days=90)
+        ChatMessage.objects.create(conversation=self.old, role=ChatMessage.Role.USER, content='back again')
+        ChatMessage.objects.create(conversation=self.old, role=ChatMessage.Role.BOT, content='welcome back')
+        expected = [message.content for message in chat_archive.transcript(self.old)]
+
+        response = self.client.get(reverse('dashboard:chat_detail', kwargs={'pk': self.old.pk}))
+        self.assertEqual(response.context['message_total'], 8)
+
+        # Newest page first, then older pages through the live rows into the archive
+        url = reverse('dashboard:chat_messages', kwargs={'pk': self.old.pk})
+        pages, before = [], ''
+        while True:
+            data = self.client.get(url, {'before': before, 'limit': 3}).json()
+            pages.insert(0, [message['content'] for message in data['messages']])
+            before = data['before']
+            if not before:
+                break
+        self.assertEqual([len(page) for page in pages], [2, 3, 3])
+        self.assertEqual(sum(pages, []), expected)
+
+        self.assertEqual(self.client.get(url, {'before': 'nonsense'}).status_code, 400)
+
+
+@override_settings(LIVE_FEED_POLL_INTERVAL=0)
+class LiveFeedTests(TestCase):
+    """New leads reach open dashboards from one shared buffer per process."""
+
+    def setUp(self):
+        self.hub = live.Hub()
+        self.hub.start()
+        self.marks = self.hub.current_marks()
+
+    def create_activity(self):
+        DemoRequest.objects.create(
+            cafe_name='Brew', city='Kochi', num_tables=5, contact_name='Anu', phone='+919876543210',
+            email='anu@example.com',
+        )
+        ContactMessage.objects.create(name='Rahul', email='rahul@example.com', subject='general', message='Hi')
+        chat = ChatConversation.objects.create(session_id='live')
+        ChatMessage.objects.create(conversation=chat, role=ChatMessage.Role.USER, content='Pricing?')
+        ChatMessage.objects.create(conversation=chat, role=ChatMessage.Role.BOT, content='Plans start at...')
+
+    def test_poll_and_resume(self):
+        self.create_activity()
+        self.hub.refresh()
+        events = self.hub.since(self.marks)
+        self.assertEqual([event['kind'] for event in events], ['demo', 'contact', 'chat'])
+
+        text, marks = live.render(events, self.marks)
+        self.assertIn('event: chat', text)
+        self.assertIn('Pricing?', text)
+        self.assertEqual(self.hub.since(marks), [])
+        self.assertEqual(live.parse_marks(live.format_marks(marks)), marks)
+
+    def test_late_commit_within_lookback(self):
+        demo = {
+            'cafe_name': 'Brew', 'city': 'Kochi', 'num_tables': 5, 'contact_name': 'Anu',
+            'phone': '+919876543210', 'email': 'anu@example.com',
+        }
+        later = DemoRequest.objects.create(pk=self.marks['demo'][0] + 2, **demo)
+        self.hub.refresh()
+        text, marks = live.render(self.hub.since(self.marks), self.marks)
+        self.assertEqual(text.count('event: demo'), 1)
+
+        # A lower id commits after the browser has moved past it
+        DemoRequest.objects.create(pk=later.pk - 1, **demo)
+        self.hub.refresh()
+        events = self.hub.since(marks)
+        self.assertEqual([event['id'] for event in events], [later.pk - 1])
+        text, marks = live.render(events, marks)
+        self.assertEqual(self.hub.since(marks), [])
+        # Polled again, it is not buffered twice
+        self.hub.refresh()
+        self.assertEqual(len(self.hub.events), 2)
+
+    @override_settings(LIVE_FEED_BUFFER=1)
+    def test_catch_up_past_buffer(self):
+        self.create_activity()
+        self.hub.refresh()
+        self.assertEqual(len(self.hub.events), 1)
+
+        text, marks = live.open_feed(self.hub, live.format_marks(self.marks))
+        self.assertEqual(text.count('\nevent: '), 3)
+
+    def test_view(self):
+        user = User.objects.create_user('staff', password='password', is_staff=True)
+        self.client.force_login(user)
+        with mock.patch('website.live.get_hub', return_value=self.hub):
+            response = self.client.get(reverse('dashboard:live_feed'))
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            self.assertContains(response, f'id: {live.format_marks(self.marks)}')
+
+            self.create_activity()
+            response = self.client.get(
+                reverse('dashboard:live_feed'), HTTP_LAST_EVENT_ID=live.format_marks(self.marks),
+            )
+            self.assertContains(response, 'event: demo')
+
+        # Only pages that know the pending count show a badge to bump
+        self.assertContains(self.client.get(reverse('dashboard:home')), 'data-live-badge="demo"')
+        self.assertNotContains(self.client.get(reverse('dashboard:demo_list')), 'data-live-badge="demo"')
+
+
+@override_settings(RATE_LIMIT_ENABLED=False)
+class LeadExtractionTests(TestCase):
+    """Every contact a visitor shares is captured in a normalized form."""
+
+    def test_extract(self):
+        found = leads.extract('Mail Anu.Joseph@Example.com or me, call +91-98470-12345 / 098470 12345 or 9876543210')
+        self.assertEqual(found.emails, ('anu.joseph@example.com',))
+        self.assertEqual(found.phones, ('+919847012345', '+919876543210'))
+        self.assertEqual(leads.extract('order 12345678901 for 2 outlets'), leads.NO_CONTACTS)
+
+    def test_chat_and_backfill(self):
+        response = self.client.post(
+            reverse('chatbot_message'),
+            json.dumps({'message': 'I am at a@example.com and b@example.com', 'session_id': 'lead'}),
+            content_type='application/json',
+        )
+        self.assertTrue(response.json()['success'])
+        chat = ChatConversation.objects.get(session_id='lead')
+        self.assertTrue(chat.is_lead)
+        self.assertEqual((chat.visitor_email, chat.contacts), ('a@example.com', ['a@example.com', 'b@example.com']))
+
+        # Conversations captured before normalization, some of them archived
+        old = ChatConversation.objects.create(session_id='old', is_resolved=True, visitor_phone='98765 43210')
+        ChatMessage.objects.create(conversation=old, role=ChatMessage.Role.USER, content='98765 43210')
+        ChatMessage.objects.create(conversation=old, role=ChatMessage.Role.BOT, content='Call 9847012345')
+        ChatConversation.objects.filter(pk=old.pk).update(updated_at=timezone.now() - timedelta(days=100))
+        chat_archive.compact(days=90)
+        ChatMessage.objects.create(conversation=old, role=ChatMessage.Role.USER, content='or old@example.com')
+
+        stats = leads.backfill(workers=1)
+        self.assertEqual((stats['conversations'], stats['updated']), (2, 1))
+        old.refresh_from_db()
+        self.assertEqual(old.visitor_phone, '+919876543210')
+        self.assertEqual(old.contacts, ['old@example.com', '+919876543210'])
+        self.assertLess(old.updated_at, timezone.now() - timedelta(days=90))
+        self.assertEqual(leads.backfill(workers=1)['updated'], 0)
+
+
+@override_settings(RATE_LIMIT_ENABLED=False)
+class ChatAnalyticsTests(TestCase):
+    """Rollups written turn by turn match a rebuild from the messages."""
+
+    def chat(self, message, session_id):
+        self.client.post(
+            reverse('chatbot_message'), json.dumps({'message': message, 'session_id': session_id}),
+            content_type='application/json',
+        )
+
+    def snapshot(self):
+        return (
+            list(ChatDailyStats.objects.values_list('day', 'conversations', 'messages', 'visitor_messages', 'leads')),
+            list(ChatIntentDaily.objects.values_list('day', 'intent', 'count')),
+        )
+
+    def test_incremental_matches_rebuild(self):
+        self.chat('hello', 'a')
+        self.chat('how much does it cost?', 'a')
+        self.chat('call me on 98765 43210', 'a')
+        self.chat('can I get a demo?', 'b')
+
+        stats = ChatDailyStats.objects.get()
+        self.assertEqual((stats.conversations, stats.messages, stats.visitor_messages, stats.leads), (2, 8, 4, 1))
+        intents = dict(ChatIntentDaily.objects.values_list('intent', 'count'))
+        self.assertEqual(intents, {'greeting': 1, 'pricing': 1, 'contact': 1, 'demo': 1})
+
+        incremental = self.snapshot()
+        chat_analytics.rebuild()
+        self.assertEqual(self.snapshot(), incremental)
+
+        # Archived messages still count
+        ChatConversation.objects.update(is_resolved=True, updated_at=timezone.now() - timedelta(days=100))
+        chat_archive.compact(days=90)
+        call_command('rebuild_chat_rollups', stdout=io.StringIO())
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_page(self):
+        self.chat('what features do you have', 'a')
+        self.client.force_login(User.objects.create_user('staff', password='password', is_staff=True))
+        response = self.client.get(reverse('dashboard:chat_analytics'), {'days': 7})
+        self.assertEqual(len(response.context['series']), 7)
+        self.assertEqual(response.context['totals']['conversations'], 1)
+        self.assertContains(response, 'Features')
+
+
+class DemoFunnelTests(TestCase):
+    """Status changes are logged and counted per day, source and city."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('staff', password='password', is_staff=True)
+        self.client.force_login(self.user)
+
+    def snapshot(self):
+        return list(DemoFunnelDaily.objects.values_list(
+            'day', 'source', 'city', 'status', 'entered', 'exited', 'seconds_in_stage',
+        ))
+
+    def test_transitions_match_rebuild(self):
+        demo = DemoRequest.objects.create(
+            cafe_name='Bean There', city=' kochi ', contact_name='Asha', phone='9876543210', source='google',
+        )
+        DemoRequest.objects.create(
+            cafe_name='Brew Lab', city='Kochi', contact_name='Ravi', phone='9847012345', source='google',
+        )
+        earlier = timezone.now() - timedelta(minutes=2)
+        DemoRequest.objects.filter(pk=demo.pk).update(created_at=earlier)
+        DemoStatusChange.objects.filter(demo=demo).update(changed_at=earlier)
+        for status in ('contacted', 'contacted', 'converted'):
+            self.client.post(reverse('dashboard:demo_detail', kwargs={'pk': demo.pk}), {'status': status})
+
+        changes = list(DemoStatusChange.objects.filter(demo=demo).values_list('from_status', 'to_status'))
+        self.assertEqual(changes, [('', 'pending'), ('pending', 'contacted'), ('contacted', 'converted')])
+        self.assertEqual(DemoStatusChange.objects.filter(demo=demo).last().changed_by, self.user)
+        rows = {row.status: row for row in DemoFunnelDaily.objects.filter(city='Kochi')}
+        self.assertEqual((rows['pending'].entered, rows['pending'].exited), (2, 1))
+        self.assertGreaterEqual(rows['pending'].seconds_in_stage, 120)
+
+        incremental = self.snapshot()
+        funnel.rebuild()
+        self.assertEqual(self.snapshot(), incremental)
+
+        response = self.client.get(reverse('dashboard:demo_funnel'), {'days': 30})
+        stages = {stage['status']: stage for stage in response.context['stages']}
+        self.assertEqual((stages['pending']['entered'], stages['converted']['rate']), (2, 50))
+        self.assertEqual(response.context['sources'][0]['conversion_rate'], 50)
+
+    def test_invalid_status_is_rejected(self):
+        demo = DemoRequest.objects.create(cafe_name='Bean There', city='Kochi', contact_name='Asha', phone='9876543210')
+        url = reverse('dashboard:demo_detail', kwargs={'pk': demo.pk})
+        response = self.client.post(url, {'status': 'bogus', 'notes': 'Called'}, follow=True)
+        self.assertContains(response, 'Please choose a valid status.')
+        demo.refresh_from_db()
+        self.assertEqual((demo.status, demo.notes), ('pending', ''))
+        self.assertEqual(DemoStatusChange.objects.count(), 1)
+
+    def test_deleted_request_stays_in_funnel(self):
+        demo = DemoRequest.objects.create(cafe_name='Bean There', city='Kochi', contact_name='Asha', phone='9876543210')
+        self.client.post(reverse('dashboard:demo_detail', kwargs={'pk': demo.pk}), {'status': 'declined'})
+        self.client.post(reverse('dashboard:demo_delete', kwargs={'pk': demo.pk}))
+
+        self.assertFalse(DemoRequest.objects.exists())
+        self.assertEqual(DemoStatusChange.objects.filter(demo=None).count(), 2)
+        incremental = self.snapshot()
+        funnel.rebuild()
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_seed_unlogged_requests(self):
+        demo = DemoRequest.objects.create(cafe_name='Old Cafe', city='Kochi', contact_name='Mia', phone='9876543210')
+        DemoStatusChange.objects.all().delete()
+        DemoFunnelDaily.objects.all().delete()
+        DemoRequest.objects.filter(pk=demo.pk).update(status=DemoRequest.Status.DECLINED)
+
+        call_command('rebuild_demo_funnel', '--seed', stdout=io.StringIO())
+        demo.refresh_from_db()
+        self.assertEqual(demo.status_changed_at, demo.updated_at)
+        self.assertEqual(DemoStatusChange.objects.count(), 2)
+        self.assertEqual(dict(DemoFunnelDaily.objects.values_list('status', 'entered')), {'pending': 1, 'declined': 1})
+        self.assertEqual(funnel.seed(), 0)
+
+    def test_generated_requests_are_seeded(self):
+        out = io.StringIO()
+        call_command(
+            'generate_scale_data', demos=50, messages=0, subscribers=0, chats=0, verbosity=0, stdout=out,
+        )
+        self.assertEqual(out.getvalue(), '')
+        moved = DemoRequest.objects.exclude(status=DemoRequest.Status.PENDING).count()
+        self.assertEqual(DemoStatusChange.objects.count(), 50 + moved)
+        entered = DemoFunnelDaily.objects.filter(status=DemoRequest.Status.PENDING)
+        self.assertEqual(sum(entered.values_list('entered', flat=True)), 50)
+
+
+class BulkActionTests(TestCase):
+    """Bulk actions act on ticked rows or on everything matching the filters."""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('staff', password='password', is_staff=True))
+
+    def test_select_all_matching(self):
+        for i in range(5):
+            chat = ChatConversation.objects.create(session_id=f'spam-{i}')
+            ChatMessage.objects.create(conversation=chat, role=ChatMessage.Role.USER, content='spam')
+        kept = ChatConversation.objects.create(session_id='kept', is_resolved=True)
+
+        response = self.client.post(reverse('dashboard:chat_bulk'), {
+            'action': 'delete', 'select_all': '1', 'filters': 'resolved=false&page=2',
+        })
+        self.assertRedirects(response, reverse('dashboard:chat_list') + '?resolved=false&page=2', fetch_redirect_response=False)
+        self.assertEqual(list(ChatConversation.objects.all()), [kept])
+        self.assertFalse(ChatMessage.objects.exists())
+
+    def test_batches_and_ids(self):
+        for i in range(5):
+            ContactMessage.objects.create(name='Spam', email=f'spam{i}@example.com', message='Buy now')
+        self.assertEqual(bulk.run(ContactMessage.objects.all(), bulk.MESSAGE_ACTIONS['read'], batch_size=2), 5)
+        self.assertEqual(bulk.run(ContactMessage.objects.all(), bulk.MESSAGE_ACTIONS['read'], batch_size=2), 0)
+
+        ids = list(ContactMessage.objects.values_list('pk', flat=True)[:2])
+        self.client.post(reverse('dashboard:message_bulk'), {'action': 'delete', 'ids': ids + ['x']})
+        self.assertEqual(ContactMessage.objects.count(), 3)
+        response = self.client.post(reverse('dashboard:message_bulk'), {'action': 'nope', 'ids': ids}, follow=True)
+        self.assertContains(response, 'Please choose an action.')
+
+    def test_demo_status_is_logged(self):
+        demos = [
+            DemoRequest.objects.create(cafe_name=f'Cafe {i}', city='Kochi', contact_name='A', phone='9876543210')
+            for i in range(3)
+        ]
+        self.client.post(reverse('dashboard:demo_bulk'), {
+            'action': 'status:declined', 'ids': [demos[0].pk, demos[1].pk],
+        })
+        self.assertEqual(DemoRequest.objects.filter(status='declined').count(), 2)
+        self.assertEqual(DemoStatusChange.objects.filter(to_status='declined').count(), 2)
+        incremental = list(DemoFunnelDaily.objects.values_list('status', 'entered', 'exited', 'seconds_in_stage'))
+        funnel.rebuild()
+        self.assertEqual(
+            list(DemoFunnelDaily.objects.values_list('status', 'entered', 'exited', 'seconds_in_stage')), incremental,
+        )
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend', DEMO_EXPIRING_SOON_DAYS=2)
+class DemoExpiryTests(TestCase):
+    """Ended demos are expired in bulk, followed up once and filterable in the database."""
+
+    def demo(self, name, expires_in, status=DemoRequest.Status.DEMO_CREATED, email='owner@example.com'):
+        return DemoRequest.objects.create(
+            cafe_name=name, city='Kochi', contact_name='Owner', phone='9876543210', email=email,
+            status=status, demo_expires_at=timezone.now() + expires_in if expires_in is not None else None,
+        )
+
+    def test_sweep_and_notices(self):
+        ended = self.demo('Ended', timedelta(hours=-1))
+        no_email = self.demo('No Email', timedelta(days=-3), status=DemoRequest.Status.CONTACTED, email='')
+        converted = self.demo('Converted', timedelta(days=-3), status=DemoRequest.Status.CONVERTED)
+        running = self.demo('Running', timedelta(days=5))
+
+        out = io.StringIO()
+        call_command('expire_demos', stdout=out)
+        self.assertIn('Expired 2 demos', out.getvalue())
+        statuses = dict(DemoRequest.objects.values_list('cafe_name', 'status'))
+        self.assertEqual(statuses, {
+            'Ended': 'expired', 'No Email': 'expired', 'Converted': 'converted', 'Running': 'demo_created',
+        })
+        self.assertEqual(DemoStatusChange.objects.filter(to_status='expired').count(), 2)
+
+        self.assertEqual([message.to for message in mail.outbox], [[ended.email]])
+        self.assertIn('Ended', mail.outbox[0].subject)
+        ended.refresh_from_db()
+        no_email.refresh_from_db()
+        self.assertEqual((ended.expiry_notice, no_email.expiry_notice), ('sent', ''))
+
+        # Nothing left to do on the next run
+        self.assertEqual(demo_expiry.sweep(), 0)
+        self.assertEqual(demo_expiry.send_notices()['sent'], 0)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual({converted.status, running.status}, {'converted', 'demo_created'})
+
+    def test_recurring_job(self):
+        self.demo('Ended', timedelta(hours=-1))
+        self.assertEqual(jobs.PERIODIC[tasks.expire_demos.task_name], settings.DEMO_EXPIRY_INTERVAL)
+        self.assertEqual(jobs.claim(), [])
+
+        jobs.ensure_periodic()
+        [job] = jobs.claim(worker='worker-1')
+        self.assertEqual(job.task, tasks.expire_demos.task_name)
+        self.assertTrue(jobs.run(job))
+        self.assertEqual(DemoRequest.objects.get().status, 'expired')
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_dashboard_filters(self):
+        self.demo('Ended', timedelta(days=-1), status=DemoRequest.Status.CONVERTED)
+        self.demo('Soon', timedelta(hours=12))
+        self.demo('Later', timedelta(days=6))
+        self.demo('No Demo', None, status=DemoRequest.Status.PENDING)
+        self.client.force_login(User.objects.create_user('staff', password='password', is_staff=True))
+
+        def names(state):
+            response = self.client.get(reverse('dashboard:demo_list'), {'demo': state})
+            return sorted((demo.cafe_name, demo.demo_state) for demo in response.context['demos'])
+
+        self.assertEqual(names('expiring'), [('Soon', 'expiring')])
+        self.assertEqual(names('active'), [('Later', 'active'), ('Soon', 'expiring')])
+        self.assertEqual(names('expired'), [('Ended', 'expired')])
+        self.assertEqual(len(names('')), 4)
+
+
+JOB_CALLS = []
+
+
+@jobs.task
+def record_job(name, fail=False):
+    JOB_CALLS.append(name)
+    if fail:
+        raise RuntimeError('boom')
+
+
+@jobs.task
+def tick_job():
+    JOB_CALLS.append('tick')
+
+
+class JobQueueTests(TestCase):
+    """Jobs are claimed by priority, retried, recovered and kept unique."""
+
+    def setUp(self):
+        JOB_CALLS.clear()
+        cache.clear()
+
+    def test_claim_order_and_unique_keys(self):
+        low = jobs.enqueue(record_job, {'name': 'low'})
+        high = jobs.enqueue(record_job, {'name': 'high'}, priority=5)
+        jobs.enqueue(record_job, {'name': 'later'}, run_at=timezone.now() + timedelta(hours=1))
+        unique = jobs.enqueue(record_job, {'name': 'unique'}, unique_key='report')
+        self.assertEqual(jobs.enqueue(record_job, {'name': 'again'}, unique_key='report').pk, unique.pk)
+
+        claimed = jobs.claim(10, 'worker-1')
+        self.assertEqual([job.pk for job in claimed], [high.pk, low.pk, unique.pk])
+        self.assertEqual(jobs.claim(10, 'worker-2'), [])
+        for job in claimed:
+            self.assertTrue(jobs.run(job))
+        self.assertEqual(JOB_CALLS, ['high', 'low', 'unique'])
+        self.assertEqual(Job.objects.filter(status=Job.Status.DONE).count(), 3)
+        # Finished, so the key is free again
+        self.assertNotEqual(jobs.enqueue(record_job, {'name': 'again'}, unique_key='report').pk, unique.pk)
+
+    def test_retries_then_fails(self):
+        job = jobs.enqueue(record_job, {'name': 'flaky', 'fail': True}, max_attempts=2)
+        with self.assertLogs('website.jobs', 'ERROR'):
+            self.assertFalse(jobs.run(jobs.claim()[0]))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.Status.QUEUED, 1))
+        self.assertIn('boom', job.last_error)
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertEqual(jobs.claim(), [])
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        with self.assertLogs('website.jobs', 'ERROR'):
+            self.assertFalse(jobs.run(jobs.claim()[0]))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.Status.FAILED, 2))
+
+    @override_settings(JOBS_RUN_INLINE=True)
+    def test_runs_inline_without_worker(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            job = jobs.enqueue(record_job, {'name': 'inline'})
+            self.assertEqual(JOB_CALLS, [])
+        job.refresh_from_db()
+        self.assertEqual((JOB_CALLS, job.status), (['inline'], Job.Status.DONE))
+
+    def test_periodic_job_is_queued_again(self):
+        with mock.patch.dict(jobs.PERIODIC, {tick_job.task_name: 60}, clear=True):
+            [job] = jobs.ensure_periodic()
+            self.assertEqual(jobs.ensure_periodic(), [])
+
+            self.assertTrue(jobs.run(jobs.claim()[0]))
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), (Job.Status.QUEUED, 0))
+            self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=50))
+            self.assertEqual((jobs.claim(), jobs.ensure_periodic()), ([], []))
+        self.assertEqual(JOB_CALLS, ['tick'])
+
+    def test_expired_lease_is_recovered(self):
+        job = jobs.enqueue(record_job, {'name': 'lost'})
+        [lost] = jobs.claim(1, 'worker-1')
+        Job.objects.filter(pk=job.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+
+        [retaken] = jobs.claim(1, 'worker-2')
+        self.assertEqual(retaken.attempts, 2)
+        # The first worker finishing late does not overwrite the new lease
+        jobs.run(lost)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by), (Job.Status.RUNNING, retaken.locked_by))
+        self.assertTrue(jobs.run(retaken))
+
+    def test_contact_emails_are_queued(self):
+        issued = int(time.time()) - 60
+        with mock.patch('website.views.verify_turnstile', return_value=True):
+            self.client.post(reverse('contact'), {
+                'name': 'Tester', 'email': 'tester@example.com', 'subject': 'general', 'message': 'Hello',
+                'rendered_at': signing.Signer(salt=spam.TIMESTAMP_SALT).sign(f'contact:{issued}'),
+            })
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(Job.objects.filter(task='website.tasks.send_contact_email').count(), 2)
+        for job in jobs.claim(10):
+            self.assertTrue(jobs.run(job))
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), ['kafferoapp@gmail.com', 'tester@example.com'])
+
+
+class JobWorkerTests(TransactionTestCase):
+    """``runworkers --burst`` drains the queue from a worker thread."""
+
+    def test_runworkers(self):
+        demo = DemoRequest.objects.create(
+            cafe_name='Worker Cafe', city='Kochi', contact_name='Owner', phone='9876543210', email='owner@example.com',
+        )
+        for recipient in ('admin', 'requester'):
+            jobs.enqueue(tasks.send_demo_email, {'demo_id': demo.pk, 'recipient': recipient})
+
+        call_command('runworkers', '--workers', '1', '--burst', stdout=io.StringIO())
+        self.assertEqual(Job.objects.filter(status=Job.Status.DONE).count(), 2)
+        self.assertEqual(sorted(message.subject for message in mail.outbox), [
+            'Demo Request Confirmed - Worker Cafe', 'New Demo Request: Worker Cafe',
+        ])
+
+
+@mock.patch('website.db_routing.replica_configured', return_value=True)
+class ReplicaRoutingTests(TestCase):
+    """Safe requests read from the replica until they, or a recent request, wrote."""
+
+    def request(self, method='get', write=False, cookies=None):
+        reads = []
+
+        def view(request):
+            reads.append(router.db_for_read(FAQ))
+            if write:
+                router.db_for_write(FAQ)
+                reads.append(router.db_for_read(FAQ))
+            return HttpResponse()
+
+        request = getattr(RequestFactory(), method)('/')
+        request.COOKIES.update(cookies or {})
+        response = db_routing.ReplicaMiddleware(view)(request)
+        return reads, response.cookies.get(db_routing.STICKY_COOKIE)
+
+    def test_routing(self, configured):
+        self.assertEqual(self.request(), (['replica'], None))
+        self.assertEqual(self.request('head'), (['replica'], None))
+        self.assertEqual(self.request('post'), (['default'], None))
+
+        # Reads after a write see it, and so does the browser for a while
+        reads, sticky = self.request('post', write=True)
+        self.assertEqual(reads, ['default', 'default'])
+        self.assertEqual(sticky['max-age'], settings.DATABASE_REPLICA_STICKY_SECONDS)
+        reads, sticky = self.request(write=True)
+        self.assertEqual(reads, ['replica', 'default'])
+        self.assertIsNotNone(sticky)
+        self.assertEqual(self.request(cookies={db_routing.STICKY_COOKIE: '1'})[0], ['default'])
+
+        # Commands and workers always use the primary
+        self.assertEqual(router.db_for_read(FAQ), 'default')
+
+    def test_without_replica(self, configured):
+        configured.return_value = False
+        self.assertEqual(self.request(write=True), (['default', 'default'], None))
+
+
+@override_settings(CHATBOT_FAQ_MIN_SCORE=0.6, CATALOG_CHECK_INTERVAL=3600)
+class FAQSearchTests(TestCase):
+    """The chatbot answers from the FAQ that covers the question, and only then."""
+
+    def setUp(self):
+        self.outlets = FAQ.objects.create(
+            question='Can I manage multiple outlets?', answer='Yes, Standard covers three outlets.',
+        )
+        self.offline = FAQ.objects.create(
+            question='Does the waiter app work offline?', answer='Orders sync once the app is back online.',
+        )
+        FAQ.objects.create(question='Is there a setup fee?', answer='No setup fee.', is_active=False)
+        # Test transactions never commit, which is when the catalog is invalidated
+        catalog.invalidate()
+
+    def reply(self, message):
+        return get_chatbot_response(message, None)
+
+    def test_answers_from_faqs(self):
+        self.assertEqual(self.reply('How many outlets can I manage?'), self.outlets.answer)
+        self.assertEqual(self.reply('will the waiter app run offline'), self.offline.answer)
+        # Too little of the question is covered, inactive, or too short to tell
+        answers = set(FAQ.objects.values_list('answer', flat=True))
+        for message in ['Which payment gateways do you take?', 'Can the waiter app print bills?', 'any setup fee?', 'outlets']:
+            with self.subTest(message=message):
+                self.assertNotIn(self.reply(message), answers)
+
+    def test_index_follows_changes(self):
+        self.reply('warm the index')
+        with CaptureQueriesContext(connection) as queries:
+            self.reply('How many outlets can I manage?')
+        self.assertEqual(len(queries), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.outlets.answer = 'Premium has unlimited outlets.'
+            self.outlets.save()
+            self.offline.delete()
+        self.assertEqual(self.reply('How many outlets can I manage?'), 'Premium has unlimited outlets.')
+        self.assertNotIn(self.offline.pk, faq_search.get_index().faqs)
+
+
+@override_settings(
+    CATALOG_CHECK_INTERVAL=3600,
+)
+class CatalogTests(TestCase):
+    """Catalog pages run no queries and see changes once they are committed."""
+
+    def setUp(self):
+        self.feature = Feature.objects.create(
+            name='Kitchen Display', slug='kitchen-display', short_description='Short',
+            full_description='Full', icon='🍳', order=1,
+        )
+        Feature.objects.create(
+            name='Hidden', slug='hidden', short_description='Short', full_description='Full', icon='x', is_active=False,
+        )
+        FAQ.objects.create(question='Is there a free demo?', answer='Seven days.', category=FAQ.Category.DEMO)
+        get_site_config()
+        catalog.get_catalog()
+
+    def test_pages_and_invalidation(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Feature.objects.create(
+                name='QR Ordering', slug='qr-ordering', short_description='Short',
+                full_description='Full', icon='📱', order=2,
+            )
+        with self.assertNumQueries(4):
+            current = catalog.get_catalog()
+        self.assertEqual([feature.slug for feature in current.features], ['kitchen-display', 'qr-ordering'])
+        self.assertEqual([faq.answer for faq in current.faqs_in('demo')], ['Seven days.'])
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('feature_detail', kwargs={'slug': 'kitchen-display'}))
+            self.assertEqual([feature.slug for feature in response.context['related_features']], ['qr-ordering'])
+            self.assertEqual(self.client.get(reverse('feature_detail', kwargs={'slug': 'hidden'})).status_code, 404)
+            self.client.get(reverse('faq'))
+
+        # Another process's change is seen through the shared version
+        with self.captureOnCommitCallbacks(execute=True):
+            self.feature.slug = 'kds'
+            self.feature.save()
+        self.assertIsNot(catalog.get_catalog(), current)
+        self.assertIn('kds', catalog.get_catalog().features_by_slug)
+
+    def test_failed_reload_keeps_snapshot(self):
+        current = catalog.get_catalog()
+        catalog.invalidate()
+        with mock.patch('website.catalog._load', side_effect=DatabaseError('connection lost')):
+            with self.assertLogs('website.catalog', 'ERROR'):
+                self.assertIs(catalog.get_catalog(), current)
+            # Without a snapshot to fall back on, the error is not hidden
+            catalog._catalog = None
+            with self.assertRaises(DatabaseError):
+                catalog.get_catalog()
+        # The next check tries again
+        catalog._checked_at = 0.0
+        self.assertEqual(len(catalog.get_catalog().features), 1)
@@ -27,6 +27,7 @@ urlpatterns = [
 
     # Actions
     path('newsletter/subscribe/', views.newsletter_subscribe, name='newsletter_subscribe'),
+    path('newsletter/unsubscribe/<str:token>/', views.newsletter_unsubscribe, name='newsletter_unsubscribe'),
 
     # Chatbot API
     path('api/chat/', views.chatbot_message, name='chatbot_message'),
@@ -4,56 +4,32 @@ Views for Kaffero showcase website.
 
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
-from django.http import JsonResponse
-from django.core.mail import send_mail, EmailMultiAlternatives
-from django.conf import settings
+from django.http import Http404, JsonResponse
+from django.db import transaction
 from django.views.decorators.http import require_POST
 from django.views.decorators.cache import cache_page
+from django.views.decorators.csrf import csrf_exempt
 from django.http import HttpResponse
-from django.template.loader import render_to_string
-from django.utils.html import strip_tags
 
 from .models import (
     DemoRequest, ContactMessage, NewsletterSubscriber,
-    Testimonial, FAQ, Feature, Screenshot, BlogPost,
-    ChatConversation, ChatMessage
+    FAQ, BlogPost, ChatConversation, ChatMessage
 )
 from .forms import DemoRequestForm, ContactForm, NewsletterForm, verify_turnstile
+from .ratelimit import get_client_ip, rate_limit
+from .catalog import get_catalog
+from .site_config import get_site_config
+from . import chat_analytics, faq_search, jobs, leads, newsletter, spam
+from .tasks import send_contact_email, send_demo_email
 import json
 import uuid
-import re
-
-
-def send_html_email(subject, template_name, context, to_email, from_email=None):
-    """Send a beautiful HTML email with plain text fallback."""
-    if from_email is None:
-        from_email = settings.DEFAULT_FROM_EMAIL
-
-    # Render HTML content
-    html_content = render_to_string(template_name, context)
-    text_content = strip_tags(html_content)
-
-    # Create email with both HTML and plain text
-    email = EmailMultiAlternatives(
-        subject=subject,
-        body=text_content,
-        from_email=from_email,
-        to=[to_email] if isinstance(to_email, str) else to_email
-    )
-    email.attach_alternative(html_content, "text/html")
-
-    try:
-        email.send(fail_silently=False)
-        return True
-    except Exception as e:
-        print(f"Email send error: {e}")
-        return False
 
 
 def home(request):
     """Home page view."""
-    features = Feature.objects.filter(is_active=True, is_highlighted=True)[:6]
-    testimonials = Testimonial.objects.filter(is_active=True, is_featured=True)[:3]
+    catalog = get_catalog()
+    features = catalog.highlighted_features[:6]
+    testimonials = catalog.featured_testimonials[:3]
 
     context = {
         'features': features,
@@ -64,20 +40,22 @@ def home(request):
 
 def features(request):
     """Features page view."""
-    features = Feature.objects.filter(is_active=True)
-    screenshots = Screenshot.objects.filter(is_active=True)
+    catalog = get_catalog()
 
     context = {
-        'features': features,
-        'screenshots': screenshots,
+        'features': catalog.features,
+        'screenshots': catalog.screenshots,
     }
     return render(request, 'website/features.html', context)
 
 
 def feature_detail(request, slug):
     """Feature detail page view."""
-    feature = get_object_or_404(Feature, slug=slug, is_active=True)
-    related_features = Feature.objects.filter(is_active=True).exclude(id=feature.id)[:4]
+    catalog = get_catalog()
+    feature = catalog.features_by_slug.get(slug)
+    if feature is None:
+        raise Http404('No feature matches the given query.')
+    related_features = catalog.related_features(feature)
 
     context = {
         'feature': feature,
@@ -88,7 +66,7 @@ def feature_detail(request, slug):
 
 def pricing(request):
     """Pricing page view."""
-    faqs = FAQ.objects.filter(category='pricing', is_active=True)
+    faqs = get_catalog().faqs_in(FAQ.Category.PRICING)
 
     context = {
         'faqs': faqs,
@@ -96,46 +74,33 @@ def pricing(request):
     return render(request, 'website/pricing.html', context)
 
 
+@rate_limit('demo')
 def demo(request):
     """Demo request page view."""
     if request.method == 'POST':
         form = DemoRequestForm(request.POST)
 
-        # Verify Turnstile
-        turnstile_token = request.POST.get('cf-turnstile-response', '')
-        turnstile_valid = verify_turnstile(turnstile_token)
-
-        if not turnstile_valid:
+        # Cheap local checks first; only plausible submissions cost a Turnstile call
+        if spam.check('demo', request.POST):
+            messages.error(request, 'We could not accept this submission. Please check your details and try again.')
+        elif not verify_turnstile(request.POST.get('cf-turnstile-response', '')):
             messages.error(request, 'Please complete the security check.')
         elif form.is_valid():
-            demo_request = form.save()
-
-            # Email context
-            email_context = {'demo_request': demo_request}
-
-            # Send beautiful HTML email to admin
-            send_html_email(
-                subject=f'New Demo Request: {demo_request.cafe_name}',
-                template_name='emails/admin_demo_notification.html',
-                context=email_context,
-                to_email=settings.ADMIN_EMAIL
-            )
-
-            # Send confirmation email to user (if email provided)
-            if demo_request.email:
-                send_html_email(
-                    subject=f'Demo Request Confirmed - {demo_request.cafe_name}',
-                    template_name='emails/demo_confirmation.html',
-                    context=email_context,
-                    to_email=demo_request.email
-                )
+            # The request, its first funnel entry and its email jobs are
+            # saved together; a worker sends the emails
+            with transaction.atomic():
+                demo_request = form.save()
+                jobs.enqueue(send_demo_email, {'demo_id': demo_request.pk, 'recipient': 'admin'})
+                if demo_request.email:
+                    jobs.enqueue(send_demo_email, {'demo_id': demo_request.pk, 'recipient': 'requester'})
 
             return redirect('demo_thank_you', pk=demo_request.pk)
     else:
         form = DemoRequestForm()
 
-    screenshots = Screenshot.objects.filter(is_active=True)[:6]
-    faqs = FAQ.objects.filter(category='demo', is_active=True)
+    catalog = get_catalog()
+    screenshots = catalog.screenshots[:6]
+    faqs = catalog.faqs_in(FAQ.Category.DEMO)
 
     context = {
         'form': form,
@@ -160,38 +125,23 @@ def about(request):
     return render(request, 'website/about.html')
 
 
+@rate_limit('contact')
 def contact(request):
     """Contact page view."""
     if request.method == 'POST':
         form = ContactForm(request.POST)
 
-        # Verify Turnstile
-        turnstile_token = request.POST.get('cf-turnstile-response', '')
-        turnstile_valid = verify_turnstile(turnstile_token)
-
-        if not turnstile_valid:
+        # Cheap local checks first; only plausible submissions cost a Turnstile call
+        if spam.check('contact', request.POST):
+            messages.error(request, 'We could not accept this submission. Please check your details and try again.')
+        elif not verify_turnstile(request.POST.get('cf-turnstile-response', '')):
             messages.error(request, 'Please complete the security check.')
         elif form.is_valid():
-            contact_message = form.save()
-
-            # Email context
-            email_context = {'contact': contact_message}
-
-            # Send beautiful HTML email to admin
-            send_html_email(
-                subject=f'Contact Form: {contact_message.get_subject_display()}',
-                template_name='emails/admin_contact_notification.html',
-                context=email_context,
-                to_email=settings.ADMIN_EMAIL
-            )
-
-            # Send confirmation email to user
-            send_html_email(
-                subject='We received your message - Kaffero',
-                template_name='emails/contact_confirmation.html',
-                context=email_context,
-                to_email=contact_message.email
-            )
+            # The message and its email jobs are saved together; a worker sends the emails
+            with transaction.atomic():
+                contact_message = form.save()
+                jobs.enqueue(send_contact_email, {'message_id': contact_message.pk, 'recipient': 'admin'})
+                jobs.enqueue(send_contact_email, {'message_id': contact_message.pk, 'recipient': 'sender'})
 
             messages.success(request, 'Thank you! Your message has been sent successfully.')
             return redirect('contact')
@@ -206,7 +156,7 @@ def contact(request):
 
 def faq(request):
     """FAQ page view."""
-    faqs = FAQ.objects.filter(is_active=True)
+    faqs = get_catalog().faqs
     categories = FAQ.Category.choices
 
     context = {
@@ -251,91 +201,132 @@ def terms(request):
 
 
 @require_POST
+@rate_limit('newsletter')
 def newsletter_subscribe(request):
     """Newsletter subscription handler."""
     form = NewsletterForm(request.POST)
 
+    result = None
+    if form.is_valid():
+        result = newsletter.subscribe(form.cleaned_data['email'])
+    message = {
+        newsletter.CREATED: 'Thank you for subscribing to our newsletter!',
+        newsletter.REACTIVATED: 'Welcome back! Your newsletter subscription is active again.',
+        newsletter.ALREADY_ACTIVE: 'You are already subscribed to our newsletter.',
+    }.get(result)
+
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         # AJAX request
-        if form.is_valid():
-            form.save()
-            return JsonResponse({'success': True, 'message': 'Thank you for subscribing!'})
+        if result:
+            return JsonResponse({'success': True, 'status': result, 'message': message})
         else:
             return JsonResponse({'success': False, 'errors': form.errors})
 
     # Regular form submission
-    if form.is_valid():
-        form.save()
-        messages.success(request, 'Thank you for subscribing to our newsletter!')
+    if result:
+        messages.success(request, message)
     else:
-        messages.error(request, 'This email is already subscribed.')
+        messages.error(request, 'Please enter a valid email address.')
 
     return redirect(request.META.get('HTTP_REFERER', 'home'))
 
 
-def get_client_ip(request):
-    """Get client IP address from request."""
-    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-    if x_forwarded_for:
-        ip = x_forwarded_for.split(',')[0]
-    else:
-        ip = request.META.get('REMOTE_ADDR')
-    return ip
-
+@csrf_exempt  # Mail clients send RFC 8058 one-click POSTs without a CSRF token
+def newsletter_unsubscribe(request, token):
+    """Unsubscribe page linked from newsletter campaign emails."""
+    subscriber = newsletter.subscriber_for_token(token)
+    unsubscribed = subscriber is not None and not subscriber.is_active
 
-def get_chatbot_response(user_message, conversation):
-    """Generate a chatbot response based on user message."""
-    message_lower = user_message.lower()
+    if subscriber and request.method == 'POST':
+        newsletter.unsubscribe(subscriber)
+        unsubscribed = True
 
-    # Greeting responses
-    if any(word in message_lower for word in ['hi', 'hello', 'hey', 'good morning', 'good evening']):
-        return "Hello! Welcome to Kaffero. I'm here to help you learn about our cafe management system. You can ask me about features, pricing, demo, or anything else!"
+    context = {
+        'subscriber': subscriber,
+        'unsubscribed': unsubscribed,
+    }
+    return render(request, 'website/newsletter_unsubscribe.html', context)
 
-    # Pricing questions
-    if any(word in message_lower for word in ['price', 'cost', 'pricing', 'how much', 'rate', 'fees']):
-        return "Our pricing is simple and transparent:\n\n• **Starter**: ₹35,000 (1 outlet, 5 tables, 3 users)\n• **Standard**: ₹65,000 (3 outlets, 20 tables, 10 users) - Most Popular!\n• **Premium**: ₹95,000 (Unlimited everything)\n\nAll plans include **1 year free support**! After that, annual renewal is 20% of license + actual server/domain charges. Would you like a free demo?"
 
+# Bot answer per intent (see chat_analytics.INTENTS); contact and pricing
+# answers are built from the site configuration
+CHATBOT_RESPONSES = {
+    # Greeting responses
+    'greeting': "Hello! Welcome to Kaffero. I'm here to help you learn about our cafe management system. You can ask me about features, pricing, demo, or anything else!",
     # Demo questions
-    if any(word in message_lower for word in ['demo', 'trial', 'try', 'test']):
-        return "We offer a **free 7-day demo** personalized with your cafe name! You'll get access to:\n\n• Admin Dashboard\n• Waiter App (Android)\n• Kitchen Display\n• QR Menu\n\nWould you like to request a demo? Just click the 'Get Started' button or tell me your cafe name!"
-
+    'demo': "We offer a **free 7-day demo** personalized with your cafe name! You'll get access to:\n\n• Admin Dashboard\n• Waiter App (Android)\n• Kitchen Display\n• QR Menu\n\nWould you like to request a demo? Just click the 'Get Started' button or tell me your cafe name!",
     # Features questions
-    if any(word in message_lower for word in ['feature', 'what can', 'capabilities', 'does it']):
-        return "Kaffero is packed with features:\n\n• **Smart Orders** - Dine-in, takeaway, delivery\n• **Table Management** - Visual floor map with QR codes\n• **Kitchen Display** - Real-time orders, no paper!\n• **Waiter App** - Android app, works offline\n• **QR Ordering** - Customers scan and order\n• **Reports** - Sales, inventory, staff tracking\n\nWhich feature would you like to know more about?"
-
+    'features': "Kaffero is packed with features:\n\n• **Smart Orders** - Dine-in, takeaway, delivery\n• **Table Management** - Visual floor map with QR codes\n• **Kitchen Display** - Real-time orders, no paper!\n• **Waiter App** - Android app, works offline\n• **QR Ordering** - Customers scan and order\n• **Reports** - Sales, inventory, staff tracking\n\nWhich feature would you like to know more about?",
     # QR ordering
-    if 'qr' in message_lower or 'scan' in message_lower:
-        return "With **QR Ordering**, your customers can:\n\n1. Scan the QR code on their table\n2. Browse your beautiful digital menu\n3. Place orders directly from their phone\n4. No app download needed!\n\nThis reduces wait times and frees up your staff. Would you like a demo?"
-
+    'qr_ordering': "With **QR Ordering**, your customers can:\n\n1. Scan the QR code on their table\n2. Browse your beautiful digital menu\n3. Place orders directly from their phone\n4. No app download needed!\n\nThis reduces wait times and frees up your staff. Would you like a demo?",
     # Kitchen display
-    if 'kitchen' in message_lower or 'kot' in message_lower:
-        return "The **Kitchen Display System (KDS)** shows orders in real-time:\n\n• No more paper KOTs\n• Color-coded urgency\n• Order timers\n• Audio alerts\n• One-tap order bumping\n\nYour kitchen staff will love it!"
-
+    'kitchen': "The **Kitchen Display System (KDS)** shows orders in real-time:\n\n• No more paper KOTs\n• Color-coded urgency\n• Order timers\n• Audio alerts\n• One-tap order bumping\n\nYour kitchen staff will love it!",
     # Support questions
-    if any(word in message_lower for word in ['support', 'help', 'problem', 'issue']):
-        return "We provide excellent support:\n\n• **Starter**: 6 months support\n• **Standard**: 1 year priority support\n• **Premium**: 2 years + on-site setup\n\nYou can reach us via WhatsApp, email, or phone. Our team typically responds within 2-4 hours!"
+    'support': "We provide excellent support:\n\n• **Starter**: 6 months support\n• **Standard**: 1 year priority support\n• **Premium**: 2 years + on-site setup\n\nYou can reach us via WhatsApp, email, or phone. Our team typically responds within 2-4 hours!",
+    # Cafe name detection (collecting lead info)
+    'cafe_details': "Great! I'd love to hear more about your cafe. What's your cafe name and city? This helps us personalize your demo experience!",
+    # Thanks
+    'thanks': "You're welcome! Is there anything else you'd like to know about Kaffero? I'm happy to help!",
+    # Bye
+    'bye': "Goodbye! Feel free to come back anytime. If you want to request a demo, just click the 'Get Started' button. Have a great day! ☕",
+    # Default response
+    'other': "Thanks for your message! I can help you with:\n\n• **Pricing** - Our plans and costs\n• **Features** - What Kaffero can do\n• **Demo** - Free trial information\n• **Support** - How we help you\n\nWhat would you like to know more about?",
+}
+
+
+def _plan_limits(plan):
+    """``'1 outlet, 5 tables, 3 users'``, or ``'Unlimited everything'``."""
+    limits = [(plan[key], key) for key in ('outlets', 'tables', 'users') if key in plan]
+    if limits and all(value == 'Unlimited' for value, key in limits):
+        return 'Unlimited everything'
+    return ', '.join(f'{value} {key[:-1] if value == 1 else key}' for value, key in limits)
+
+
+def pricing_response(site):
+    """The chatbot's pricing answer, from the plans in the site configuration."""
+    lines = []
+    for key, plan in site['pricing'].items():
+        line = f"• **{plan.get('name', key.title())}**: ₹{plan['price_display']}"
+        limits = _plan_limits(plan)
+        if limits:
+            line += f' ({limits})'
+        if plan.get('popular'):
+            line += ' - Most Popular!'
+        lines.append(line)
+
+    renewal = f"annual renewal is {site['renewal_fee_percent']}% of license + actual server/domain charges."
+    support = {plan.get('support') for plan in site['pricing'].values()}
+    if len(support) == 1 and None not in support:
+        renewal = f'All plans include **{support.pop()} free support**! After that, {renewal}'
+    else:
+        renewal = renewal.capitalize()
+    plans = '\n'.join(lines)
+    return f'Our pricing is simple and transparent:\n\n{plans}\n\n{renewal} Would you like a free demo?'
 
-    # Contact info
-    if any(word in message_lower for word in ['contact', 'phone', 'call', 'whatsapp', 'email']):
-        return f"You can reach us at:\n\n📞 Phone: {settings.COMPANY_PHONE}\n💬 WhatsApp: {settings.COMPANY_WHATSAPP}\n📧 Email: {settings.COMPANY_EMAIL}\n\nWe typically respond within 2-4 hours during business hours!"
 
-    # Cafe name detection (collecting lead info)
-    if 'my cafe' in message_lower or 'cafe name' in message_lower or 'my restaurant' in message_lower:
-        return "Great! I'd love to hear more about your cafe. What's your cafe name and city? This helps us personalize your demo experience!"
+def get_chatbot_response(user_message, conversation, intent=None):
+    """Generate a chatbot response based on user message."""
+    intent = intent or chat_analytics.classify(user_message)
 
-    # Thanks
-    if any(word in message_lower for word in ['thank', 'thanks', 'thx']):
-        return "You're welcome! Is there anything else you'd like to know about Kaffero? I'm happy to help!"
+    # Questions an FAQ answers get the FAQ's answer
+    if intent not in ('thanks', 'bye'):
+        match = faq_search.best_match(user_message)
+        if match:
+            return match.answer
 
-    # Bye
-    if any(word in message_lower for word in ['bye', 'goodbye', 'see you']):
-        return "Goodbye! Feel free to come back anytime. If you want to request a demo, just click the 'Get Started' button. Have a great day! ☕"
+    # Contact info
+    if intent == 'contact':
+        site = get_site_config()
+        return f"You can reach us at:\n\n📞 Phone: {site['company_phone']}\n💬 WhatsApp: {site['company_whatsapp']}\n📧 Email: {site['company_email']}\n\nWe typically respond within 2-4 hours during business hours!"
 
-    # Default response
-    return "Thanks for your message! I can help you with:\n\n• **Pricing** - Our plans and costs\n• **Features** - What Kaffero can do\n• **Demo** - Free trial information\n• **Support** - How we help you\n\nWhat would you like to know more about?"
+    if intent == 'pricing':
+        return pricing_response(get_site_config())
+
+    return CHATBOT_RESPONSES[intent]
 
 
 @require_POST
+@rate_limit('chat')
 def chatbot_message(request):
     """Handle chatbot messages."""
     try:
@@ -367,23 +358,13 @@ def chatbot_message(request):
             content=user_message
         )
 
-        # Check if user is providing contact info
-        # Email detection
-        email_match = re.search(r'[\w\.-]+@[\w\.-]+\.\w+', user_message)
-        if email_match and not conversation.visitor_email:
-            conversation.visitor_email = email_match.group()
-            conversation.is_lead = True
-            conversation.save()
-
-        # Phone detection (Indian format)
-        phone_match = re.search(r'(\+91[\s-]?)?[6-9]\d{4}[\s-]?\d{5}', user_message)
-        if phone_match and not conversation.visitor_phone:
-            conversation.visitor_phone = phone_match.group()
-            conversation.is_lead = True
-            conversation.save()
+        # Capture any emails and phone numbers the visitor shares
+        was_lead = conversation.is_lead
+        leads.record(conversation, leads.extract(user_message))
 
         # Generate bot response
-        bot_response = get_chatbot_response(user_message, conversation)
+        intent = chat_analytics.classify(user_message)
+        bot_response = get_chatbot_response(user_message, conversation, intent)
 
         # Save bot message
         ChatMessage.objects.create(
@@ -392,8 +373,11 @@ def chatbot_message(request):
             content=bot_response
         )
 
-        # Update conversation timestamp
+        # Save captured contact details and update the conversation timestamp
         conversation.save()
+        chat_analytics.record_turn(
+            conversation, intent, new_conversation=created, new_lead=conversation.is_lead and not was_lead,
+        )
 
         return JsonResponse({
             'success': True,
@@ -514,8 +498,7 @@ def sitemap_xml(request):
 """
 
     # Add dynamic feature pages
-    features = Feature.objects.filter(is_active=True)
-    for feature in features:
+    for feature in get_catalog().features:
         xml_content += f"""  <url>
     <loc>{base_url}/features/{feature.slug}/</loc>
     <lastmod>{today}</lastmod>